@@ -13,14 +13,22 @@ Usage:
 """
 
 import argparse
+import functools
+import hashlib
+import json
 import subprocess
 import sys
+import threading
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from pathlib import Path
 import logging
+import re
 import shutil
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 
 # Import config (optional)
 try:
@@ -38,9 +46,39 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Navigation helper script injected into every generated HTML page
+NAV_HELPER_JS = Path(__file__).parent / 'yard-assets' / 'js' / 'nav-helper.js'
 
+# Markers scanned for in a single pass when patching HTML pages
+_NAV_MARKERS = re.compile(rb'quick-nav|</body>')
+
+# Build caches live in YARDHTMLBuilder.cache_dir, beside the output directory,
+# so they are never committed or deployed with the generated site
+
+# Tracks which HTML files already went through nav helper injection
+NAV_CACHE_FILE = 'nav_cache.json'
+
+# Fingerprint of the inputs used for the last successful YARD build
+YARD_FINGERPRINT_FILE = 'yard_fingerprint'
+
+
+def _repo_relative(path: Path) -> str:
+    """Path relative to the repository root, so fingerprints survive moving the checkout."""
+    try:
+        return Path(os.path.relpath(path, Path(__file__).parent)).as_posix()
+    except ValueError:
+        # Different drive on Windows
+        return str(path)
+
+
+@functools.lru_cache(maxsize=None)
 def _get_timeout(timeout_name: str, default: int) -> int:
-    """Get timeout value from config or use default."""
+    """
+    Get timeout value from config or use default.
+
+    Cached per (timeout_name, default); call _get_timeout.cache_clear() after
+    loading a different config.
+    """
     if HAS_CONFIG:
         try:
             config = get_config()
@@ -50,7 +88,44 @@ def _get_timeout(timeout_name: str, default: int) -> int:
     return default
 
 
+def _log_stream(stream, log, header: str, batch_size: int = 50):
+    """
+    Log non-empty lines from a subprocess stream as they arrive.
+
+    Lines are emitted in batches (one log record per batch) rather than one
+    record per line, so verbose output doesn't pay per-record logging overhead.
+
+    Args:
+        stream: Text stream to read (closed when exhausted)
+        log: Logger method to emit lines with (e.g. logger.info)
+        header: Text prefixed to the first batch
+        batch_size: Maximum number of lines per log record
+    """
+    prefix = header
+    batch = []
+
+    def flush():
+        nonlocal prefix
+        if batch:
+            log(prefix + '\n  ' + '\n  '.join(batch))
+            prefix = header.rstrip(':') + ' (continued):'
+            batch.clear()
+
+    with stream:
+        for line in stream:
+            line = line.rstrip()
+            if line.strip():
+                batch.append(line)
+                if len(batch) >= batch_size:
+                    flush()
+        flush()
+
+
 class YARDHTMLBuilder:
+    # Cached result of check_yard_installed (None = not checked yet)
+    _yard_checked: Optional[bool] = None
+    _yard_path: Optional[str] = None
+
     def __init__(self, input_dir: Path = None, output_dir: Path = None,
                  title: str = None, readme_file: Path = None, guides_dir: Path = None):
         """
@@ -65,7 +140,10 @@ class YARDHTMLBuilder:
         """
         self.input_dir = input_dir or Path(__file__).parent / "output" / "latest" / "documented"
         self.output_dir = output_dir or Path(__file__).parent / "docs"
+        # Build caches, kept out of the output directory that gets published
+        self.cache_dir = self.output_dir.parent / f".{self.output_dir.name}-cache"
         self.title = title or "Lich 5 Documentation"
+        self.yard_path = 'yard'  # Resolved to a full path by check_yard_installed()
 
         # Default to docs-readme.md if it exists and no readme specified
         if readme_file:
@@ -86,31 +164,125 @@ class YARDHTMLBuilder:
             raise FileNotFoundError(f"Input directory not found: {self.input_dir}")
 
     def check_yard_installed(self) -> bool:
-        """Check if YARD is installed and available."""
-        try:
-            timeout = _get_timeout('yard_version_check', 10)
-            result = subprocess.run(
-                ['yard', '--version'],
-                capture_output=True,
-                text=True,
-                timeout=timeout
-            )
-            if result.returncode == 0:
-                logger.info(f"YARD version: {result.stdout.strip()}")
-                return True
-            else:
-                logger.error("YARD command failed")
-                return False
-        except FileNotFoundError:
+        """
+        Check if YARD is installed and available.
+
+        Uses a PATH lookup rather than spawning a process; `yard --version` is
+        only run when debug logging is enabled. The result is cached on the
+        class so repeated checks in one process are free. Set
+        LICH_SKIP_YARD_CHECK=1 to skip the check entirely (e.g. in CI where
+        YARD is known to be installed).
+        """
+        if os.environ.get('LICH_SKIP_YARD_CHECK'):
+            return True
+        if YARDHTMLBuilder._yard_checked is not None:
+            self.yard_path = YARDHTMLBuilder._yard_path or 'yard'
+            return YARDHTMLBuilder._yard_checked
+
+        yard_path = shutil.which('yard')
+        installed = yard_path is not None
+        if not installed:
             logger.error("YARD is not installed. Install with: gem install yard")
-            return False
-        except subprocess.TimeoutExpired:
-            logger.error("YARD version check timed out")
-            return False
+        elif logger.isEnabledFor(logging.DEBUG):
+            try:
+                timeout = _get_timeout('yard_version_check', 10)
+                result = subprocess.run(
+                    [yard_path, '--version'],
+                    capture_output=True,
+                    text=True,
+                    timeout=timeout
+                )
+                if result.returncode == 0:
+                    logger.debug(f"YARD version: {result.stdout.strip()}")
+                else:
+                    logger.error("YARD command failed")
+                    installed = False
+            except subprocess.TimeoutExpired:
+                logger.error("YARD version check timed out")
+                installed = False
+        else:
+            logger.info(f"Found YARD: {yard_path}")
+
+        YARDHTMLBuilder._yard_checked = installed
+        YARDHTMLBuilder._yard_path = yard_path if installed else None
+        self.yard_path = yard_path if installed else 'yard'
+        return installed
+
+    def _input_ruby_files(self) -> List[str]:
+        """Paths of the Ruby files in the input directory, from one walk."""
+        return self._scan_tree(self.input_dir).get('rb', [])
 
     def count_ruby_files(self) -> int:
         """Count Ruby files in input directory."""
-        return len(list(self.input_dir.rglob("*.rb")))
+        return len(self._input_ruby_files())
+
+    def _fingerprint_inputs(self, ruby_files: Optional[List[str]] = None) -> str:
+        """
+        Compute a cheap fingerprint of everything that feeds the YARD build.
+
+        Hashes (relative path, size, mtime_ns) of every Ruby file in the input
+        directory, plus the README, guides, theme assets, and build options.
+        Paths outside the input directory are taken relative to the repository
+        root. File contents are never read.
+
+        Args:
+            ruby_files: Ruby file paths from _input_ruby_files, if already walked
+
+        Returns:
+            Hex digest identifying the current set of inputs
+        """
+        if ruby_files is None:
+            ruby_files = self._input_ruby_files()
+        entries = []
+        for path in ruby_files:
+            st = os.stat(path)
+            entries.append(f"{os.path.relpath(path, self.input_dir)}\0{st.st_size}\0{st.st_mtime_ns}\n")
+        entries.sort()
+
+        extra_files = [self.readme_file] if self.readme_file else []
+        if self.guides_dir and self.guides_dir.exists():
+            extra_files.extend(sorted(self.guides_dir.glob('*.md')))
+        assets_dir = Path(__file__).parent / 'yard-assets'
+        extra_files.extend([NAV_HELPER_JS, assets_dir / 'css' / 'theme.css'])
+
+        for path in extra_files:
+            if path.exists():
+                st = path.stat()
+                entries.append(f"{_repo_relative(path)}\0{st.st_size}\0{st.st_mtime_ns}\n")
+
+        hasher = hashlib.blake2b(digest_size=16)
+        readme = _repo_relative(self.readme_file) if self.readme_file else None
+        guides = _repo_relative(self.guides_dir) if self.guides_dir else None
+        hasher.update(f"{self.title}\0{readme}\0{guides}\n".encode('utf-8'))
+        for entry in entries:
+            hasher.update(entry.encode('utf-8'))
+        return hasher.hexdigest()
+
+    @staticmethod
+    def _scan_tree(root: Path) -> Dict[str, List[str]]:
+        """
+        Walk a directory tree once and bucket file paths by extension.
+
+        Uses os.walk with plain strings rather than Path.rglob, without
+        allocating Path objects. Callers that need the same tree more than once
+        walk it once and pass the buckets along (see build_html and main).
+
+        Args:
+            root: Directory to walk
+
+        Returns:
+            Dictionary mapping extension (without dot) to list of file paths
+        """
+        buckets = defaultdict(list)
+        for dirpath, _dirs, files in os.walk(root):
+            for name in files:
+                ext = name.rpartition('.')[2] if '.' in name else ''
+                buckets[ext].append(os.path.join(dirpath, name))
+        return buckets
+
+    def scan_output(self) -> Dict[str, List[str]]:
+        """Walk the output directory once, bucketing files by extension."""
+        return self._scan_tree(self.output_dir)
 
     def build_html(self) -> bool:
         """
@@ -119,12 +291,27 @@ class YARDHTMLBuilder:
         Returns:
             True if successful, False otherwise
         """
-        ruby_file_count = self.count_ruby_files()
+        # One walk of the input serves both the count and the fingerprint
+        ruby_files = self._input_ruby_files()
+        ruby_file_count = len(ruby_files)
         if ruby_file_count == 0:
             logger.error(f"No Ruby files found in {self.input_dir}")
             return False
 
         logger.info(f"Found {ruby_file_count} Ruby files to document")
+
+        # Skip YARD entirely if nothing that feeds the build has changed
+        fingerprint = self._fingerprint_inputs(ruby_files)
+        fingerprint_file = self.cache_dir / YARD_FINGERPRINT_FILE
+        index_file = self.output_dir / 'index.html'
+        if index_file.exists() and fingerprint_file.exists():
+            try:
+                if fingerprint_file.read_text(encoding='utf-8').strip() == fingerprint:
+                    logger.info("Inputs unchanged since last build, skipping YARD")
+                    return True
+            except OSError as e:
+                logger.debug(f"Could not read build fingerprint: {e}")
+
         logger.info(f"Building HTML documentation...")
         logger.info(f"  Input: {self.input_dir}")
         logger.info(f"  Output: {self.output_dir}")
@@ -136,11 +323,12 @@ class YARDHTMLBuilder:
         # --title: project title
         # --readme: README file for homepage
         # --files: additional files to include (if any)
-        # The files to document are specified as positional arguments
+        # The input directory is passed as a positional argument; YARD recurses
+        # into directories itself, so no '**/*.rb' glob needs to be expanded
 
         yard_cmd = [
-            'yard', 'doc',
-            str(self.input_dir / '**' / '*.rb'),  # Document all Ruby files recursively
+            self.yard_path, 'doc',
+            str(self.input_dir),  # Document all Ruby files recursively
             '--output-dir', str(self.output_dir),
             '--title', self.title,
             '--no-private',  # Don't document private methods
@@ -154,51 +342,68 @@ class YARDHTMLBuilder:
 
         # Add guides if directory exists
         if self.guides_dir and self.guides_dir.exists():
-            guide_files = list(self.guides_dir.glob('*.md'))
+            guide_files = [
+                entry.path for entry in os.scandir(self.guides_dir)
+                if entry.is_file() and entry.name.endswith('.md')
+            ]
             if guide_files:
                 # YARD --files takes comma-separated list or multiple --files flags
-                yard_cmd.extend(['--files', ','.join(str(f) for f in guide_files)])
+                yard_cmd.extend(['--files', ','.join(guide_files)])
                 logger.info(f"  Including {len(guide_files)} guide(s) from {self.guides_dir}")
 
         try:
             # Run YARD
             logger.info("Running YARD documentation generator...")
             timeout = _get_timeout('yard_doc_build', 300)
-            result = subprocess.run(
+            process = subprocess.Popen(
                 yard_cmd,
-                capture_output=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 text=True,
-                timeout=timeout
+                bufsize=1
             )
 
-            # Log YARD output
-            if result.stdout:
-                logger.info("YARD output:")
-                for line in result.stdout.split('\n'):
-                    if line.strip():
-                        logger.info(f"  {line}")
-
-            # Log YARD warnings/errors
-            if result.stderr:
-                logger.warning("YARD warnings/errors:")
-                for line in result.stderr.split('\n'):
-                    if line.strip():
-                        logger.warning(f"  {line}")
-
-            if result.returncode == 0:
+            # Drain stdout/stderr concurrently so output is logged while YARD runs
+            readers = [
+                threading.Thread(target=_log_stream,
+                                 args=(process.stdout, logger.info, "YARD output:"),
+                                 daemon=True),
+                threading.Thread(target=_log_stream,
+                                 args=(process.stderr, logger.warning, "YARD warnings/errors:"),
+                                 daemon=True),
+            ]
+            for reader in readers:
+                reader.start()
+
+            try:
+                returncode = process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+                raise
+            finally:
+                for reader in readers:
+                    reader.join()
+
+            if returncode == 0:
                 logger.info(f"✅ HTML documentation built successfully!")
                 logger.info(f"📄 Output directory: {self.output_dir}")
 
                 # Check if index.html was created
-                index_file = self.output_dir / 'index.html'
                 if index_file.exists():
                     logger.info(f"📖 Open {index_file} in a browser to view documentation")
+                    # Record the inputs this build was made from
+                    try:
+                        self.cache_dir.mkdir(parents=True, exist_ok=True)
+                        fingerprint_file.write_text(fingerprint, encoding='utf-8')
+                    except OSError as e:
+                        logger.warning(f"Could not save build fingerprint: {e}")
                 else:
                     logger.warning("index.html not found in output directory")
 
                 return True
             else:
-                logger.error(f"YARD failed with return code {result.returncode}")
+                logger.error(f"YARD failed with return code {returncode}")
                 return False
 
         except subprocess.TimeoutExpired:
@@ -208,14 +413,46 @@ class YARDHTMLBuilder:
             logger.error(f"Error running YARD: {e}")
             return False
 
-    def clean_output(self):
-        """Remove existing output directory."""
-        if self.output_dir.exists():
-            logger.info(f"Cleaning existing output: {self.output_dir}")
+    def clean_output(self) -> Optional[threading.Thread]:
+        """
+        Remove existing output directory.
+
+        The directory is renamed aside and deleted in a background thread so
+        the build can start immediately. The thread is non-daemon, so the
+        process waits for the delete to finish before exiting.
+
+        Returns:
+            The thread deleting the old output, or None if nothing to clean
+        """
+        if not self.output_dir.exists():
+            return None
+
+        logger.info(f"Cleaning existing output: {self.output_dir}")
+        old_dir = self.output_dir.with_name(f"{self.output_dir.name}.old-{os.getpid()}")
+        try:
+            os.rename(self.output_dir, old_dir)
+        except OSError as e:
+            # Rename can fail (e.g. locked files on Windows) - delete in place
+            logger.debug(f"Could not move output aside ({e}), removing in place")
             shutil.rmtree(self.output_dir)
+            return None
 
-    def copy_theme_assets(self):
-        """Copy theme CSS to output directory."""
+        cleaner = threading.Thread(
+            target=shutil.rmtree,
+            args=(old_dir,),
+            kwargs={'ignore_errors': True},
+            daemon=False
+        )
+        cleaner.start()
+        return cleaner
+
+    def copy_theme_assets(self, buckets: Optional[Dict[str, List[str]]] = None):
+        """
+        Copy theme CSS to output directory.
+
+        Args:
+            buckets: Output scan from scan_output, updated with the copied file
+        """
         assets_dir = Path(__file__).parent / 'yard-assets'
         theme_css = assets_dir / 'css' / 'theme.css'
 
@@ -228,58 +465,171 @@ class YARDHTMLBuilder:
         css_dir.mkdir(exist_ok=True)
 
         # Copy theme CSS
-        shutil.copy(theme_css, css_dir / 'theme.css')
-        logger.info(f"Copied theme CSS to {css_dir / 'theme.css'}")
+        target = css_dir / 'theme.css'
+        shutil.copy(theme_css, target)
+        logger.info(f"Copied theme CSS to {target}")
+        if buckets is not None:
+            css_files = buckets.setdefault('css', [])
+            if str(target) not in css_files:
+                css_files.append(str(target))
+
+    @functools.cached_property
+    def _nav_script_bytes(self) -> Optional[bytes]:
+        """
+        Encoded script block to insert before </body> in each HTML page.
 
-    def inject_nav_helper(self) -> int:
+        Read once per builder instance; None if the nav helper JS is missing.
+        """
+        if not NAV_HELPER_JS.exists():
+            return None
+        js_content = NAV_HELPER_JS.read_text(encoding='utf-8')
+        return f'<script type="text/javascript">\n{js_content}\n</script>\n'.encode('utf-8')
+
+    def inject_nav_helper(self, buckets: Optional[Dict[str, List[str]]] = None) -> int:
         """
         Inject navigation helper JavaScript into generated HTML files.
 
+        Args:
+            buckets: Output scan from scan_output; the output is walked if omitted
+
         Returns:
             Number of files modified
         """
-        assets_dir = Path(__file__).parent / 'yard-assets'
-        nav_helper = assets_dir / 'js' / 'nav-helper.js'
-
-        if not nav_helper.exists():
-            logger.warning(f"Navigation helper not found: {nav_helper}")
+        script_bytes = self._nav_script_bytes
+        if script_bytes is None:
+            logger.warning(f"Navigation helper not found: {NAV_HELPER_JS}")
             return 0
 
-        # Copy theme assets first
-        self.copy_theme_assets()
+        if buckets is None:
+            buckets = self.scan_output()
 
-        # Read the JavaScript
-        with open(nav_helper, 'r', encoding='utf-8') as f:
-            js_content = f.read()
+        # Copy theme assets first
+        self.copy_theme_assets(buckets)
 
-        # Create the script tag to inject
-        script_tag = f'<script type="text/javascript">\n{js_content}\n</script>\n</body>'
+        nav_hash = hashlib.blake2b(script_bytes, digest_size=16).hexdigest()
 
         # Find all HTML files
-        html_files = list(self.output_dir.rglob("*.html"))
-        modified_count = 0
+        html_files = buckets.get('html', [])
 
+        # Skip pages whose (mtime, size) match the cache from a previous run
+        # with the same nav helper - they were already patched or checked
+        cached = self._load_nav_cache(nav_hash)
+        file_stats = {}
+        pending = []
         for html_file in html_files:
-            try:
-                with open(html_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-
-                # Replace </body> with script + </body>
-                if '</body>' in content and 'quick-nav' not in content:
-                    new_content = content.replace('</body>', script_tag)
-                    with open(html_file, 'w', encoding='utf-8') as f:
-                        f.write(new_content)
-                    modified_count += 1
-            except Exception as e:
-                logger.warning(f"Could not inject nav helper into {html_file}: {e}")
+            rel_path = os.path.relpath(html_file, self.output_dir)
+            stat = os.stat(html_file)
+            entry = [stat.st_mtime_ns, stat.st_size]
+            if cached.get(rel_path) == entry:
+                file_stats[rel_path] = entry
+            else:
+                pending.append(html_file)
+
+        if len(pending) < len(html_files):
+            logger.info(f"Nav helper cache hit for {len(html_files) - len(pending)} HTML files")
+
+        # Each page is patched independently, so fan the I/O out across threads
+        max_workers = min(32, (os.cpu_count() or 4) * 4)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(lambda f: self._patch_one(f, script_bytes), pending))
+        modified_count = sum(1 for result in results if result)
+
+        # Record post-patch stats so the next run can skip these pages; pages
+        # that could not be patched stay uncached and are retried next run
+        for html_file, result in zip(pending, results):
+            if result is None:
+                continue
+            stat = os.stat(html_file)
+            file_stats[os.path.relpath(html_file, self.output_dir)] = [stat.st_mtime_ns, stat.st_size]
+        self._save_nav_cache(nav_hash, file_stats)
 
         logger.info(f"Injected navigation helper into {modified_count} HTML files")
         return modified_count
 
-    def verify_output(self) -> dict:
+    def _load_nav_cache(self, nav_hash: str) -> Dict[str, List[int]]:
+        """
+        Load the nav helper injection cache.
+
+        Args:
+            nav_hash: Hash of the current nav helper script
+
+        Returns:
+            Mapping of relative HTML path to [mtime_ns, size], or empty dict if the
+            cache is missing, unreadable, or was built with a different nav helper
+        """
+        cache_file = self.cache_dir / NAV_CACHE_FILE
+        if not cache_file.exists():
+            return {}
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except Exception as e:
+            logger.debug(f"Ignoring unreadable nav helper cache: {e}")
+            return {}
+        if cache.get('nav_hash') != nav_hash:
+            return {}
+        return cache.get('files', {})
+
+    def _save_nav_cache(self, nav_hash: str, file_stats: Dict[str, List[int]]):
+        """Save the nav helper injection cache."""
+        cache_file = self.cache_dir / NAV_CACHE_FILE
+        try:
+            # Serialize first so the file gets one write instead of one per token
+            data = json.dumps({'nav_hash': nav_hash, 'files': file_stats})
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(cache_file, 'w', encoding='utf-8') as f:
+                f.write(data)
+        except Exception as e:
+            logger.warning(f"Could not save nav helper cache: {e}")
+
+    def _patch_one(self, html_file: str, script_bytes: bytes) -> Optional[bool]:
+        """
+        Insert the nav helper script into a single HTML file.
+
+        Args:
+            html_file: Path to the HTML file
+            script_bytes: Encoded script block to insert before </body>
+
+        Returns:
+            True if the file was modified, False if it needs no change
+            (already injected or has no </body>), None if it could not be patched
+        """
+        try:
+            # Work on raw bytes at the fd level - no buffering layers or
+            # decode/encode, and unchanged files are never written
+            fd = os.open(html_file, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+            try:
+                data = os.read(fd, os.fstat(fd).st_size)
+
+                # One pass finds both markers: bail on any quick-nav, and
+                # remember where the last </body> starts
+                idx = -1
+                for match in _NAV_MARKERS.finditer(data):
+                    if match.group() == b'quick-nav':
+                        return False
+                    idx = match.start()
+                if idx < 0:
+                    return False
+
+                # Only the tail from </body> onward moves; rewrite just that part
+                tail = memoryview(script_bytes + data[idx:])
+                os.lseek(fd, idx, os.SEEK_SET)
+                while tail:
+                    tail = tail[os.write(fd, tail):]
+                return True
+            finally:
+                os.close(fd)
+        except Exception as e:
+            logger.warning(f"Could not inject nav helper into {html_file}: {e}")
+            return None
+
+    def verify_output(self, buckets: Optional[Dict[str, List[str]]] = None) -> dict:
         """
         Verify the generated HTML documentation.
 
+        Args:
+            buckets: Output scan from scan_output; the output is walked if omitted
+
         Returns:
             Dictionary with verification results
         """
@@ -290,16 +640,15 @@ class YARDHTMLBuilder:
         if not index_file.exists():
             return {'valid': False, 'error': 'index.html not found'}
 
-        # Count generated HTML files
-        html_files = list(self.output_dir.rglob("*.html"))
-        css_files = list(self.output_dir.rglob("*.css"))
-        js_files = list(self.output_dir.rglob("*.js"))
+        # Count generated files in a single pass over the output tree
+        if buckets is None:
+            buckets = self.scan_output()
 
         return {
             'valid': True,
-            'html_files': len(html_files),
-            'css_files': len(css_files),
-            'js_files': len(js_files),
+            'html_files': len(buckets.get('html', [])),
+            'css_files': len(buckets.get('css', [])),
+            'js_files': len(buckets.get('js', [])),
             'index_file': index_file
         }
 
@@ -368,6 +717,7 @@ Examples:
                 ConfigManager.load()
             except Exception:
                 pass
+        _get_timeout.cache_clear()
 
     # Initialize builder
     try:
@@ -400,13 +750,17 @@ Examples:
         logger.error("Failed to build HTML documentation")
         sys.exit(1)
 
+    # One walk of the output serves injection and verification; injecting
+    # rewrites pages in place, and the copied theme CSS is added to the buckets
+    output_files = builder.scan_output()
+
     # Inject navigation helper
-    builder.inject_nav_helper()
+    builder.inject_nav_helper(output_files)
 
     # Verify output if requested
     if args.verify:
         logger.info("Verifying generated documentation...")
-        verification = builder.verify_output()
+        verification = builder.verify_output(output_files)
 
         if verification['valid']:
             logger.info("✅ Documentation verification passed")
@@ -9,18 +9,25 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 import argparse
+import asyncio
+import fnmatch
+import functools
 import json
 import logging
 import re
 import time
 import hashlib
+import sqlite3
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from bisect import bisect_right
+from itertools import accumulate
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence, Union
 
 from providers import get_provider, ProviderFactory, get_parallel_workers
+from providers.rate_limit import AsyncTokenBucket, AdaptiveConcurrency
 
 # Import config (optional - falls back to defaults if not available)
 try:
@@ -31,6 +38,14 @@ except ImportError:
     ConfigManager = None
     get_config = None
 
+# Import orjson (optional - falls back to the stdlib json module)
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+    orjson = None
+
 # Import validation (optional - falls back to skipping validation)
 try:
     from validation import YARDValidator, ValidationResult
@@ -47,13 +62,240 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Version of the documentation prompt. Bump whenever create_documentation_prompt
+# or PROMPT_RULES change so previously documented files are regenerated.
+# Manifest entries written before versioning are treated as version 1.
+PROMPT_VERSION = 1
+
+# Hash used to detect code changes. It only needs to notice edits, not resist
+# attacks, so BLAKE2b (8-byte digest, 16 hex digits) replaces SHA-256, which is
+# slower in software. Entries without 'hash_algo' were written with SHA-256 and
+# are migrated the first time their file is found unchanged.
+HASH_ALGO = 'blake2b'
+_HASHERS = {
+    'sha256': hashlib.sha256,
+    'blake2b': lambda: hashlib.blake2b(digest_size=8),
+}
+
+# Journal records are written out in groups: after this many records or this
+# many seconds, whichever comes first. Records lost in a crash only cost a
+# re-run of those files, which the response cache answers without API calls.
+JOURNAL_FLUSH_RECORDS = 32
+JOURNAL_FLUSH_SECONDS = 5.0
+
+# Patterns used when parsing LLM responses (compiled once, used for every file)
+# A ```json fenced block
+_RE_JSON_FENCE = re.compile(r'```json\s*(.*?)```', re.DOTALL)
+# A JSON array of objects, greedy and non-greedy
+_RE_JSON_ARRAY = re.compile(r'\[\s*\{.*\}\s*\]', re.DOTALL)
+_RE_JSON_ARRAY_NG = re.compile(r'\[\s*\{.*?\}\s*\]', re.DOTALL)
+# A JSON string literal, capturing its contents
+_RE_JSON_STRING = re.compile(r'"((?:[^"\\]|\\.)*)"')
+# Two or more JSON strings joined with + (e.g. "a" + "b")
+_RE_JSON_CONCAT = re.compile(r'"(?:[^"\\]|\\.)*"(?:\s*\+\s*"(?:[^"\\]|\\.)*")+')
+# A backslash and the character after it: a valid JSON escape (group 1) or
+# anything else (group 2), which is double-escaped
+_RE_JSON_ESCAPE = re.compile(r'\\(?:(["\\/bfnrt]|u[0-9A-Fa-f]{4})|(.))', re.DOTALL)
+# Whole lines of prose or markdown around the JSON (e.g. "Here are the comments:")
+_RE_NONCODE_LINE = re.compile(r'^\s*(?:Here|This|I|The|---|###|```).*(?:\n|$)', re.MULTILINE)
+
+# Patterns used when stripping existing YARD documentation
+# Any YARD tag (substring match, so @attr also covers @attr_reader/@attr_writer)
+_RE_YARD_TAG = re.compile(r'@(?:param|return|example|raise|yield|note|see|api|deprecated|since|version|attr)')
+# Tags that mark a preceding description line as part of a YARD block
+_RE_DOC_TAG = re.compile(r'@(?:param|return|example|raise|yield|note)')
+# A whole comment line, for pulling YARD comments out of documented code
+# (leading whitespace stays on the line, so a match never spans blank lines)
+_RE_COMMENT = re.compile(r'^[^\S\n]*#.*$', re.MULTILINE)
+# Tags whose comment lines are left out of the code hash
+_RE_HASH_DOC_TAG = re.compile(r'@(?:param|return|example|note|see|yield)')
+# A whole comment line left out of the code hash, with its newline: one with a
+# doc tag, or "# text" that isn't an encoding comment (same rules as _hash_code_lines)
+_RE_HASH_DOC_LINE = re.compile(
+    r'^[^\S\n]*#(?:[^\n]*@(?:param|return|example|note|see|yield)'
+    r'| (?![^\n]*coding:)[^\n]*\S)[^\n]*(?:\n|\Z)',
+    re.MULTILINE
+)
+# Line prefixes that start a documentable definition
+_DEFINITION_KEYWORDS = ('class ', 'module ', 'def ', 'attr_reader', 'attr_writer', 'attr_accessor')
+# A class, module or method definition at the start of a line
+_RE_DEFINITION = re.compile(r'^\s*(?:class|module|def)\s', re.MULTILINE)
+
+
+def _dumps_json(data: Any, indent: bool = True) -> bytes:
+    """
+    Serialize data to UTF-8 JSON bytes, with orjson when it is installed
+
+    Both backends give the same output: two-space indentation (or compact),
+    non-ASCII kept as UTF-8, and unsupported values converted with str().
+
+    Args:
+        data: Data to serialize
+        indent: Pretty-print with two-space indentation
+
+    Returns:
+        JSON document as bytes
+    """
+    if HAS_ORJSON:
+        return orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2 if indent else 0)
+    separators = (',', ': ') if indent else (',', ':')
+    return json.dumps(data, indent=2 if indent else None, separators=separators,
+                      default=str, ensure_ascii=False).encode('utf-8')
+
+
+def _loads_json(data: bytes) -> Any:
+    """Parse UTF-8 JSON bytes, with orjson when it is installed"""
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _parse_json_text(text: str) -> Any:
+    """
+    Parse JSON text, with orjson when it is installed
+
+    Text orjson rejects is re-parsed with the json module, which accepts a few
+    things orjson doesn't (NaN, lone surrogates) and reports stdlib error
+    positions. Invalid JSON raises json.JSONDecodeError either way.
+
+    Args:
+        text: JSON document
+
+    Returns:
+        Parsed value
+    """
+    if HAS_ORJSON:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(text)
+
+
+def _atomic_write(path: Path, data: Union[str, bytes]):
+    """
+    Write data to path so readers see either the old file or the complete new one
+
+    The data goes to a temporary file beside the target (unique per process and
+    thread), is fsynced, and is then moved over the target with os.replace.
+
+    Args:
+        path: Destination file
+        data: Text to write (UTF-8), or bytes to write as-is
+    """
+    tmp_path = path.with_suffix(f"{path.suffix}.tmp.{os.getpid()}.{threading.get_ident()}")
+    try:
+        with (open(tmp_path, 'wb') if isinstance(data, bytes)
+              else open(tmp_path, 'w', encoding='utf-8')) as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+@functools.lru_cache(maxsize=4096)
+def _compile_anchor(anchor_stripped: str) -> tuple:
+    """
+    Build the line test for an anchor, compiled once per anchor
+
+    find_insertion_line tries the same anchor against many lines, so the
+    anchor is parsed and its pattern compiled once rather than per line.
+    Every line the test accepts contains the returned required text, which
+    lets a whole-file search skip straight to candidate lines.
+
+    Args:
+        anchor_stripped: The anchor string with surrounding whitespace removed
+
+    Returns:
+        (test, required) tuple: a callable taking a line and returning a truthy
+        value if it matches, and text every matching line contains (None if
+        no line can match)
+    """
+    # Pattern 1: Class/Module definitions
+    # Anchor: "class GameObj" or "module Lich"
+    if anchor_stripped.startswith(('class ', 'module ')):
+        keyword, name = anchor_stripped.split(None, 1)
+        name = name.split('(')[0].strip()  # Remove any params
+        return re.compile(rf'^\s*{keyword}\s+{re.escape(name)}\b').search, name
+
+    # Pattern 2: Method definitions (instance or class methods)
+    # Anchor: "def method_name" or "def self.method" or "def ClassName.method"
+    if anchor_stripped.startswith('def '):
+        method_sig = anchor_stripped[4:].split('(')[0].strip()
+
+        # Extract the base method name (last part after any dots)
+        if '.' in method_sig:
+            method_name = method_sig.split('.')[-1]
+        else:
+            method_name = method_sig
+
+        # Flexible matching: anchor "def method" should match:
+        # - def method
+        # - def self.method
+        # - def ClassName.method
+        # And anchor "def self.method" should also match all of those
+
+        # Pattern matches: def <optional-qualifier>.<method_name>[?!=]? or []
+        # Where qualifier can be "self", a class name, or nothing
+        # Ruby allows ? ! = at end of method names, and [] for array access
+        if method_name == '[]':
+            # Special case: array access operator
+            pattern = re.compile(rf'\bdef\s+(?:(?:self|\w+)\.)?\[\]')
+        else:
+            # Regular method, might have ?, !, or = suffix
+            pattern = re.compile(rf'\bdef\s+(?:(?:self|\w+)\.)?{re.escape(method_name)}[?!=]?')
+
+        # Fallback: exact match of full signature
+        signature = f'def {method_sig}'
+        # Both the pattern and the signature contain the base method name
+        return (lambda line: bool(pattern.search(line)) or signature in line), method_name
+
+    # Pattern 3: Attribute readers/writers/accessors
+    # Anchor: "attr_reader :mana" or "attr_accessor"
+    if anchor_stripped.startswith('attr_'):
+        # Extract the attribute type and symbol
+        parts = anchor_stripped.split()
+        attr_type = parts[0]  # attr_reader, attr_accessor, etc.
+        if len(parts) > 1:
+            symbol = parts[1].lstrip(':')
+            return re.compile(rf'{attr_type}\s+:{re.escape(symbol)}\b').search, symbol
+        return (lambda line: attr_type in line), attr_type
+
+    # Pattern 4: Constants (all caps with =)
+    # Anchor: "CONSTANT_NAME" or "CONSTANT_NAME ="
+    if anchor_stripped.replace('_', '').replace('=', '').strip().isupper():
+        const_name = anchor_stripped.split('=')[0].strip()
+        return re.compile(rf'\b{re.escape(const_name)}\s*=').search, const_name
+
+    # Pattern 5: Class variables (@@var) or instance variables (@var)
+    # Anchor: "@@variable" or "@variable"
+    if anchor_stripped.startswith(('@@', '@')):
+        var_name = anchor_stripped.split()[0].split('=')[0].strip()
+        return re.compile(rf'{re.escape(var_name)}\s*(=|\|\|=)').search, var_name
+
+    # Fallback: Token-based matching (original approach)
+    # Remove params and clean up
+    anchor_clean = anchor_stripped.split('(')[0].strip()
+    tokens = anchor_clean.split()
+
+    if not tokens:
+        return (lambda line: False), None
+
+    # Check if all key tokens appear in the line
+    return (lambda line: all(token in line for token in tokens)), tokens[0]
+
 
 class Lich5DocumentationGenerator:
     """Main documentation generator for Lich5 Ruby code"""
 
     def __init__(self, provider_name: Optional[str] = None, output_dir: Optional[str] = None,
                  incremental: bool = True, force_rebuild: bool = False, parallel_workers: int = None,
-                 output_structure: str = 'flat', source_root: Optional[Path] = None):
+                 output_structure: str = 'flat', source_root: Optional[Path] = None,
+                 batch_token_budget: Optional[int] = None, response_cache: bool = True,
+                 batch_api: bool = False, assume_yes: bool = False, emit_yard: bool = False):
         """
         Initialize the documentation generator
 
@@ -65,16 +307,24 @@ class Lich5DocumentationGenerator:
             parallel_workers: Number of parallel workers (None = auto-detect based on provider)
             output_structure: 'flat' (all files in one dir) or 'mirror' (preserve source structure)
             source_root: Root directory of source files (required for mirror structure)
+            batch_token_budget: Token budget for batching small files (None = from config, 0 = off)
+            response_cache: Reuse stored LLM responses for identical prompts
+            batch_api: Submit prompts through the provider's asynchronous batch API
+            assume_yes: Answer yes to confirmation prompts instead of asking
+            emit_yard: Write each file's .yard comment file as it is documented
         """
         self.provider_name = provider_name or os.environ.get('LLM_PROVIDER', 'openai')
         self.incremental = incremental and not force_rebuild
         self.force_rebuild = force_rebuild
         self.output_structure = output_structure
         self.source_root = source_root
+        self._resolved_root = (None, None)
+        self.assume_yes = assume_yes
 
         # Thread safety - use RLock (reentrant) to allow nested acquisitions
         self.manifest_lock = threading.RLock()
-        self.file_lock = threading.RLock()
+        # Output directories already created this run (saves a mkdir per file)
+        self._created_dirs = set()
 
         # Get parallel workers from config or use provided value
         if parallel_workers is None:
@@ -82,6 +332,11 @@ class Lich5DocumentationGenerator:
         else:
             self.parallel_workers = parallel_workers
 
+        if batch_token_budget is None:
+            self.batch_token_budget = self._get_batch_token_budget()
+        else:
+            self.batch_token_budget = batch_token_budget
+
         # Set up output directory
         if output_dir:
             self.output_dir = Path(output_dir)
@@ -98,11 +353,53 @@ class Lich5DocumentationGenerator:
         # Track documentation
         self.documentation = {}
         self.failed_files = []
+        # Code hashes of sources read by process_file, consumed by mark_file_processed
+        self._source_hashes = {}
+        # Contents of changed sources read by is_file_processed, consumed by _read_source
+        self._source_contents = {}
+        # Stat of each source taken when it was read, so the stat cache pairs
+        # a hash with the mtime/size of the content that was actually hashed
+        self._source_stats = {}
+
+        # (loop, request_bucket, token_bucket) while _aprocess_files is dispatching
+        self._rate_limits = None
+
+        # Response cache (opened on first use)
+        self.response_cache = response_cache
+        self.cache_file = self.output_dir / 'llm_cache.sqlite'
+        self._cache = None
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
 
         # Load existing manifest for incremental processing
         self.manifest_file = self.output_dir / 'manifest.json'
+        self.journal_file = self.output_dir / 'manifest.jsonl'
+        self._journal = None  # Opened on first write
+        self._journal_pending = 0
+        self._journal_last_flush = time.monotonic()
         self.manifest = self.load_manifest()
 
+        # Local (uncommitted) cache of source mtime/size per manifest key, so
+        # unchanged files can be skipped without reading and hashing them
+        self.stat_cache_file = self.output_dir / 'stat_cache.json'
+        self.stat_cache = self._load_stat_cache()
+        self._stat_cache_dirty = False
+
+        # Fold a journal left by an interrupted run into a fresh snapshot now,
+        # so repeated interruptions don't keep growing it
+        if self.journal_file.exists():
+            self.save_manifest()
+
+        # .yard files are written from the in-memory output when each file is saved
+        self.emit_yard = emit_yard
+        self._yard_written = set()
+
+        self.batch_api = batch_api
+        if batch_api and not getattr(self.provider, 'supports_batch_api', False):
+            logger.warning(f"{self.provider_name} has no batch API support, using regular requests")
+            self.batch_api = False
+
         logger.info(f"Documentation generator initialized")
         logger.info(f"Provider: {self.provider_name}")
         logger.info(f"Output directory: {self.output_dir}")
@@ -125,7 +422,7 @@ class Lich5DocumentationGenerator:
             try:
                 # Ensure both paths are resolved to absolute paths for comparison
                 file_path_resolved = file_path.resolve()
-                source_root_resolved = self.source_root.resolve()
+                source_root_resolved = self._resolved_source_root()
 
                 # Get relative path from source root
                 relative_path = file_path_resolved.relative_to(source_root_resolved)
@@ -141,74 +438,254 @@ class Lich5DocumentationGenerator:
             # Flat structure - all files in documented directory
             return self.output_dir / 'documented' / file_path.name
 
+    def _resolved_source_root(self) -> Path:
+        """source_root resolved once rather than per file (redone if it is reassigned)"""
+        root, resolved = self._resolved_root
+        if root is not self.source_root:
+            resolved = self.source_root.resolve()
+            self._resolved_root = (self.source_root, resolved)
+        return resolved
+
     def load_manifest(self) -> dict:
-        """Load the manifest file tracking processed files"""
+        """Load the manifest file tracking processed files, replaying any journal"""
+        manifest = {'processed_files': {}, 'failed_files': [], 'timestamp': datetime.now().isoformat()}
         if self.manifest_file.exists():
             try:
-                with open(self.manifest_file, 'r') as f:
-                    manifest = json.load(f)
+                manifest = _loads_json(self.manifest_file.read_bytes())
                 logger.info(f"Loaded manifest with {len(manifest.get('processed_files', []))} processed files")
-                return manifest
             except Exception as e:
                 logger.warning(f"Failed to load manifest: {e}")
-                return {'processed_files': {}, 'failed_files': [], 'timestamp': datetime.now().isoformat()}
-        return {'processed_files': {}, 'failed_files': [], 'timestamp': datetime.now().isoformat()}
+
+        self._replay_journal(manifest)
+        return manifest
+
+    def _replay_journal(self, manifest: dict):
+        """
+        Apply journal records left by an interrupted run to the manifest
+
+        Records are applied in order, so the last record for a path wins.
+
+        Args:
+            manifest: Manifest dict to update in place
+        """
+        if not self.journal_file.exists():
+            return
+
+        replayed = 0
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = _parse_json_text(line)
+                except ValueError:
+                    # A partial last line from a crash - ignore it
+                    continue
+                if record.get('status') == 'ok':
+                    manifest.setdefault('processed_files', {})[record['path']] = record['entry']
+                else:
+                    failed = manifest.setdefault('failed_files', [])
+                    if record['path'] not in failed:
+                        failed.append(record['path'])
+                replayed += 1
+
+        if replayed:
+            logger.info(f"Replayed {replayed} journal entries from {self.journal_file.name}")
+
+    def _append_journal(self, record: dict):
+        """
+        Append a single manifest update to the journal (caller holds manifest_lock)
+
+        Records are buffered and flushed every JOURNAL_FLUSH_RECORDS records or
+        JOURNAL_FLUSH_SECONDS seconds; save_manifest flushes the rest.
+        """
+        try:
+            if self._journal is None:
+                self._journal = open(self.journal_file, 'a', encoding='utf-8')
+            self._journal.write(json.dumps(record, default=str) + '\n')
+            self._journal_pending += 1
+            if (self._journal_pending >= JOURNAL_FLUSH_RECORDS or
+                    time.monotonic() - self._journal_last_flush >= JOURNAL_FLUSH_SECONDS):
+                self._flush_journal()
+        except Exception as e:
+            logger.error(f"Failed to write manifest journal: {e}")
+
+    def _flush_journal(self):
+        """Write buffered journal records to disk"""
+        with self.manifest_lock:
+            if self._journal is not None:
+                self._journal.flush()
+            self._journal_pending = 0
+            self._journal_last_flush = time.monotonic()
+
+    def _load_stat_cache(self) -> dict:
+        """Load the {path: [mtime_ns, size, content_hash]} stat cache"""
+        if self.stat_cache_file.exists():
+            try:
+                return _loads_json(self.stat_cache_file.read_bytes())
+            except Exception as e:
+                logger.debug(f"Ignoring unreadable stat cache: {e}")
+        return {}
+
+    def _record_stat(self, file_path: Path, content_hash: Optional[str],
+                     st: Optional[os.stat_result] = None):
+        """Remember a source file's mtime/size alongside the hash it was checked against
+
+        Args:
+            file_path: Source file
+            content_hash: Hash of the content that was read
+            st: Stat taken when that content was read (stats the file now if omitted)
+        """
+        if not content_hash:
+            return
+        if st is None:
+            try:
+                st = file_path.stat()
+            except OSError:
+                return
+        with self.manifest_lock:
+            self.stat_cache[str(file_path)] = [st.st_mtime_ns, st.st_size, content_hash]
+            self._stat_cache_dirty = True
 
     def save_manifest(self):
-        """Save the manifest file (thread-safe)"""
+        """
+        Write the full manifest and clear the journal (thread-safe)
+
+        The manifest is written to a temporary file and moved into place so an
+        interrupted save never leaves a truncated manifest.json.
+        """
         with self.manifest_lock:
             try:
-                with open(self.manifest_file, 'w') as f:
-                    json.dump(self.manifest, f, indent=2, default=str)
+                tmp_file = self.manifest_file.with_name(self.manifest_file.name + '.tmp')
+                with open(tmp_file, 'wb') as f:
+                    f.write(_dumps_json(self.manifest))
+                os.replace(tmp_file, self.manifest_file)
+
+                # Everything in the journal is now in manifest.json
+                if self._journal is not None:
+                    self._journal.close()
+                    self._journal = None
+                self._journal_pending = 0
+                if self.journal_file.exists():
+                    self.journal_file.unlink()
             except Exception as e:
                 logger.error(f"Failed to save manifest: {e}")
 
-    def compute_code_hash(self, content: str) -> str:
+            if self._stat_cache_dirty:
+                try:
+                    with open(self.stat_cache_file, 'wb') as f:
+                        f.write(_dumps_json(self.stat_cache, indent=False))
+                    self._stat_cache_dirty = False
+                except Exception as e:
+                    logger.warning(f"Failed to save stat cache: {e}")
+
+    def compute_code_hash(self, content: str, algo: str = HASH_ALGO) -> str:
         """
         Compute hash of Ruby code excluding YARD comments
         This allows us to detect actual code changes vs documentation changes
         """
-        lines = content.split('\n')
-        code_lines = []
-        in_yard_comment = False
+        # One regex pass drops documentation lines; the result equals the kept
+        # lines joined by newlines, except for a newline left before a removed
+        # last line when the content has no trailing newline
+        code = _RE_HASH_DOC_LINE.sub('', content)
+        if code.endswith('\n') and not content.endswith('\n'):
+            code = code[:-1]
+        h = _HASHERS[algo]()
+        h.update(code.encode('utf-8'))
+        return h.hexdigest()[:16]
+
+    def compute_file_hash(self, file_path: Path, algo: str = HASH_ALGO) -> str:
+        """
+        Compute compute_code_hash for a file, streaming it line by line
+
+        Args:
+            file_path: Path to Ruby file
+            algo: Hash algorithm name (a key of _HASHERS)
+
+        Returns:
+            The same hash compute_code_hash gives for the file's content
+        """
+        def lines():
+            with open(file_path, 'r', encoding='utf-8') as f:
+                line = ''
+                for line in f:
+                    yield line[:-1] if line.endswith('\n') else line
+                # split('\n') yields a final empty piece after a trailing newline
+                if line == '' or line.endswith('\n'):
+                    yield ''
+
+        return self._hash_code_lines(lines(), algo)
+
+    @staticmethod
+    def _hash_code_lines(lines, algo: str = HASH_ALGO) -> str:
+        """
+        Hash the code lines of a file, leaving out documentation comments
+
+        Accepted lines are fed to the hash as they are found, joined by newlines,
+        so no filtered copy of the file is built.
+
+        Args:
+            lines: Iterable of lines without their newlines
+            algo: Hash algorithm name (a key of _HASHERS)
+
+        Returns:
+            16 hex digit hash of the code lines
+        """
+        h = _HASHERS[algo]()
+        separator = b''
 
         for line in lines:
             stripped = line.strip()
 
+            if stripped[:1] != '#':
+                # Include actual code lines
+                pass
             # Skip YARD comment blocks
-            if stripped.startswith('#') and any(tag in stripped for tag in ['@param', '@return', '@example', '@note', '@see', '@yield']):
+            elif _RE_HASH_DOC_TAG.search(stripped):
                 continue
-            # Skip regular comment lines that look like documentation
-            elif stripped.startswith('#') and len(stripped) > 1 and stripped[1] == ' ':
-                # But keep shebang and encoding comments
-                if stripped.startswith('#!') or 'coding:' in stripped or 'encoding:' in stripped:
-                    code_lines.append(line)
-            else:
-                # Include actual code lines
-                code_lines.append(line)
+            # Skip regular comment lines that look like documentation,
+            # but keep encoding comments ('coding:' also covers 'encoding:')
+            elif stripped[1:2] == ' ' and 'coding:' not in stripped:
+                continue
+
+            h.update(separator)
+            h.update(line.encode('utf-8'))
+            separator = b'\n'
+
+        return h.hexdigest()[:16]
+
+    def is_file_processed(self, file_path: Path, dir_entry: Optional[os.DirEntry] = None) -> bool:
+        """
+        Check if a file has already been processed and hasn't changed
 
-        # Compute hash of the actual code
-        code_content = '\n'.join(code_lines)
-        return hashlib.sha256(code_content.encode('utf-8')).hexdigest()[:16]
+        Args:
+            file_path: Source file
+            dir_entry: The file's os.DirEntry from a directory walk, whose cached
+                stat is used for the mtime/size check
 
-    def is_file_processed(self, file_path: Path) -> bool:
-        """Check if a file has already been processed and hasn't changed"""
+        Returns:
+            True if the file can be skipped
+        """
         if not self.incremental:
             return False
 
         relative_path = str(file_path)
         if relative_path in self.manifest.get('processed_files', {}):
             logger.info(f"  File found in manifest: {file_path.name} (key: {relative_path})")
+            # Checked before touching the filesystem
+            stored_version = self.manifest['processed_files'][relative_path].get('prompt_version', 1)
+            if stored_version != PROMPT_VERSION:
+                logger.info(f"  Prompt changed (v{stored_version} -> v{PROMPT_VERSION}), reprocessing: {file_path.name}")
+                return False
+
             # Check if output file actually exists in committed documented/ directory
             # Use same logic as get_output_file_path but check repo root documented/
             if self.output_structure == 'mirror' and self.source_root:
                 try:
                     file_path_resolved = file_path.resolve()
-                    source_root_resolved = self.source_root.resolve()
+                    source_root_resolved = self._resolved_source_root()
                     relative_path_from_source = file_path_resolved.relative_to(source_root_resolved)
                     # Check in repo root documented/ directory (committed files)
                     output_file = Path('documented') / relative_path_from_source
-                    logger.debug(f"  Checking: {output_file} (exists: {output_file.exists()})")
+                    logger.debug(f"  Checking: {output_file}")
                 except ValueError as e:
                     output_file = Path('documented') / file_path.name
                     logger.debug(f"  ValueError in path resolution: {e}, using flat: {output_file}")
@@ -221,14 +698,26 @@ class Lich5DocumentationGenerator:
                 logger.debug(f"    Looked for: {output_file.absolute()}")
                 return False
 
+            stored_hash = self.manifest['processed_files'][relative_path].get('content_hash')
+            stored_algo = self.manifest['processed_files'][relative_path].get('hash_algo', 'sha256')
+
+            # Fast path: same mtime and size as when this hash was last verified
+            cached_stat = self.stat_cache.get(relative_path)
+            if cached_stat and stored_hash:
+                try:
+                    st = dir_entry.stat() if dir_entry is not None else file_path.stat()
+                    if cached_stat == [st.st_mtime_ns, st.st_size, stored_hash]:
+                        logger.info(f"  Skipping (unchanged mtime/size): {file_path.name}")
+                        return True
+                except OSError:
+                    pass
+
             # Check if source file has changed by comparing hashes
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
+                    read_stat = os.fstat(f.fileno())
                     current_content = f.read()
-                current_hash = self.compute_code_hash(current_content)
-
-                stored_info = self.manifest['processed_files'][relative_path]
-                stored_hash = stored_info.get('content_hash')
+                current_hash = self.compute_code_hash(current_content, stored_algo)
 
                 # Log hash comparison for debugging
                 logger.info(f"  Hash check for {file_path.name}:")
@@ -239,9 +728,18 @@ class Lich5DocumentationGenerator:
 
                 if current_hash != stored_hash:
                     logger.info(f"  Source file changed, reprocessing: {file_path.name}")
+                    # Keep what was read so processing doesn't open the file again
+                    self._source_contents[relative_path] = current_content
+                    self._source_stats[relative_path] = read_stat
+                    if stored_algo == HASH_ALGO:
+                        self._source_hashes[relative_path] = current_hash
                     return False
                 else:
                     logger.info(f"  Skipping (unchanged): {file_path.name}")
+                    if stored_algo != HASH_ALGO:
+                        current_hash = self._migrate_hash(file_path, current_content)
+                    # Touched but not changed - remember the new mtime/size
+                    self._record_stat(file_path, current_hash, read_stat)
                     return True
 
             except Exception as e:
@@ -252,6 +750,28 @@ class Lich5DocumentationGenerator:
 
         return False
 
+    def _migrate_hash(self, file_path: Path, content: str) -> str:
+        """
+        Rewrite an unchanged file's manifest hash with the current HASH_ALGO
+
+        Args:
+            file_path: Source file (manifest key)
+            content: Its current content
+
+        Returns:
+            The new content hash
+        """
+        new_hash = self.compute_code_hash(content)
+        with self.manifest_lock:
+            relative_path = str(file_path)
+            entry = dict(self.manifest['processed_files'][relative_path])
+            entry['content_hash'] = new_hash
+            entry['hash_algo'] = HASH_ALGO
+            self.manifest['processed_files'][relative_path] = entry
+            self._append_journal({'path': relative_path, 'status': 'ok', 'entry': entry})
+        logger.debug(f"  Migrated hash of {file_path.name} to {HASH_ALGO}")
+        return new_hash
+
     def mark_file_processed(self, file_path: Path, success: bool = True, content: str = None,
                             validation_status: str = None):
         """Mark a file as processed in the manifest with content hash (thread-safe)
@@ -262,28 +782,38 @@ class Lich5DocumentationGenerator:
             content: Optional content for hash computation
             validation_status: Validation result ('passed', 'warnings', 'failed', 'skipped')
         """
+        relative_path = str(file_path)
+        cached_hash = self._source_hashes.pop(relative_path, None)
+        read_stat = self._source_stats.pop(relative_path, None)
+
+        # Compute hash of the source file (without comments) before taking the
+        # lock, so workers don't wait on each other's hashing
+        content_hash = None
+        if success:
+            if content:
+                content_hash = self.compute_code_hash(content)
+                read_stat = None
+            elif cached_hash:
+                content_hash = cached_hash
+            else:
+                read_stat = None
+                try:
+                    content_hash = self.compute_file_hash(file_path)
+                except Exception as e:
+                    logger.warning(f"Could not compute hash for {file_path}: {e}")
+
         with self.manifest_lock:
-            relative_path = str(file_path)
             if success:
                 if 'processed_files' not in self.manifest:
                     self.manifest['processed_files'] = {}
 
-                # Compute hash of the source file (without comments)
-                content_hash = None
-                if content:
-                    content_hash = self.compute_code_hash(content)
-                else:
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content_hash = self.compute_code_hash(f.read())
-                    except Exception as e:
-                        logger.warning(f"Could not compute hash for {file_path}: {e}")
-
                 entry = {
                     'timestamp': datetime.now().isoformat(),
                     'provider': self.provider_name,
                     'content_hash': content_hash,
-                    'file_name': file_path.name
+                    'hash_algo': HASH_ALGO,
+                    'file_name': file_path.name,
+                    'prompt_version': PROMPT_VERSION
                 }
 
                 # Add validation status if provided
@@ -291,14 +821,127 @@ class Lich5DocumentationGenerator:
                     entry['validation_status'] = validation_status
 
                 self.manifest['processed_files'][relative_path] = entry
+                record = {'path': relative_path, 'status': 'ok', 'entry': entry}
+                self._record_stat(file_path, content_hash, read_stat)
             else:
                 if 'failed_files' not in self.manifest:
                     self.manifest['failed_files'] = []
                 if relative_path not in self.manifest['failed_files']:
                     self.manifest['failed_files'].append(relative_path)
+                record = {'path': relative_path, 'status': 'fail'}
+
+            # Journal each file (in case of interruption); save_manifest compacts at the end
+            self._append_journal(record)
+
+    def _cache_key(self, user_prompt: str, system_prompt: str) -> str:
+        """Key for a cached response: provider, model and both prompts"""
+        model = getattr(getattr(self.provider, 'config', None), 'model', '')
+        key_source = '|'.join((self.provider_name, model, system_prompt, user_prompt))
+        return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+
+    def _open_cache(self) -> sqlite3.Connection:
+        """Open the response cache database (caller holds _cache_lock)"""
+        if self._cache is None:
+            self._cache = sqlite3.connect(str(self.cache_file), check_same_thread=False)
+            self._cache.execute('PRAGMA journal_mode=WAL')
+            self._cache.execute(
+                'CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response BLOB, created REAL)'
+            )
+        return self._cache
 
-            # Save manifest after each file (in case of interruption)
-            self.save_manifest()
+    def _cached_generate(self, user_prompt: str, system_prompt: str, use_cache: bool = True) -> str:
+        """
+        Generate a response, returning a stored one for an identical earlier prompt
+
+        Responses are only stored by _store_cached_response once they have been
+        parsed successfully, so a bad response is never replayed.
+
+        Args:
+            user_prompt: The user prompt
+            system_prompt: The system prompt
+            use_cache: Look up the cache before calling the provider
+
+        Returns:
+            Response text
+        """
+        if use_cache:
+            cached = self._lookup_cached_response(user_prompt, system_prompt)
+            if cached is not None:
+                return cached
+
+        if self._rate_limits:
+            # Called from a worker thread; wait for the loop's shared buckets
+            loop, _, token_bucket = self._rate_limits
+            tokens = self._count_prompt_tokens(user_prompt, system_prompt) if token_bucket else 0
+            asyncio.run_coroutine_threadsafe(self._apace_request(tokens), loop).result()
+        return self.provider.generate(user_prompt, system_prompt)
+
+    async def _acached_generate(self, user_prompt: str, system_prompt: str, use_cache: bool = True) -> str:
+        """Async version of _cached_generate, awaiting the provider's agenerate"""
+        if use_cache:
+            cached = await asyncio.to_thread(self._lookup_cached_response, user_prompt, system_prompt)
+            if cached is not None:
+                return cached
+
+        if self._rate_limits:
+            tokens = 0
+            if self._rate_limits[2]:
+                # Exact counting (tiktoken) is CPU work, so keep it off the event loop
+                tokens = await asyncio.to_thread(self._count_prompt_tokens, user_prompt, system_prompt)
+            await self._apace_request(tokens)
+        return await self.provider.agenerate(user_prompt, system_prompt)
+
+    def _count_prompt_tokens(self, user_prompt: str, system_prompt: str) -> int:
+        """Prompt tokens of a request, as counted by the provider"""
+        return self.provider.count_tokens(user_prompt + (system_prompt or ''))
+
+    async def _apace_request(self, tokens: int):
+        """Take one request and its prompt tokens from the shared rate buckets"""
+        if not self._rate_limits:
+            return
+        _, request_bucket, token_bucket = self._rate_limits
+        if request_bucket:
+            await request_bucket.acquire(1)
+        if token_bucket:
+            await token_bucket.acquire(tokens)
+
+    def _lookup_cached_response(self, user_prompt: str, system_prompt: str) -> Optional[str]:
+        """Return the stored response for these prompts, or None (counts hits and misses)"""
+        if not self.response_cache:
+            return None
+
+        key = self._cache_key(user_prompt, system_prompt)
+        try:
+            with self._cache_lock:
+                row = self._open_cache().execute(
+                    'SELECT response FROM responses WHERE key = ?', (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"  Response cache unavailable: {e}")
+            row = None
+
+        if row is not None:
+            self.cache_hits += 1
+            logger.info(f"  Using cached response")
+            return row[0]
+        self.cache_misses += 1
+        return None
+
+    def _store_cached_response(self, user_prompt: str, system_prompt: str, response: str):
+        """Store a successfully parsed response in the cache"""
+        if not self.response_cache:
+            return
+        key = self._cache_key(user_prompt, system_prompt)
+        try:
+            with self._cache_lock:
+                cache = self._open_cache()
+                cache.execute(
+                    'INSERT OR REPLACE INTO responses (key, response, created) VALUES (?, ?, ?)',
+                    (key, response, time.time())
+                )
+                cache.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"  Could not cache response: {e}")
 
     def strip_yard_comments(self, content: str) -> str:
         """
@@ -322,95 +965,80 @@ class Lich5DocumentationGenerator:
         Returns:
             Content with YARD documentation removed
         """
+        # Without a single comment there is nothing to strip - skip the split
+        if '#' not in content:
+            return content
+
         lines = content.split('\n')
+        n = len(lines)
+        stripped = [line.strip() for line in lines]
+
+        # Classify every line once into parallel masks; the scan below only
+        # indexes these instead of re-testing strings during lookahead
+        keep = bytearray(n)        # shebang/encoding/rubocop/:nodoc: directives
+        comment = bytearray(n)     # comment lines
+        yard_tag = bytearray(n)    # comment lines containing any YARD tag
+        doc_tag = bytearray(n)     # comment lines containing a core method tag
+        definition = bytearray(n)  # class/module/def/attr_* lines
+
+        for idx, line in enumerate(lines):
+            s = stripped[idx]
+            if (s.startswith('#!') or 'encoding:' in s or 'coding:' in s or
+                    '# rubocop:' in line or '# :nodoc:' in line or '# @!visibility' in line):
+                keep[idx] = 1
+            if s.startswith('#'):
+                comment[idx] = 1
+                if _RE_YARD_TAG.search(s):
+                    yard_tag[idx] = 1
+                    if _RE_DOC_TAG.search(s):
+                        doc_tag[idx] = 1
+            elif s.startswith(_DEFINITION_KEYWORDS):
+                definition[idx] = 1
+
         result = []
         i = 0
 
-        while i < len(lines):
-            line = lines[i]
-            stripped = line.strip()
-
-            # Keep shebang, encoding, and other special directives
-            if stripped.startswith('#!') or 'encoding:' in stripped or 'coding:' in stripped:
-                result.append(line)
-                i += 1
-                continue
-
-            # Keep rubocop directives and :nodoc:
-            if '# rubocop:' in line or '# :nodoc:' in line or '# @!visibility' in line:
-                result.append(line)
+        while i < n:
+            # Keep shebang, encoding, rubocop directives and :nodoc:
+            if keep[i]:
+                result.append(lines[i])
                 i += 1
                 continue
 
-            # Check if this is a YARD tag line
-            is_yard_tag = stripped.startswith('#') and any(
-                tag in stripped for tag in [
-                    '@param', '@return', '@example', '@raise', '@yield',
-                    '@note', '@see', '@api', '@deprecated', '@since',
-                    '@version', '@attr', '@attr_reader', '@attr_writer'
-                ]
-            )
-
-            if is_yard_tag:
-                # Skip this line and any continuation lines (part of the YARD block)
+            if yard_tag[i]:
+                # Skip this line and any continuation lines (part of the YARD block):
+                # following YARD tag lines and @example code (indented comments)
                 i += 1
-                # Also skip following YARD tag lines and example code
-                while i < len(lines):
-                    next_stripped = lines[i].strip()
-                    # Continue skipping if it's:
-                    # - A YARD tag line
-                    # - Part of an @example block (indented code after @example)
-                    # - A comment line that's part of the doc block
-                    if next_stripped.startswith('#'):
-                        # Check if it's another YARD tag or example code
-                        has_tag = any(tag in next_stripped for tag in [
-                            '@param', '@return', '@example', '@raise', '@yield',
-                            '@note', '@see', '@api', '@deprecated', '@since',
-                            '@version', '@attr', '@attr_reader', '@attr_writer'
-                        ])
-                        if has_tag or next_stripped.startswith('#   '):  # Example code (indented)
-                            i += 1
-                            continue
-                    break
+                while i < n and comment[i] and (yard_tag[i] or stripped[i].startswith('#   ')):
+                    i += 1
                 continue
 
             # Check if this is a description comment line above a definition
             # (part of a YARD doc block without explicit tags)
-            if stripped.startswith('#') and not stripped.startswith('##'):
-                # Look ahead to see if this is followed by a definition
+            if comment[i] and not stripped[i].startswith('##'):
                 j = i + 1
                 is_yard_description = False
 
-                # Skip blank comment lines and other description lines
-                while j < len(lines):
-                    next_line = lines[j].strip()
-
+                while j < n:
                     # If we hit a blank line, keep looking
-                    if not next_line:
+                    if not stripped[j]:
                         j += 1
                         continue
 
                     # If we hit a YARD tag, this is part of a YARD block
-                    if next_line.startswith('#') and any(tag in next_line for tag in [
-                        '@param', '@return', '@example', '@raise', '@yield', '@note'
-                    ]):
+                    if doc_tag[j]:
                         is_yard_description = True
                         break
 
                     # If we hit another comment, it might be more description
-                    if next_line.startswith('#'):
+                    if comment[j]:
                         j += 1
                         if j - i > 10:  # Don't look too far ahead
                             break
                         continue
 
                     # If we hit a definition (class, module, def, attr_*), this is YARD
-                    if any(next_line.startswith(kw) for kw in [
-                        'class ', 'module ', 'def ', 'attr_reader', 'attr_writer', 'attr_accessor'
-                    ]):
-                        is_yard_description = True
-
-                    # Stop looking
+                    is_yard_description = bool(definition[j])
                     break
 
                 if is_yard_description:
@@ -419,39 +1047,13 @@ class Lich5DocumentationGenerator:
                     continue
 
             # Keep this line (it's code or an inline comment)
-            result.append(line)
+            result.append(lines[i])
             i += 1
 
         return '\n'.join(result)
 
-    def create_documentation_prompt(self, file_name: str, content: str) -> tuple[str, str]:
-        """
-        Create prompts for documentation generation
-
-        Args:
-            file_name: Name of the file being documented
-            content: Ruby source code (should already have YARD comments stripped)
-
-        Returns:
-            (system_prompt, user_prompt) tuple
-        """
-        system_prompt = """You are an expert Ruby documentation specialist.
-Your task is to generate YARD-compatible documentation for Ruby code.
-You will return JSON with documentation comments and their anchor points."""
-
-        # Add line numbers to help AI identify exact lines
-        numbered_lines = []
-        for i, line in enumerate(content.split('\n'), start=1):
-            numbered_lines.append(f"{i:4d}: {line}")
-        numbered_content = '\n'.join(numbered_lines)
-
-        user_prompt = f"""Analyze this Ruby file from the Lich5 project: **{file_name}**
-
-```ruby
-{numbered_content}
-```
-
-Generate **YARD-compatible** documentation for every public class, module, method, and constant.
+    # Shared instructions appended to every documentation prompt
+    PROMPT_RULES = """Generate **YARD-compatible** documentation for every public class, module, method, and constant.
 The line numbers are shown at the start of each line (e.g., "  15: def method_name").
 
 **CRITICAL RULES - READ CAREFULLY:**
@@ -502,18 +1104,18 @@ Return a JSON array where each entry contains:
 Example output format:
 ```json
 [
-  {{
+  {
     "line_number": 15,
     "anchor": "class GameObj",
     "indent": 0,
     "comment": "# Represents a game object\\n# @example Creating a game object\\n#   obj = GameObj.new"
-  }},
-  {{
+  },
+  {
     "line_number": 23,
     "anchor": "def initialize",
     "indent": 2,
     "comment": "# Initializes a new game object\\n# @param id [String] The object ID\\n# @param noun [String] The object noun\\n# @return [GameObj]"
-  }}
+  }
 ]
 ```
 
@@ -531,14 +1133,150 @@ IMPORTANT:
 - Your JSON MUST be valid and parseable - test it mentally before returning
 """
 
-        return system_prompt, user_prompt
+    SYSTEM_PROMPT = """You are an expert Ruby documentation specialist.
+Your task is to generate YARD-compatible documentation for Ruby code.
+You will return JSON with documentation comments and their anchor points."""
+
+    @staticmethod
+    def _number_lines(content: str, start: int = 1) -> str:
+        """Prefix each line of content with its line number, starting at start"""
+        return '\n'.join(f"{i:4d}: {line}" for i, line in enumerate(content.split('\n'), start=start))
+
+    def create_documentation_prompt(self, file_name: str, content: str) -> tuple[str, str]:
+        """
+        Create prompts for documentation generation
+
+        Args:
+            file_name: Name of the file being documented
+            content: Ruby source code (should already have YARD comments stripped)
+
+        Returns:
+            (system_prompt, user_prompt) tuple
+        """
+        # Add line numbers to help AI identify exact lines
+        numbered_content = self._number_lines(content)
+
+        user_prompt = f"""Analyze this Ruby file from the Lich5 project: **{file_name}**
+
+```ruby
+{numbered_content}
+```
+
+""" + self.PROMPT_RULES
+
+        return self.SYSTEM_PROMPT, user_prompt
+
+    def _read_source(self, file_path: Path) -> str:
+        """
+        Get a source file's content, reusing what the pre-filter or is_file_processed read
+
+        The code hash is recorded as well, so marking the file processed doesn't
+        re-read it either.
+
+        Args:
+            file_path: Path to Ruby file
+
+        Returns:
+            File content
+        """
+        key = str(file_path)
+        content = self._source_contents.pop(key, None)
+        if content is None:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                self._source_stats[key] = os.fstat(f.fileno())
+                content = f.read()
+            self._source_hashes[key] = self.compute_code_hash(content)
+        elif key not in self._source_hashes:
+            self._source_hashes[key] = self.compute_code_hash(content)
+        return content
+
+    def _prepare_file_prompt(self, file_path: Path) -> tuple:
+        """
+        Read a Ruby file, strip existing YARD comments and build its prompts
+
+        Args:
+            file_path: Path to Ruby file
+
+        Returns:
+            (stripped_content, system_prompt, user_prompt) tuple
+        """
+        original_content = self._read_source(file_path)
+
+        # Get file stats
+        lines = original_content.count('\n') + 1
+        logger.info(f"  Lines: {lines}, Characters: {len(original_content)}")
+
+        # Strip existing YARD comments to prevent duplicates
+        # The LLM will regenerate all documentation from scratch
+        stripped_content = self.strip_yard_comments(original_content)
+        stripped_lines = stripped_content.count('\n') + 1
+        removed_lines = lines - stripped_lines
+        if removed_lines > 0:
+            logger.info(f"  Stripped {removed_lines} lines of existing YARD documentation")
+
+        # Create prompts for JSON-based documentation
+        system_prompt, user_prompt = self.create_documentation_prompt(
+            file_path.name,
+            stripped_content
+        )
+        return stripped_content, system_prompt, user_prompt
+
+    def _apply_response(self, file_path: Path, stripped_content: str, result: str) -> Optional[str]:
+        """
+        Parse an LLM response and insert its comments into the stripped source
+
+        Args:
+            file_path: Path to Ruby file
+            stripped_content: Source with existing YARD comments removed
+            result: Raw LLM response
+
+        Returns:
+            Documented code, or None if the response could not be parsed
+        """
+        # Parse JSON response
+        comments = self.extract_comments_json(result)
+
+        if comments is None:
+            # JSON parsing completely failed - save response for debugging
+            logger.error(f"  No comments extracted from response")
+            logger.error(f"  AI response length: {len(result)} characters")
+            if len(result) < 1000:
+                logger.error(f"  Full AI response: {result}")
+            else:
+                logger.error(f"  AI response (first 500): {result[:500]}")
+                logger.error(f"  AI response (last 500): {result[-500:]}")
+
+            # Save failed response for manual inspection
+            failed_response_file = self.output_dir / f"{file_path.stem}_failed_response.txt"
+            with open(failed_response_file, 'w', encoding='utf-8') as f:
+                f.write(f"Failed to parse JSON for: {file_path.name}\n")
+                f.write(f"AI Response Length: {len(result)} characters\n")
+                f.write("="*80 + "\n")
+                f.write(result)
+            logger.info(f"  Saved failed response to: {failed_response_file.name}")
+
+            self.failed_files.append(file_path.name)
+            return None
 
-    def process_file(self, file_path: Path) -> Optional[str]:
+        if len(comments) == 0:
+            # Empty array is valid - file has nothing to document (e.g., only require statements)
+            logger.info(f"  No documentation needed (file contains only requires/imports)")
+            documented_code = stripped_content
+        else:
+            logger.info(f"  Extracted {len(comments)} documentation entries")
+            # Insert comments into stripped code (not original, to avoid duplicates)
+            documented_code = self.insert_comments(stripped_content, comments)
+
+        logger.info(f"  ✅ Successfully documented {file_path.name}")
+        return documented_code
+
+    def process_file(self, file_path: Path, use_cache: bool = True) -> Optional[str]:
         """
         Process a single Ruby file and generate documentation using JSON-based approach
 
         Args:
             file_path: Path to Ruby file
+            use_cache: Allow a cached response for this prompt (False forces a new request)
 
         Returns:
             Generated documentation or None if failed
@@ -546,74 +1284,52 @@ IMPORTANT:
         logger.info(f"Processing: {file_path.name}")
 
         try:
-            # Read original file
-            with open(file_path, 'r', encoding='utf-8') as f:
-                original_content = f.read()
-
-            # Get file stats
-            lines = len(original_content.split('\n'))
-            logger.info(f"  Lines: {lines}, Characters: {len(original_content)}")
-
-            # Strip existing YARD comments to prevent duplicates
-            # The LLM will regenerate all documentation from scratch
-            stripped_content = self.strip_yard_comments(original_content)
-            stripped_lines = len(stripped_content.split('\n'))
-            removed_lines = lines - stripped_lines
-            if removed_lines > 0:
-                logger.info(f"  Stripped {removed_lines} lines of existing YARD documentation")
-
-            # Create prompts for JSON-based documentation
-            system_prompt, user_prompt = self.create_documentation_prompt(
-                file_path.name,
-                stripped_content
-            )
+            stripped_content, system_prompt, user_prompt = self._prepare_file_prompt(file_path)
 
             # Generate JSON with comments and anchors
             logger.info(f"  Requesting documentation from {self.provider_name}...")
-            result = self.provider.generate(user_prompt, system_prompt)
+            result = self._cached_generate(user_prompt, system_prompt, use_cache)
 
-            # Parse JSON response
-            comments = self.extract_comments_json(result)
+            documented_code = self._apply_response(file_path, stripped_content, result)
+            if documented_code is not None:
+                self._store_cached_response(user_prompt, system_prompt, result)
+            return documented_code
 
-            if comments is None:
-                # JSON parsing completely failed - save response for debugging
-                logger.error(f"  No comments extracted from response")
-                logger.error(f"  AI response length: {len(result)} characters")
-                if len(result) < 1000:
-                    logger.error(f"  Full AI response: {result}")
-                else:
-                    logger.error(f"  AI response (first 500): {result[:500]}")
-                    logger.error(f"  AI response (last 500): {result[-500:]}")
-
-                # Save failed response for manual inspection
-                failed_response_file = self.output_dir / f"{file_path.stem}_failed_response.txt"
-                with open(failed_response_file, 'w', encoding='utf-8') as f:
-                    f.write(f"Failed to parse JSON for: {file_path.name}\n")
-                    f.write(f"AI Response Length: {len(result)} characters\n")
-                    f.write("="*80 + "\n")
-                    f.write(result)
-                logger.info(f"  Saved failed response to: {failed_response_file.name}")
+        except Exception as e:
+            logger.error(f"  ❌ Failed to process {file_path.name}: {e}")
+            import traceback
+            logger.debug(traceback.format_exc())
+            self.failed_files.append(file_path.name)
+            return None
 
-                self.failed_files.append(file_path.name)
-                return None
+    async def _aprocess_file(self, file_path: Path, use_cache: bool = True) -> Optional[str]:
+        """
+        Async version of process_file for providers with a native agenerate
 
-            if len(comments) == 0:
-                # Empty array is valid - file has nothing to document (e.g., only require statements)
-                logger.info(f"  No documentation needed (file contains only requires/imports)")
-                documented_code = stripped_content
-            else:
-                logger.info(f"  Extracted {len(comments)} documentation entries")
-                # Insert comments into stripped code (not original, to avoid duplicates)
-                documented_code = self.insert_comments(stripped_content, comments)
+        Reading and parsing run in worker threads; only the provider request is
+        awaited on the event loop, so it does not occupy a thread while in flight.
 
-            # Store documentation
-            self.documentation[file_path.name] = {
-                'original': original_content,
-                'documented': documented_code,
-                'timestamp': datetime.now().isoformat()
-            }
+        Args:
+            file_path: Path to Ruby file
+            use_cache: Allow a cached response for this prompt (False forces a new request)
 
-            logger.info(f"  ✅ Successfully documented {file_path.name}")
+        Returns:
+            Generated documentation or None if failed
+        """
+        logger.info(f"Processing: {file_path.name}")
+
+        try:
+            stripped_content, system_prompt, user_prompt = \
+                await asyncio.to_thread(self._prepare_file_prompt, file_path)
+
+            logger.info(f"  Requesting documentation from {self.provider_name}...")
+            result = await self._acached_generate(user_prompt, system_prompt, use_cache)
+
+            documented_code = await asyncio.to_thread(
+                self._apply_response, file_path, stripped_content, result
+            )
+            if documented_code is not None:
+                await asyncio.to_thread(self._store_cached_response, user_prompt, system_prompt, result)
             return documented_code
 
         except Exception as e:
@@ -636,42 +1352,12 @@ IMPORTANT:
         Returns:
             Sanitized JSON string with invalid escapes fixed
         """
-        # Simpler approach: find all escape sequences and validate them
-        result = []
-        i = 0
-        while i < len(json_text):
-            if json_text[i] == '\\' and i + 1 < len(json_text):
-                next_char = json_text[i + 1]
-
-                # Check if it's a valid escape
-                if next_char in '"\\/bfnrt':
-                    # Valid single-char escape
-                    result.append('\\')
-                    result.append(next_char)
-                    i += 2
-                elif next_char == 'u' and i + 5 < len(json_text):
-                    # Check for \uXXXX (must be 4 hex digits)
-                    hex_part = json_text[i+2:i+6]
-                    if len(hex_part) == 4 and all(c in '0123456789ABCDEFabcdef' for c in hex_part):
-                        # Valid \uXXXX
-                        result.append('\\u')
-                        result.append(hex_part)
-                        i += 6
-                    else:
-                        # Invalid \u sequence - double-escape it
-                        result.append('\\\\u')
-                        i += 2
-                else:
-                    # Invalid escape - double-escape the backslash
-                    result.append('\\\\')
-                    result.append(next_char)
-                    i += 2
-            else:
-                # Not an escape sequence
-                result.append(json_text[i])
-                i += 1
-
-        return ''.join(result)
+        # One pass over the escape sequences: valid ones (including \\uXXXX) are
+        # kept, any other backslash is doubled so it parses as a literal
+        if '\\' not in json_text:
+            return json_text
+        return _RE_JSON_ESCAPE.sub(
+            lambda m: m.group(0) if m.group(1) else '\\\\' + m.group(2), json_text)
 
     def clean_json_concatenation(self, json_text: str) -> str:
         """
@@ -704,22 +1390,59 @@ IMPORTANT:
             # This regex finds content between quotes, handling escaped quotes
             strings = []
             # Match all "..." segments, including escaped characters
-            for s in re.finditer(r'"((?:[^"\\]|\\.)*)"', match.group(0)):
+            for s in _RE_JSON_STRING.finditer(match.group(0)):
                 strings.append(s.group(1))
 
             # Concatenate all segments into a single JSON string
             # The content is already escaped (e.g., \n for newlines)
             return '"' + ''.join(strings) + '"'
 
-        # Pattern explanation:
+        # Pattern explanation (_RE_JSON_CONCAT):
         # "(?:[^"\\]|\\.)*"  - Match a JSON string (with escaped chars)
         # (?:\s*\+\s*"(?:[^"\\]|\\.)*")+  - Match one or more: whitespace, +, whitespace, string
         # The \s* allows for optional newlines and indentation
-        pattern = r'"(?:[^"\\]|\\.)*"(?:\s*\+\s*"(?:[^"\\]|\\.)*")+'
-
-        cleaned = re.sub(pattern, concat_strings, json_text)
+        cleaned = _RE_JSON_CONCAT.sub(concat_strings, json_text)
         return cleaned
 
+    @staticmethod
+    def _iter_json_candidates(response: str):
+        """
+        Yield (strategy_name, json_text) candidates from an LLM response, in order
+
+        Each regex only runs when the previous candidates failed to parse, so a
+        response with a clean code block never pays for the array scans.
+
+        Args:
+            response: Raw LLM response
+
+        Yields:
+            (strategy_name, json_text) tuples
+        """
+        tried = set()
+
+        # Strategy 1: Try to find JSON code blocks first
+        json_block = _RE_JSON_FENCE.search(response)
+        if json_block:
+            block = json_block.group(1).strip()
+            tried.add(block)
+            yield 'json code block', block
+
+        # Strategy 2: Try to find JSON array directly (greedy match)
+        json_match = _RE_JSON_ARRAY.search(response)
+        if json_match:
+            tried.add(json_match.group(0))
+            yield 'greedy array match', json_match.group(0)
+
+        # Strategy 3: Try to find JSON array (non-greedy)
+        json_match_ng = _RE_JSON_ARRAY_NG.search(response)
+        if json_match_ng and json_match_ng.group(0) not in tried:
+            yield 'non-greedy array match', json_match_ng.group(0)
+
+        # Strategy 4: Last resort - assume the response minus any prose lines is JSON
+        raw = _RE_NONCODE_LINE.sub('', response).strip()
+        if raw:
+            yield 'raw response', raw
+
     def extract_comments_json(self, response: str) -> List[Dict[str, Any]]:
         """
         Extract JSON array of comments from LLM response
@@ -733,7 +1456,7 @@ IMPORTANT:
         # Strategy 0: Try direct JSON parse first (for structured output responses)
         # This handles both wrapped {"comments": [...]} and direct [...] formats
         try:
-            data = json.loads(response.strip())
+            data = _parse_json_text(response.strip())
             # Handle wrapped format from structured outputs
             if isinstance(data, dict) and "comments" in data:
                 logger.debug("Direct JSON parse succeeded (wrapped format)")
@@ -745,29 +1468,10 @@ IMPORTANT:
         except json.JSONDecodeError:
             pass  # Fall through to extraction strategies
 
-        extraction_attempts = []
-
-        # Strategy 1: Try to find JSON code blocks first
-        json_blocks = re.findall(r'```json\s*(.*?)```', response, re.DOTALL)
-        if json_blocks:
-            extraction_attempts.append(('json code block', json_blocks[0].strip()))
-
-        # Strategy 2: Try to find JSON array directly (greedy match)
-        json_match = re.search(r'\[\s*\{.*\}\s*\]', response, re.DOTALL)
-        if json_match:
-            extraction_attempts.append(('greedy array match', json_match.group(0)))
-
-        # Strategy 3: Try to find JSON array (non-greedy)
-        json_match_ng = re.search(r'\[\s*\{.*?\}\s*\]', response, re.DOTALL)
-        if json_match_ng and json_match_ng.group(0) not in [a[1] for a in extraction_attempts]:
-            extraction_attempts.append(('non-greedy array match', json_match_ng.group(0)))
-
-        # Strategy 4: Last resort - assume entire response is JSON
-        if response.strip():
-            extraction_attempts.append(('raw response', response.strip()))
-
         # Try each extraction strategy
-        for strategy_name, json_text in extraction_attempts:
+        attempts = 0
+        for strategy_name, json_text in self._iter_json_candidates(response):
+            attempts += 1
             try:
                 # Step 1: Clean up string concatenation (LLMs sometimes use + operators)
                 cleaned = self.clean_json_concatenation(json_text)
@@ -775,7 +1479,7 @@ IMPORTANT:
                 # Step 2: Sanitize invalid escape sequences
                 sanitized = self.sanitize_json_escapes(cleaned)
 
-                comments = json.loads(sanitized)
+                comments = _parse_json_text(sanitized)
 
                 if not isinstance(comments, list):
                     logger.debug(f"Strategy '{strategy_name}' found non-list JSON, skipping")
@@ -794,7 +1498,7 @@ IMPORTANT:
                 continue
 
         # All strategies failed
-        logger.error(f"Failed to parse JSON response with all {len(extraction_attempts)} strategies")
+        logger.error(f"Failed to parse JSON response with all {attempts} strategies")
         logger.error(f"Response preview (first 500 chars): {response[:500]}")
         logger.error(f"Response preview (last 500 chars): {response[-500:]}")
         return None
@@ -810,86 +1514,8 @@ IMPORTANT:
         Returns:
             True if anchor matches line using Ruby syntax patterns
         """
-        anchor_stripped = anchor.strip()
-        line_stripped = line.strip()
-
-        # Pattern 1: Class/Module definitions
-        # Anchor: "class GameObj" or "module Lich"
-        if anchor_stripped.startswith(('class ', 'module ')):
-            keyword, name = anchor_stripped.split(None, 1)
-            name = name.split('(')[0].strip()  # Remove any params
-            return re.search(rf'^\s*{keyword}\s+{re.escape(name)}\b', line)
-
-        # Pattern 2: Method definitions (instance or class methods)
-        # Anchor: "def method_name" or "def self.method" or "def ClassName.method"
-        if anchor_stripped.startswith('def '):
-            method_sig = anchor_stripped[4:].split('(')[0].strip()
-
-            # Extract the base method name (last part after any dots)
-            if '.' in method_sig:
-                method_name = method_sig.split('.')[-1]
-            else:
-                method_name = method_sig
-
-            # Flexible matching: anchor "def method" should match:
-            # - def method
-            # - def self.method
-            # - def ClassName.method
-            # And anchor "def self.method" should also match all of those
-
-            # Pattern matches: def <optional-qualifier>.<method_name>[?!=]? or []
-            # Where qualifier can be "self", a class name, or nothing
-            # Ruby allows ? ! = at end of method names, and [] for array access
-            if method_name == '[]':
-                # Special case: array access operator
-                pattern = rf'\bdef\s+(?:(?:self|\w+)\.)?\[\]'
-            else:
-                # Regular method, might have ?, !, or = suffix
-                pattern = rf'\bdef\s+(?:(?:self|\w+)\.)?{re.escape(method_name)}[?!=]?'
-
-            if re.search(pattern, line):
-                return True
-
-            # Fallback: exact match of full signature
-            if f'def {method_sig}' in line:
-                return True
-
-            return False
-
-        # Pattern 3: Attribute readers/writers/accessors
-        # Anchor: "attr_reader :mana" or "attr_accessor"
-        if anchor_stripped.startswith('attr_'):
-            # Extract the attribute type and symbol
-            parts = anchor_stripped.split()
-            attr_type = parts[0]  # attr_reader, attr_accessor, etc.
-            if len(parts) > 1:
-                symbol = parts[1].lstrip(':')
-                return re.search(rf'{attr_type}\s+:{re.escape(symbol)}\b', line)
-            else:
-                return attr_type in line
-
-        # Pattern 4: Constants (all caps with =)
-        # Anchor: "CONSTANT_NAME" or "CONSTANT_NAME ="
-        if anchor_stripped.replace('_', '').replace('=', '').strip().isupper():
-            const_name = anchor_stripped.split('=')[0].strip()
-            return re.search(rf'\b{re.escape(const_name)}\s*=', line)
-
-        # Pattern 5: Class variables (@@var) or instance variables (@var)
-        # Anchor: "@@variable" or "@variable"
-        if anchor_stripped.startswith(('@@', '@')):
-            var_name = anchor_stripped.split()[0].split('=')[0].strip()
-            return re.search(rf'{re.escape(var_name)}\s*(=|\|\|=)', line)
-
-        # Fallback: Token-based matching (original approach)
-        # Remove params and clean up
-        anchor_clean = anchor_stripped.split('(')[0].strip()
-        tokens = anchor_clean.split()
-
-        if not tokens:
-            return False
-
-        # Check if all key tokens appear in the line
-        return all(token in line for token in tokens)
+        test, _ = _compile_anchor(anchor.strip())
+        return test(line)
 
     def find_insertion_line(self, lines: List[str], line_number: int, anchor: str,
                            inserted_at_lines: set) -> Optional[int]:
@@ -936,7 +1562,8 @@ IMPORTANT:
 
         # Strategy 3: Search entire file (methods/classes are unique in a file)
         # Start with nearby lines first, then expand outward
-        search_order = []
+        test, required = _compile_anchor(anchor.strip())
+        candidates = self._lines_containing(lines, required)
 
         # Get line_offset from config
         line_offset = 5  # default
@@ -947,23 +1574,17 @@ IMPORTANT:
             except Exception:
                 pass
 
-        # First check nearby lines (±line_offset)
-        for offset in range(-line_offset, line_offset + 1):
-            if offset == 0:
-                continue
-            idx = expected_idx + offset
-            if 0 <= idx < len(lines):
-                search_order.append(idx)
-
-        # Then check rest of file
-        for idx in range(len(lines)):
-            if idx != expected_idx and idx not in search_order:
-                search_order.append(idx)
+        # First check nearby lines (±line_offset), then the rest of the file
+        nearby = [expected_idx + offset for offset in range(-line_offset, line_offset + 1)
+                  if offset != 0 and expected_idx + offset in candidates]
+        nearby_set = set(nearby)
+        search_order = nearby + [idx for idx in sorted(candidates)
+                                 if idx != expected_idx and idx not in nearby_set]
 
         # Search in priority order
         for idx in search_order:
             if idx not in inserted_at_lines:
-                if self.soft_match_anchor(anchor, lines[idx]):
+                if test(lines[idx]):
                     offset = idx - expected_idx
                     if abs(offset) <= line_offset:
                         logger.info(f"Found anchor at line {idx + 1} (expected {line_number}, offset {offset:+d})")
@@ -975,6 +1596,37 @@ IMPORTANT:
         logger.warning(f"Could not find anchor: {anchor[:50]} (expected line {line_number})")
         return None
 
+    @staticmethod
+    def _lines_containing(lines: List[str], text: Optional[str]) -> set:
+        """
+        Indices of lines containing text, found by searching the joined file
+
+        Args:
+            lines: Source code lines
+            text: Text to look for (None matches no line, '' every line)
+
+        Returns:
+            Set of 0-indexed line numbers
+        """
+        if text is None:
+            return set()
+        if not text:
+            return set(range(len(lines)))
+
+        joined = '\n'.join(lines)
+        found = set()
+        line_ends = None
+        pos = joined.find(text)
+        while pos != -1:
+            if line_ends is None:
+                # Start offset of the line after each line, built only once there is a hit
+                line_ends = list(accumulate(len(line) + 1 for line in lines))
+            idx = bisect_right(line_ends, pos)
+            found.add(idx)
+            # Continue from the start of the next line
+            pos = joined.find(text, line_ends[idx]) if idx + 1 < len(lines) else -1
+        return found
+
     def insert_comments(self, original_content: str, comments: List[Dict[str, Any]]) -> str:
         """
         Insert YARD comments into original Ruby code using line numbers + anchor validation
@@ -995,11 +1647,16 @@ IMPORTANT:
         # Track which lines we've already added comments to (by index)
         inserted_at_lines = set()
 
+        # Comment blocks by the index of the line they go before; merged into
+        # the output in one pass at the end, so anchor lookups always see the
+        # original line numbers
+        insertions = {}
+
         # Track which anchors we've already documented to prevent duplicates
         documented_anchors = set()
 
-        # Sort comments by line number (descending) to insert from bottom to top
-        # This prevents line numbers from shifting as we insert
+        # Sort comments by line number (descending); where anchors collide, the
+        # entry for the later line claims it first
         sorted_comments = sorted(comments, key=lambda x: x.get('line_number', 0), reverse=True)
 
         # Process each comment entry
@@ -1041,8 +1698,7 @@ IMPORTANT:
                         comment_lines.append('')
 
                 # Insert the comment block before the anchor line
-                for offset, comment_line in enumerate(comment_lines):
-                    lines.insert(insert_idx + offset, comment_line)
+                insertions[insert_idx] = comment_lines
 
                 # Mark this line as having comments
                 inserted_at_lines.add(insert_idx)
@@ -1056,7 +1712,14 @@ IMPORTANT:
                 logger.error(f"Error inserting comment: {e}")
                 continue
 
-        return '\n'.join(lines)
+        output = []
+        start = 0
+        for idx in sorted(insertions):
+            output.extend(lines[start:idx])
+            output.extend(insertions[idx])
+            start = idx
+        output.extend(lines[start:])
+        return '\n'.join(output)
 
     def _validate_documented_code(self, content: str, filename: str) -> tuple:
         """
@@ -1097,6 +1760,185 @@ IMPORTANT:
                 pass
         return True  # Default to enabled
 
+    def _get_batch_token_budget(self) -> int:
+        """Get the token budget for batching small files (0 disables batching)."""
+        if HAS_CONFIG:
+            try:
+                config = get_config()
+                return config.processing.batch_token_budget
+            except Exception:
+                pass
+        return 0
+
+    def batch_small_files(self, files: List[Path], max_tokens: Optional[int] = None) -> List[List[Path]]:
+        """
+        Group small files so several can be documented in one request
+
+        Sources the pre-filter already read are counted by the provider
+        (tiktoken for OpenAI); others are estimated from file size (~4 bytes
+        per token). Files over half the budget are placed in batches of their own.
+
+        Args:
+            files: Files to group, in processing order
+            max_tokens: Combined token budget per batch (defaults to batch_token_budget)
+
+        Returns:
+            List of batches, each a list of one or more files
+        """
+        budget = self.batch_token_budget if max_tokens is None else max_tokens
+        if budget <= 0:
+            return [[f] for f in files]
+
+        batches = []
+        current = []
+        current_tokens = 0
+        for file_path in files:
+            content = self._source_contents.get(str(file_path))
+            if content is not None:
+                tokens = self.provider.count_tokens(content)
+            else:
+                try:
+                    tokens = file_path.stat().st_size // 4
+                except OSError:
+                    tokens = budget
+
+            if tokens > budget // 2:
+                batches.append([file_path])
+                continue
+
+            if current and current_tokens + tokens > budget:
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(file_path)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def create_batched_prompt(self, files: List[tuple]) -> tuple[str, str]:
+        """
+        Create prompts documenting several files in a single request
+
+        Files are separated by ``=== FILE: name ===`` headers and numbered with
+        one continuous line sequence, so the response uses the same JSON format
+        as a single file and each comment maps back to its file by line number.
+
+        Args:
+            files: List of (file_name, content) tuples, content already stripped
+
+        Returns:
+            (system_prompt, user_prompt) tuple
+        """
+        sections = []
+        start = 1
+        for file_name, content in files:
+            sections.append(f"""=== FILE: {file_name} ===
+```ruby
+{self._number_lines(content, start)}
+```""")
+            start += content.count('\n') + 1
+
+        user_prompt = f"""Analyze these {len(files)} Ruby files from the Lich5 project.
+Line numbers continue from one file to the next; always use the numbers shown.
+
+""" + '\n\n'.join(sections) + '\n\n' + self.PROMPT_RULES
+
+        return self.SYSTEM_PROMPT, user_prompt
+
+    def _save_documented_file(self, file_path: Path, content: str, validation_status: str = None):
+        """Write a documented file to the output directory and mark it processed"""
+        output_file = self.get_output_file_path(file_path)
+        if output_file.parent not in self._created_dirs:
+            output_file.parent.mkdir(exist_ok=True, parents=True)
+            self._created_dirs.add(output_file.parent)
+
+        # Workers write distinct files and each write is atomic, so no lock is needed
+        _atomic_write(output_file, content)
+
+        # Only paths are kept in memory; the source and output are on disk
+        self.documentation[file_path.name] = {
+            'path': str(file_path),
+            'output_path': str(output_file),
+            'timestamp': datetime.now().isoformat()
+        }
+        if self.emit_yard:
+            self._write_yard(file_path.name, content)
+            self._yard_written.add(file_path.name)
+
+        # Only recorded once the complete output is in place
+        self.mark_file_processed(file_path, success=True, validation_status=validation_status)
+
+    def _process_batch(self, files: List[Path], index: int, total: int) -> tuple:
+        """
+        Document a batch of small files with a single provider request
+
+        Files missing from the response, or whose result fails validation, are
+        returned for the caller to retry individually, so those requests can be
+        dispatched concurrently rather than one after another in this worker.
+
+        Args:
+            files: Files in the batch
+            index: 1-based position of the first file in the overall run
+            total: Total number of files in the run
+
+        Returns:
+            (processed_count, retry_files) tuple
+        """
+        logger.info(f"[{index}-{index + len(files) - 1}/{total}] Processing batch of {len(files)} files")
+
+        try:
+            stripped = [self.strip_yard_comments(self._read_source(f)) for f in files]
+
+            system_prompt, user_prompt = self.create_batched_prompt(
+                [(f.name, content) for f, content in zip(files, stripped)]
+            )
+            logger.info(f"  Requesting documentation from {self.provider_name}...")
+            result = self._cached_generate(user_prompt, system_prompt)
+            comments = self.extract_comments_json(result)
+            if comments is not None:
+                self._store_cached_response(user_prompt, system_prompt, result)
+        except Exception as e:
+            logger.warning(f"  Batch request failed ({e}), processing files individually")
+            comments = None
+
+        if comments is None:
+            return 0, list(files)
+
+        # Split comments back into their files using each file's first line number
+        starts = []
+        start = 1
+        for content in stripped:
+            starts.append(start)
+            start += content.count('\n') + 1
+
+        per_file = [[] for _ in files]
+        for comment in comments:
+            try:
+                line_number = int(comment.get('line_number', 0))
+            except (TypeError, ValueError):
+                continue
+            slot = bisect_right(starts, line_number) - 1
+            if slot >= 0:
+                per_file[slot].append(dict(comment, line_number=line_number - starts[slot] + 1))
+
+        processed = 0
+        retry_files = []
+        for i, file_path in enumerate(files):
+            documented_code = self.insert_comments(stripped[i], per_file[i]) if per_file[i] else stripped[i]
+            validation_status, _ = self._validate_documented_code(documented_code, file_path.name)
+            if validation_status == 'failed' or (not per_file[i] and _RE_DEFINITION.search(stripped[i])):
+                # Invalid result, or definitions the model skipped - use a dedicated request
+                retry_files.append(file_path)
+                continue
+
+            self._save_documented_file(file_path, documented_code, validation_status)
+            logger.info(f"  ✅ Successfully documented {file_path.name}")
+            processed += 1
+
+        return processed, retry_files
+
     def _process_single_file(self, file_path: Path, index: int, total: int) -> bool:
         """Process a single file (used for parallel processing)"""
         try:
@@ -1105,45 +1947,15 @@ IMPORTANT:
             result = self.process_file(file_path)
             if result:
                 # Validate before saving
-                validation_status, validation_result = self._validate_documented_code(
-                    result, file_path.name
-                )
-
-                # If validation failed and retry is enabled, try once more
-                if validation_status == 'failed' and self._get_retry_on_failure():
-                    logger.warning(f"  Validation failed for {file_path.name}, retrying...")
-                    if validation_result:
-                        for error in validation_result.errors[:3]:  # Show first 3 errors
-                            logger.warning(f"    Error: {error.message}")
-
-                    # Regenerate documentation
-                    result = self.process_file(file_path)
-                    if result:
-                        validation_status, validation_result = self._validate_documented_code(
-                            result, file_path.name
-                        )
-                        if validation_status == 'failed':
-                            logger.warning(f"  Validation still failed after retry for {file_path.name}")
-
-                # Log validation result
-                if validation_status == 'passed':
-                    logger.info(f"  Validation: passed")
-                elif validation_status == 'warnings':
-                    logger.info(f"  Validation: passed with {len(validation_result.warnings)} warnings")
-                elif validation_status == 'failed':
-                    logger.warning(f"  Validation: failed with {len(validation_result.errors)} errors (saving anyway)")
-                # 'skipped' - no log needed
-
-                # Save documented file
-                output_file = self.get_output_file_path(file_path)
-                output_file.parent.mkdir(exist_ok=True, parents=True)
-
-                with self.file_lock:
-                    with open(output_file, 'w', encoding='utf-8') as f:
-                        f.write(result)
-
-                # Mark file as successfully processed with validation status
-                self.mark_file_processed(file_path, success=True, validation_status=validation_status)
+                validation, retry = self._check_validation(file_path, result)
+                if retry:
+                    # Regenerate documentation (bypassing the cached response)
+                    retried = self.process_file(file_path, use_cache=False)
+                    if retried:
+                        result = retried
+                        validation = self._recheck_validation(file_path, result)
+
+                self._finish_single_file(file_path, result, *validation)
                 return True
             else:
                 # Mark file as failed
@@ -1154,33 +1966,489 @@ IMPORTANT:
             self.mark_file_processed(file_path, success=False)
             return False
 
-    def _process_files_parallel(self, files: List[Path]) -> int:
-        """Process multiple files in parallel"""
-        processed_count = 0
+    async def _aprocess_single_file(self, file_path: Path, index: int, total: int) -> bool:
+        """Async version of _process_single_file for providers with a native agenerate"""
+        try:
+            logger.info(f"[{index}/{total}] Processing: {file_path.name}")
+
+            result = await self._aprocess_file(file_path)
+            if result:
+                # Validation runs the YARD subprocess, so it stays off the event loop
+                validation, retry = await asyncio.to_thread(self._check_validation, file_path, result)
+                if retry:
+                    retried = await self._aprocess_file(file_path, use_cache=False)
+                    if retried:
+                        result = retried
+                        validation = await asyncio.to_thread(self._recheck_validation, file_path, result)
+
+                await asyncio.to_thread(self._finish_single_file, file_path, result, *validation)
+                return True
+            else:
+                await asyncio.to_thread(self.mark_file_processed, file_path, success=False)
+                return False
+        except Exception as e:
+            logger.error(f"Error processing {file_path.name}: {e}")
+            await asyncio.to_thread(self.mark_file_processed, file_path, success=False)
+            return False
+
+    def _check_validation(self, file_path: Path, result: str) -> tuple:
+        """
+        Validate documented code and decide whether to regenerate it
+
+        Returns:
+            ((validation_status, validation_result), retry) tuple
+        """
+        validation_status, validation_result = self._validate_documented_code(result, file_path.name)
+
+        # If validation failed and retry is enabled, try once more
+        retry = validation_status == 'failed' and self._get_retry_on_failure()
+        if retry:
+            logger.warning(f"  Validation failed for {file_path.name}, retrying...")
+            if validation_result:
+                for error in validation_result.errors[:3]:  # Show first 3 errors
+                    logger.warning(f"    Error: {error.message}")
+        return (validation_status, validation_result), retry
+
+    def _recheck_validation(self, file_path: Path, result: str) -> tuple:
+        """Validate a regenerated result -> (validation_status, validation_result)"""
+        validation_status, validation_result = self._validate_documented_code(result, file_path.name)
+        if validation_status == 'failed':
+            logger.warning(f"  Validation still failed after retry for {file_path.name}")
+        return validation_status, validation_result
+
+    def _finish_single_file(self, file_path: Path, result: str, validation_status: str,
+                            validation_result):
+        """Log the validation outcome and save the documented file"""
+        if validation_status == 'passed':
+            logger.info(f"  Validation: passed")
+        elif validation_status == 'warnings':
+            logger.info(f"  Validation: passed with {len(validation_result.warnings)} warnings")
+        elif validation_status == 'failed':
+            logger.warning(f"  Validation: failed with {len(validation_result.errors)} errors (saving anyway)")
+        # 'skipped' - no log needed
+
+        # Save documented file and mark it processed with validation status
+        self._save_documented_file(file_path, result, validation_status)
+
+    def _handle_one(self, file_path: Path, index: int = 1, total: int = 1) -> bool:
+        """
+        Document one file unless the manifest says it is up to date
+
+        Args:
+            file_path: Source file
+            index: 1-based position in the run (for logging)
+            total: Total number of files in the run
+
+        Returns:
+            True if the file is documented (now or previously), False on failure
+        """
+        if self.is_file_processed(file_path):
+            logger.info(f"Skipping (already processed): {file_path.name}")
+            return True
+        return self._process_single_file(file_path, index, total)
+
+    def _create_rate_buckets(self) -> tuple:
+        """
+        Build (requests, tokens) per-minute buckets from the provider config
+
+        Must be called with the event loop running. Either bucket is None when
+        the provider has no corresponding limit.
+        """
+        config = getattr(self.provider, 'config', None)
+        rpm = getattr(config, 'requests_per_minute', None)
+        tpm = getattr(config, 'tokens_per_minute', None)
+
+        # Allow a burst of one request per worker, then pace at the RPM limit
+        request_bucket = AsyncTokenBucket(rpm / 60, min(rpm, self.parallel_workers)) if rpm else None
+        # The token budget refills over a minute, so allow up to a minute's worth at once
+        token_bucket = AsyncTokenBucket(tpm / 60, tpm) if tpm else None
+        return request_bucket, token_bucket
+
+    async def _aprocess_files(self, files: List[Path]) -> int:
+        """
+        Process multiple files concurrently on the event loop
+
+        Each file runs in a worker thread (provider calls are blocking), unless
+        the provider has a native async agenerate, in which case only file I/O
+        and parsing use threads. At most ``parallel_workers`` requests are in
+        flight at once, fewer after the provider reports rate limit errors
+        (halved per error, then recovering gradually). Requests are also paced
+        by token buckets built from the provider's requests/tokens per minute limits,
+        taken before every provider call (validation retries included).
+
+        Args:
+            files: Files to process
+
+        Returns:
+            Number of files processed successfully
+        """
         total_files = len(files)
+        concurrency = AdaptiveConcurrency(self.parallel_workers)
+        loop = asyncio.get_running_loop()
+        # Size the default executor to match the concurrency cap
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.parallel_workers))
+
+        self._rate_limits = (loop, *self._create_rate_buckets())
+        native_async = getattr(self.provider, 'supports_async', False)
+
+        async def run_request(batch: List[Path], index: int) -> tuple:
+            """Run one request under the concurrency and rate limits -> (processed, retry_files)"""
+            await concurrency.acquire()
+            try:
+                if len(batch) == 1:
+                    if native_async:
+                        ok = await self._aprocess_single_file(batch[0], index, total_files)
+                    else:
+                        ok = await asyncio.to_thread(self._process_single_file, batch[0], index, total_files)
+                    return int(ok), []
+                return await asyncio.to_thread(self._process_batch, batch, index, total_files)
+            finally:
+                await concurrency.release(getattr(self.provider, 'rate_limit_hits', 0))
+
+        async def process_one(batch: List[Path], index: int) -> int:
+            processed, retry_files = await run_request(batch, index)
+            if retry_files:
+                # Files a batch could not cover get their own requests, dispatched together
+                retried = await asyncio.gather(
+                    *(run_request([f], index + batch.index(f)) for f in retry_files)
+                )
+                processed += sum(count for count, _ in retried)
+            return processed
+
+        batches = self.batch_small_files(files)
+        indexes = []
+        index = 1
+        for batch in batches:
+            indexes.append(index)
+            index += len(batch)
+        if len(batches) < len(files):
+            logger.info(f"Grouped {len(files)} files into {len(batches)} requests")
+
+        try:
+            results = await asyncio.gather(
+                *(process_one(batch, i) for batch, i in zip(batches, indexes)),
+                return_exceptions=True
+            )
+        finally:
+            self._rate_limits = None
+            try:
+                await self.provider.aclose()
+            except Exception as e:
+                logger.warning(f"Could not close async client: {e}")
+
+        processed_count = 0
+        for batch, result in zip(batches, results):
+            names = ', '.join(f.name for f in batch)
+            if isinstance(result, BaseException):
+                logger.error(f"Exception processing {names}: {result}")
+            elif result:
+                processed_count += int(result)
+                logger.info(f"✓ Completed: {names}")
+            else:
+                logger.warning(f"✗ Failed: {names}")
+
+        return processed_count
+
+    def _process_files_parallel(self, files: List[Path]) -> int:
+        """
+        Process multiple files in parallel
+
+        With a single worker and no request batching there is nothing to
+        overlap, so files are processed inline without starting an event loop.
+
+        Args:
+            files: Files to process
+
+        Returns:
+            Number of files processed successfully
+        """
+        if (self.parallel_workers <= 1 and self.batch_token_budget <= 0) or len(files) == 1:
+            return sum(self._process_single_file(file_path, i, len(files))
+                       for i, file_path in enumerate(files, 1))
 
         logger.info(f"Starting parallel processing with {self.parallel_workers} workers...")
+        # The shared rate buckets replace the provider's one-request-at-a-time interval wait
+        self.provider.paced_externally = True
+        try:
+            return asyncio.run(self._aprocess_files(files))
+        finally:
+            self.provider.paced_externally = False
+
+    @staticmethod
+    def _iter_source_files(directory: Path, pattern: str = "*.rb"):
+        """
+        Walk a directory tree with os.scandir, yielding files whose name matches pattern
+
+        Equivalent to Path.rglob(pattern) for simple name patterns, but yields
+        paths as they are found instead of after the whole tree is walked.
+
+        Args:
+            directory: Root directory to walk
+            pattern: fnmatch-style file name pattern (default: *.rb)
+
+        Yields:
+            Path for each matching file
+        """
+        for entry in Lich5DocumentationGenerator._iter_source_entries(directory, pattern):
+            yield Path(entry.path)
+
+    @staticmethod
+    def _iter_source_entries(directory: Path, pattern: str = "*.rb",
+                             exclusions: Sequence[str] = ()):
+        """
+        Walk a directory tree like _iter_source_files, yielding os.DirEntry objects
+
+        Entries cache their stat result, so the incremental check can reuse
+        what the directory listing already returned (free on Windows, one
+        cached call elsewhere).
+
+        Args:
+            directory: Root directory to walk
+            pattern: fnmatch-style file name pattern (default: *.rb)
+            exclusions: Path substrings (with '/' separators) to exclude.
+                Directories whose path already contains one are not entered,
+                since every file below them would be excluded anyway.
+
+        Yields:
+            os.DirEntry for each matching file
+        """
+        stack = [str(directory)]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    subdirs = []
+                    for entry in entries:
+                        # Like rglob, don't descend into symlinked directories (avoids cycles)
+                        if entry.is_dir(follow_symlinks=False):
+                            dir_str = entry.path.replace('\\', '/') + '/'
+                            if any(exclusion in dir_str for exclusion in exclusions):
+                                logger.info(f"Skipping excluded directory: {entry.path}")
+                                continue
+                            subdirs.append(entry.path)
+                        elif fnmatch.fnmatchcase(entry.name, pattern):
+                            yield entry
+            except OSError as e:
+                logger.warning(f"Cannot scan {current}: {e}")
+                continue
+            # Visit subdirectories in listing order
+            stack.extend(reversed(subdirs))
+
+    def _process_files_batch_api(self, files: List[Path]) -> int:
+        """
+        Document files through the provider's asynchronous batch API
+
+        Prompts with a stored response are answered from the response cache;
+        the rest are submitted as one batch job and the results applied when it
+        completes. Files without a usable result, including every file of a
+        batch that fails, are retried with regular requests.
+
+        Args:
+            files: Files to process
+
+        Returns:
+            Number of files processed successfully
+        """
+        prepared = {}
+        requests = []
+        responses = {}
+        for file_path in files:
+            logger.info(f"Preparing: {file_path.name}")
+            try:
+                stripped_content, system_prompt, user_prompt = self._prepare_file_prompt(file_path)
+            except Exception as e:
+                logger.error(f"  ❌ Failed to read {file_path.name}: {e}")
+                self.failed_files.append(file_path.name)
+                self.mark_file_processed(file_path, success=False)
+                continue
+            key = str(file_path)
+            prepared[key] = (file_path, stripped_content, system_prompt, user_prompt)
+            cached = self._lookup_cached_response(user_prompt, system_prompt)
+            if cached is not None:
+                responses[key] = cached
+            else:
+                requests.append((key, user_prompt, system_prompt))
+
+        if requests:
+            try:
+                batch_id = self.provider.submit_batch(requests)
+                logger.info(f"Waiting for batch {batch_id} ({len(requests)} files, may take up to 24h)...")
+                responses.update(self.provider.wait_for_batch(batch_id))
+            except Exception as e:
+                # The files without a response below fall back to regular requests
+                logger.error(f"Batch API failed, using regular requests instead: {e}")
+
+        processed = 0
+        retry_files = []
+        for key, (file_path, stripped_content, system_prompt, user_prompt) in prepared.items():
+            result = responses.get(key)
+            documented_code = None
+            if result is not None:
+                documented_code = self._apply_response(file_path, stripped_content, result)
+
+            if documented_code:
+                validation_status, _ = self._validate_documented_code(documented_code, file_path.name)
+                if validation_status != 'failed':
+                    self._store_cached_response(user_prompt, system_prompt, result)
+                    self._save_documented_file(file_path, documented_code, validation_status)
+                    processed += 1
+                    continue
+
+            # Missing, unparseable or invalid - the retry decides whether it failed
+            if file_path.name in self.failed_files:
+                self.failed_files.remove(file_path.name)
+            retry_files.append(file_path)
+
+        if retry_files:
+            logger.info(f"Retrying {len(retry_files)} files with regular requests")
+            processed += self._process_files_parallel(retry_files)
+
+        return processed
+
+    def _confirm(self, question: str) -> bool:
+        """
+        Ask a yes/no question, without blocking unattended runs
+
+        Returns True straight away with assume_yes, and False (with an error)
+        when stdin is not a terminal, so CI never hangs waiting for input.
+        """
+        if self.assume_yes:
+            return True
+        if not sys.stdin.isatty():
+            logger.error("Confirmation required but stdin is not a terminal; "
+                         "rerun with --yes to continue unattended")
+            return False
+        return input(question).strip().lower() == 'y'
+
+    def _prefilter_file(self, file_path: Path, dir_entry: Optional[os.DirEntry] = None) -> bool:
+        """
+        is_file_processed, also reading a file that will be processed
 
-        with ThreadPoolExecutor(max_workers=self.parallel_workers) as executor:
-            # Submit all tasks
-            future_to_file = {
-                executor.submit(self._process_single_file, file, i, total_files): file
-                for i, file in enumerate(files, 1)
-            }
+        The content, stat and code hash are kept for _group_duplicate_files and
+        _read_source, so each source is read once per run. Changed files were
+        already read by the check.
 
-            # Process completed futures
-            for future in as_completed(future_to_file):
-                file_path = future_to_file[future]
+        Args:
+            file_path: Source file
+            dir_entry: The file's os.DirEntry from the directory walk
+
+        Returns:
+            True if the file can be skipped
+        """
+        if self.is_file_processed(file_path, dir_entry):
+            return True
+
+        key = str(file_path)
+        content = self._source_contents.get(key)
+        if content is None:
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    read_stat = os.fstat(f.fileno())
+                    content = f.read()
+            except (OSError, UnicodeDecodeError):
+                # Processing reports the unreadable file
+                return False
+            self._source_contents[key] = content
+            self._source_stats[key] = read_stat
+        if key not in self._source_hashes:
+            self._source_hashes[key] = self.compute_code_hash(content)
+        return False
+
+    def _group_duplicate_files(self, files: List[Path]) -> tuple:
+        """
+        Split out files whose code is identical to an earlier file in the list
+
+        Files are grouped by the code hash recorded by _prefilter_file. That hash
+        ignores comments, so a copy only counts as a duplicate when its stripped
+        source (what is prompted) also matches; otherwise it is processed itself.
+        Content kept by the pre-filter is compared, so nothing is read again.
+
+        Args:
+            files: Files to process
+
+        Returns:
+            (unique_files, duplicates) tuple, where duplicates maps each file
+            that is still processed to (identical files that reuse its output,
+            its manifest entry before this run)
+        """
+        def stripped_source(file_path: Path) -> str:
+            # Put the content back so processing still finds it
+            content = self._read_source(file_path)
+            self._source_contents[str(file_path)] = content
+            return self.strip_yard_comments(content)
+
+        unique_files = []
+        duplicates = {}
+        # Code hash -> [(representative, its stripped source or None until needed)]
+        firsts_by_hash = {}
+        for file_path in files:
+            content_hash = self._source_hashes.get(str(file_path))
+            if not content_hash:
+                unique_files.append(file_path)
+                continue
+            candidates = firsts_by_hash.setdefault(content_hash, [])
+            first = None
+            if candidates:
                 try:
-                    if future.result():
-                        processed_count += 1
-                        logger.info(f"✓ Completed: {file_path.name}")
-                    else:
-                        logger.warning(f"✗ Failed: {file_path.name}")
-                except Exception as e:
-                    logger.error(f"Exception processing {file_path.name}: {e}")
+                    stripped = stripped_source(file_path)
+                    for i, (candidate, candidate_stripped) in enumerate(candidates):
+                        if candidate_stripped is None:
+                            candidate_stripped = stripped_source(candidate)
+                            candidates[i] = (candidate, candidate_stripped)
+                        if candidate_stripped == stripped:
+                            first = candidate
+                            break
+                except (OSError, UnicodeDecodeError):
+                    # Let processing report the unreadable file
+                    pass
+            if first is None:
+                candidates.append((file_path, None))
+                unique_files.append(file_path)
+            else:
+                duplicates.setdefault(first, []).append(file_path)
+                # Its source is never prompted, so drop the copy kept by the pre-filter
+                self._source_contents.pop(str(file_path), None)
 
-        return processed_count
+        if not duplicates:
+            return unique_files, {}
+
+        count = sum(len(copies) for copies in duplicates.values())
+        logger.info(f"Found {count} duplicate files; each reuses the output of its first copy")
+        with self.manifest_lock:
+            processed_files = self.manifest.get('processed_files', {})
+            return unique_files, {first: (copies, processed_files.get(str(first)))
+                                  for first, copies in duplicates.items()}
+
+    def _save_duplicate_outputs(self, duplicates: Dict[Path, tuple]) -> int:
+        """
+        Give identical files the documented output of the copy that was processed
+
+        Args:
+            duplicates: Mapping from _group_duplicate_files
+
+        Returns:
+            Number of duplicate files saved
+        """
+        saved = 0
+        for first, (copies, previous_entry) in duplicates.items():
+            # A successful run replaces the file's manifest entry
+            with self.manifest_lock:
+                entry = self.manifest.get('processed_files', {}).get(str(first))
+            if entry is None or entry is previous_entry:
+                # The processed copy failed; its duplicates are retried next run
+                for file_path in copies:
+                    logger.error(f"  ❌ Skipped duplicate of failed file: {file_path}")
+                    self.failed_files.append(file_path.name)
+                    self.mark_file_processed(file_path, success=False)
+                continue
+
+            with open(self.get_output_file_path(first), encoding='utf-8') as f:
+                documented_code = f.read()
+            for file_path in copies:
+                self._save_documented_file(file_path, documented_code, entry.get('validation_status'))
+                logger.info(f"  ✅ Reused output of {first} for duplicate: {file_path}")
+                saved += 1
+        return saved
 
     def process_directory(self, directory: Path, pattern: str = "*.rb") -> Dict[str, Any]:
         """
@@ -1195,9 +2463,6 @@ IMPORTANT:
         """
         logger.info(f"Processing directory: {directory}")
 
-        # Find all Ruby files recursively
-        all_ruby_files = list(directory.rglob(pattern))
-
         # Get exclusion patterns from config
         exclusion_patterns = ['/critranks/', '/creatures/']  # defaults
         if HAS_CONFIG:
@@ -1207,14 +2472,20 @@ IMPORTANT:
             except Exception as e:
                 logger.debug(f"Could not load exclusions from config: {e}")
 
-        # Exclude directories based on config patterns
+        # Find all Ruby files recursively, excluding directories based on config patterns
         ruby_files = []
-        for f in all_ruby_files:
-            path_str = str(f).replace('\\', '/')
-            if not any(pattern in path_str for pattern in exclusion_patterns):
-                ruby_files.append(f)
+        dir_entries = []
+        excluded_count = 0
+        for entry in self._iter_source_entries(directory, pattern, exclusion_patterns):
+            # Excluded directories are pruned by the walk; this catches
+            # patterns that only match part of a file name
+            path_str = entry.path.replace('\\', '/')
+            if any(exclusion in path_str for exclusion in exclusion_patterns):
+                excluded_count += 1
+            else:
+                ruby_files.append(Path(entry.path))
+                dir_entries.append(entry)
 
-        excluded_count = len(all_ruby_files) - len(ruby_files)
         if excluded_count > 0:
             logger.info(f"Excluded {excluded_count} files matching patterns: {exclusion_patterns}")
 
@@ -1231,18 +2502,21 @@ IMPORTANT:
 
             if not feasibility['can_complete_today']:
                 logger.warning("Job may exceed daily quota. Consider processing in batches.")
-                response = input("Continue anyway? (y/n): ")
-                if response.lower() != 'y':
+                if not self._confirm("Continue anyway? (y/n): "):
                     return {'processed': 0, 'failed': 0}
 
         # Process files (parallel or sequential based on settings)
         start_time = time.time()
         processed = 0
 
-        # Filter out already processed files
+        # Filter out already processed files. The checks are independent and
+        # mostly disk-bound (stat, read, hash), so they run on a thread pool.
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 2)) as executor:
+            already_processed = list(executor.map(self._prefilter_file, ruby_files, dir_entries))
+
         files_to_process = []
-        for file_path in ruby_files:
-            if self.is_file_processed(file_path):
+        for file_path, skip in zip(ruby_files, already_processed):
+            if skip:
                 processed += 1  # Count as processed
                 logger.info(f"Skipping (already processed): {file_path.name}")
             else:
@@ -1253,30 +2527,17 @@ IMPORTANT:
         logger.info(f"Parallel workers: {self.parallel_workers}")
 
         if files_to_process:
-            if self.parallel_workers > 1 and len(files_to_process) > 1:
-                # Parallel processing
-                processed += self._process_files_parallel(files_to_process)
-            else:
-                # Sequential processing
-                for i, file_path in enumerate(files_to_process, 1):
-                    logger.info(f"\n[{i}/{len(files_to_process)}] Processing: {file_path.name}")
-
-                    result = self.process_file(file_path)
-                    if result:
-                        processed += 1
-
-                        # Save documented file
-                        output_file = self.get_output_file_path(file_path)
-                        output_file.parent.mkdir(exist_ok=True, parents=True)
-
-                        with open(output_file, 'w', encoding='utf-8') as f:
-                            f.write(result)
-
-                        # Mark file as successfully processed
-                        self.mark_file_processed(file_path, success=True)
-                    else:
-                        # Mark file as failed
-                        self.mark_file_processed(file_path, success=False)
+            # Identical files are documented once and share the result
+            files_to_process, duplicates = self._group_duplicate_files(files_to_process)
+            try:
+                if self.batch_api:
+                    processed += self._process_files_batch_api(files_to_process)
+                else:
+                    processed += self._process_files_parallel(files_to_process)
+                processed += self._save_duplicate_outputs(duplicates)
+            finally:
+                # On an interrupted run, get buffered records to disk for the next run to replay
+                self._flush_journal()
 
         # Calculate statistics
         elapsed_time = time.time() - start_time
@@ -1289,42 +2550,70 @@ IMPORTANT:
             'failed_files': self.failed_files
         }
 
+        # Fold the journal into manifest.json
+        self.save_manifest()
+
         # Save metadata
         metadata_file = self.output_dir / 'metadata.json'
-        with open(metadata_file, 'w') as f:
-            json.dump({
-                'stats': stats,
-                'documentation': {k: {'timestamp': v['timestamp']} for k, v in self.documentation.items()},
-                'provider_stats': self.provider.get_stats()
-            }, f, indent=2)
+        _atomic_write(metadata_file, _dumps_json({
+            'stats': stats,
+            'documentation': {k: {'timestamp': v['timestamp']} for k, v in self.documentation.items()},
+            'provider_stats': self.get_provider_stats()
+        }))
 
         return stats
 
+    def _write_yard(self, file_name: str, documented_code: str):
+        """
+        Write the YARD comments of a documented file to yard/<file_name>.yard
+
+        Nothing is written when the file has no comments.
+
+        Args:
+            file_name: Source file name
+            documented_code: Documented source
+        """
+        # Extract only YARD comments with one scan over the output
+        yard_comments = _RE_COMMENT.findall(documented_code)
+        if yard_comments:
+            yard_dir = self.output_dir / 'yard'
+            if yard_dir not in self._created_dirs:
+                yard_dir.mkdir(exist_ok=True)
+                self._created_dirs.add(yard_dir)
+            output_file = yard_dir / f"{file_name}.yard"
+            output_file.write_text('\n'.join(yard_comments), encoding='utf-8')
+            logger.info(f"  Generated YARD: {output_file.name}")
+
     def generate_yard_docs(self):
-        """Generate YARD documentation files from the documented code"""
+        """Generate YARD documentation files from the documented code
+
+        Files already handled during processing (emit_yard) are skipped; the
+        rest are read back from their written output.
+        """
         logger.info("Generating YARD documentation...")
 
         yard_dir = self.output_dir / 'yard'
         yard_dir.mkdir(exist_ok=True)
 
-        for file_name, doc_data in self.documentation.items():
-            documented_code = doc_data['documented']
-
-            # Extract only YARD comments
-            yard_comments = []
-            for line in documented_code.split('\n'):
-                if line.strip().startswith('#'):
-                    yard_comments.append(line)
+        def write_yard(item):
+            file_name, doc_data = item
+            with open(doc_data['output_path'], encoding='utf-8') as f:
+                self._write_yard(file_name, f.read())
 
-            if yard_comments:
-                output_file = yard_dir / f"{file_name}.yard"
-                with open(output_file, 'w') as f:
-                    f.write('\n'.join(yard_comments))
-
-                logger.info(f"  Generated YARD: {output_file.name}")
+        pending = [item for item in self.documentation.items() if item[0] not in self._yard_written]
+        # Extraction and writes overlap across threads; list() surfaces any errors
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+            list(executor.map(write_yard, pending))
 
         logger.info(f"YARD documentation saved to: {yard_dir}")
 
+    def get_provider_stats(self) -> Dict[str, Any]:
+        """Provider statistics plus response cache counters"""
+        stats = self.provider.get_stats()
+        stats['cache_hits'] = self.cache_hits
+        stats['cache_misses'] = self.cache_misses
+        return stats
+
     def print_summary(self, stats: Dict[str, Any]):
         """Print a summary of the documentation generation"""
         print("\n" + "="*60)
@@ -1342,9 +2631,11 @@ IMPORTANT:
                 print(f"  - {file}")
 
         # Show provider stats
-        provider_stats = self.provider.get_stats()
+        provider_stats = self.get_provider_stats()
         print(f"\nProvider statistics:")
         print(f"  Requests: {provider_stats['requests']}")
+        if self.response_cache:
+            print(f"  Cache hits/misses: {provider_stats['cache_hits']}/{provider_stats['cache_misses']}")
         if 'daily_requests' in provider_stats:
             print(f"  Daily requests: {provider_stats['daily_requests']}")
         if 'estimated_cost' in provider_stats:
@@ -1398,6 +2689,27 @@ def main():
         '--config',
         help='Path to config.yaml file (default: config.yaml in repo root)'
     )
+    parser.add_argument(
+        '--batch-tokens',
+        type=int,
+        help='Batch small files into one request up to this many estimated tokens (0 = off)'
+    )
+    parser.add_argument(
+        '--batch-api',
+        action='store_true',
+        help='Submit all prompts through the provider batch API (OpenAI, Anthropic: ~50%% cheaper, results within 24h)'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not reuse cached LLM responses (llm_cache.sqlite in the output directory)'
+    )
+    parser.add_argument(
+        '--yes', '-y', '--no-confirm',
+        dest='yes',
+        action='store_true',
+        help='Do not ask for confirmation (e.g. when a job may exceed the daily quota)'
+    )
     parser.add_argument(
         '--no-incremental',
         action='store_true',
@@ -1465,25 +2777,23 @@ def main():
         output_dir=args.output,
         force_rebuild=force_rebuild,
         output_structure=args.output_structure,
-        source_root=source_root
+        source_root=source_root,
+        batch_token_budget=args.batch_tokens,
+        response_cache=not args.no_cache,
+        batch_api=args.batch_api,
+        assume_yes=args.yes,
+        emit_yard=args.yard
     )
 
     # Process input
     if args.file:
-        # Single file mode
-        result = generator.process_file(input_path)
-        if result:
+        # Single file mode - same skip check, validation and atomic write as directory mode
+        success = generator._handle_one(input_path)
+        generator.save_manifest()
+        if success:
             output_file = generator.get_output_file_path(input_path)
-            output_file.parent.mkdir(exist_ok=True, parents=True)
-
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(result)
-
             logger.info(f"Documentation saved to: {output_file}")
 
-            # Mark file as processed
-            generator.mark_file_processed(input_path, success=True)
-
             print(f"✅ Successfully documented: {input_path.name}")
             print(f"📄 Output: {output_file}")
         else:
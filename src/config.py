@@ -15,6 +15,9 @@ import yaml
 
 logger = logging.getLogger(__name__)
 
+# libyaml's safe loader when PyYAML was built with it (same results, parsed in C)
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
 
 @dataclass
 class PathsConfig:
@@ -31,6 +34,7 @@ class ProcessingConfig:
     exclusions: List[str] = field(default_factory=lambda: ["/critranks/", "/creatures/"])
     file_pattern: str = "*.rb"
     output_structure: str = "mirror"
+    batch_token_budget: int = 0
 
 
 @dataclass
@@ -42,6 +46,7 @@ class ProviderConfig:
     parallel_workers: int = 1
     requests_per_minute: int = 60
     requests_per_day: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
     cost_per_1m_input: float = 0.0
     cost_per_1m_output: float = 0.0
     structured_output: bool = True
@@ -138,7 +143,7 @@ class ConfigManager:
         logger.info(f"Loading configuration from {cls._config_path}")
 
         with open(cls._config_path, 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
+            data = yaml.load(f, Loader=_YAML_LOADER)
 
         cls._instance = cls._parse_config(data)
         return cls._instance
@@ -188,6 +193,7 @@ class ConfigManager:
             exclusions=processing_data.get('exclusions', ['/critranks/', '/creatures/']),
             file_pattern=processing_data.get('file_pattern', '*.rb'),
             output_structure=processing_data.get('output_structure', 'mirror'),
+            batch_token_budget=processing_data.get('batch_token_budget', 0),
         )
 
         # Parse providers
@@ -202,6 +208,7 @@ class ConfigManager:
                 parallel_workers=provider_data.get('parallel_workers', 1),
                 requests_per_minute=provider_data.get('requests_per_minute', 60),
                 requests_per_day=provider_data.get('requests_per_day'),
+                tokens_per_minute=provider_data.get('tokens_per_minute'),
                 cost_per_1m_input=provider_data.get('cost_per_1m_input', 0.0),
                 cost_per_1m_output=provider_data.get('cost_per_1m_output', 0.0),
                 structured_output=provider_data.get('structured_output', True),
@@ -5,10 +5,12 @@ High-quality documentation generation using Claude models
 
 import os
 import json
+import asyncio
 import logging
+import random
 import time
-from typing import Optional
-from .base import LLMProvider, ProviderConfig
+from typing import Dict, List, Optional, Tuple
+from .base import LLMProvider, ProviderConfig, build_http_client
 
 # Import config for structured output settings
 try:
@@ -64,9 +66,24 @@ def _get_json_schema() -> dict:
     }
 
 
+# Forces the model to answer through the documentation tool
+_TOOL_CHOICE = {"type": "tool", "name": "generate_yard_documentation"}
+
+
 class AnthropicProvider(LLMProvider):
     """Anthropic Claude provider for high-quality documentation generation"""
 
+    supports_batch_api = True
+    supports_async = True
+
+    # Message Batches API requests are billed at half the synchronous price
+    BATCH_DISCOUNT = 0.5
+
+    # Rate limit retries with exponential backoff (5s, 10s, 20s); config.yaml's
+    # max_retries and base_retry_delay override these
+    MAX_RETRIES = 3
+    BASE_RETRY_DELAY = 5
+
     def __init__(self, config: Optional[ProviderConfig] = None):
         # Default configuration for Claude 3 Haiku (cheapest, fastest)
         if config is None:
@@ -105,9 +122,39 @@ class AnthropicProvider(LLMProvider):
                 "Get your API key at: https://console.anthropic.com/"
             )
 
-        self.client = anthropic_client.Anthropic(api_key=api_key)
+        # One pooled connection set shared by all worker threads
+        http_client = build_http_client(config.max_connections)
+        if http_client is not None:
+            self.client = anthropic_client.Anthropic(api_key=api_key, http_client=http_client)
+        else:
+            self.client = anthropic_client.Anthropic(api_key=api_key)
+
+        # Async client for the event-loop dispatcher (created on first use per loop)
+        self._api_key = api_key
+        self.async_client = None
+        self._async_loop = None
+
+        # Tool definition for structured output, shared by every request
+        self._tools = [{
+            "name": "generate_yard_documentation",
+            "description": "Generate YARD documentation comments for Ruby code. Returns structured JSON with line numbers, anchors, indentation, and comment content.",
+            "input_schema": _get_json_schema()
+        }]
+
+        # Per submitted batch: (batch custom_id -> caller's custom_id, use_structured)
+        self._batches = {}
         logger.info(f"[OK] Using Anthropic provider with {config.model}")
 
+    @property
+    def max_retries(self) -> int:
+        """Attempts per request when rate limited"""
+        return self.config.max_retries or self.MAX_RETRIES
+
+    @property
+    def base_retry_delay(self) -> float:
+        """First backoff delay in seconds when the API gives no Retry-After"""
+        return self.config.base_retry_delay or self.BASE_RETRY_DELAY
+
     def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
         """
         Generate documentation using Claude with retry logic for rate limits
@@ -123,103 +170,275 @@ class AnthropicProvider(LLMProvider):
         self._enforce_rate_limit()
 
         # Retry logic with exponential backoff for rate limits
-        max_retries = 3
-        base_delay = 5  # Start with 5 seconds
+        for attempt in range(self.max_retries):
+            try:
+                kwargs, use_structured = self._build_request(prompt, system_prompt)
+
+                # Generate response
+                response = self.client.messages.create(**kwargs)
 
-        for attempt in range(max_retries):
+                return self._handle_response(response, use_structured, prompt)
+
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        """
+        Generate documentation with the async Anthropic client
+
+        Args:
+            prompt: The user prompt
+            system_prompt: Optional system prompt (used as system parameter in Claude)
+
+        Returns:
+            Generated documentation text
+        """
+        # Pacing comes from the caller's shared rate buckets; just count the request
+        with self.rate_limit_lock:
+            self._count_request()
+
+        # One client per event loop (connections can't cross loops); the
+        # dispatcher closes it with aclose when its requests are done
+        loop = asyncio.get_running_loop()
+        if self.async_client is None or self._async_loop is not loop:
+            self._async_loop = loop
+            http_client = build_http_client(self.config.max_connections, asynchronous=True)
+            if http_client is not None:
+                self.async_client = anthropic_client.AsyncAnthropic(api_key=self._api_key,
+                                                                    http_client=http_client)
+            else:
+                self.async_client = anthropic_client.AsyncAnthropic(api_key=self._api_key)
+
+        for attempt in range(self.max_retries):
             try:
-                # Check if structured output is enabled
-                use_structured = _get_structured_output_enabled()
-
-                # Create message with proper format for Claude
-                messages = [{"role": "user", "content": prompt}]
-
-                # Create the request
-                kwargs = {
-                    "model": self.config.model,
-                    "max_tokens": self.config.max_tokens,
-                    "temperature": self.config.temperature,
-                    "messages": messages
-                }
-
-                # Add system prompt if provided
-                if system_prompt:
-                    kwargs["system"] = system_prompt
-
-                if use_structured:
-                    logger.info(f"Sending request to Claude ({self.request_count} total) with tool use")
-                    schema = _get_json_schema()
-
-                    # Add tool for structured output
-                    kwargs["tools"] = [{
-                        "name": "generate_yard_documentation",
-                        "description": "Generate YARD documentation comments for Ruby code. Returns structured JSON with line numbers, anchors, indentation, and comment content.",
-                        "input_schema": schema
-                    }]
-                    # Force the model to use the tool
-                    kwargs["tool_choice"] = {"type": "tool", "name": "generate_yard_documentation"}
-
-                    # Generate response
-                    response = self.client.messages.create(**kwargs)
-
-                    # Extract from tool use response
-                    result_text = None
-                    for block in response.content:
-                        if block.type == "tool_use" and block.name == "generate_yard_documentation":
-                            # The tool input is already parsed - convert back to JSON string
-                            result_text = json.dumps(block.input)
-                            break
-
-                    if result_text is None:
-                        # Fallback: try to get text response
-                        for block in response.content:
-                            if hasattr(block, 'text'):
-                                result_text = block.text
-                                break
-
-                    if result_text is None:
-                        raise Exception("No valid response from Claude tool use")
-                else:
-                    logger.info(f"Sending request to Claude ({self.request_count} total requests)")
-
-                    # Generate response without tool use
-                    response = self.client.messages.create(**kwargs)
-
-                    # Extract text from response
-                    result_text = response.content[0].text
-
-                # Track usage and costs
-                input_tokens = response.usage.input_tokens if hasattr(response, 'usage') else len(prompt) // 4
-                output_tokens = response.usage.output_tokens if hasattr(response, 'usage') else len(result_text) // 4
-
-                self._track_cost(prompt, result_text)
-
-                # Log token usage
-                logger.info(f"Claude response: {input_tokens} input tokens, {output_tokens} output tokens")
-
-                return result_text
+                kwargs, use_structured = self._build_request(prompt, system_prompt)
+                response = await self.async_client.messages.create(**kwargs)
+                return self._handle_response(response, use_structured, prompt)
+
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    def _build_request(self, prompt: str, system_prompt: Optional[str] = None) -> tuple:
+        """
+        Build messages.create arguments
+
+        Args:
+            prompt: The user prompt
+            system_prompt: Optional system prompt
+
+        Returns:
+            (kwargs, use_structured) tuple
+        """
+        # Check if structured output is enabled
+        use_structured = _get_structured_output_enabled()
+
+        # Create message with proper format for Claude
+        messages = [{"role": "user", "content": prompt}]
+
+        # Create the request
+        kwargs = {
+            "model": self.config.model,
+            "max_tokens": self.config.max_tokens,
+            "temperature": self.config.temperature,
+            "messages": messages
+        }
+
+        # Add system prompt if provided
+        if system_prompt:
+            kwargs["system"] = system_prompt
+
+        if use_structured:
+            logger.info(f"Sending request to Claude ({self.request_count} total) with tool use")
+
+            # Add tool for structured output (built once; the SDK only reads it)
+            kwargs["tools"] = self._tools
+            # Force the model to use the tool
+            kwargs["tool_choice"] = _TOOL_CHOICE
+        else:
+            logger.info(f"Sending request to Claude ({self.request_count} total requests)")
+
+        return kwargs, use_structured
+
+    def _handle_response(self, response, use_structured: bool, prompt: str) -> str:
+        """
+        Extract the result text from a Claude response and track its cost
+
+        Args:
+            response: Response from messages.create
+            use_structured: Whether the request forced the documentation tool
+            prompt: The user prompt (for cost estimates)
 
+        Returns:
+            Generated documentation text
+        """
+        result_text = self._extract_text(response, use_structured)
+
+        # Track usage and costs
+        input_tokens = response.usage.input_tokens if hasattr(response, 'usage') else len(prompt) // 4
+        output_tokens = response.usage.output_tokens if hasattr(response, 'usage') else len(result_text) // 4
+
+        self._track_cost(prompt, result_text)
+
+        # Log token usage
+        logger.info(f"Claude response: {input_tokens} input tokens, {output_tokens} output tokens")
+
+        return result_text
+
+    def _extract_text(self, response, use_structured: bool) -> str:
+        """
+        Get the result text from a Claude message
+
+        Args:
+            response: Message from messages.create or a batch result
+            use_structured: Whether the request forced the documentation tool
+
+        Returns:
+            Generated documentation text
+        """
+        if use_structured:
+            # Extract from tool use response
+            result_text = None
+            for block in response.content:
+                if block.type == "tool_use" and block.name == "generate_yard_documentation":
+                    # The tool input is already parsed - convert back to JSON string
+                    result_text = json.dumps(block.input)
+                    break
+
+            if result_text is None:
+                # Fallback: try to get text response
+                for block in response.content:
+                    if hasattr(block, 'text'):
+                        result_text = block.text
+                        break
+
+            if result_text is None:
+                raise Exception("No valid response from Claude tool use")
+        else:
+            # Extract text from response
+            result_text = response.content[0].text
+
+        return result_text
+
+    def submit_batch(self, requests: List[Tuple[str, str, Optional[str]]]) -> str:
+        """
+        Create a Message Batches job with one request per prompt
+
+        Batch custom IDs only allow letters, digits, '-' and '_' (max 64), so
+        requests are numbered and mapped back to the caller's IDs on collection.
+
+        Args:
+            requests: List of (custom_id, prompt, system_prompt) tuples
+
+        Returns:
+            Anthropic batch ID
+        """
+        id_map = {}
+        batch_requests = []
+        use_structured = False
+        for index, (custom_id, prompt, system_prompt) in enumerate(requests):
+            params, use_structured = self._build_request(prompt, system_prompt)
+            batch_custom_id = f"req-{index}"
+            id_map[batch_custom_id] = custom_id
+            batch_requests.append({"custom_id": batch_custom_id, "params": params})
+
+        batch = self.client.messages.batches.create(requests=batch_requests)
+        self._batches[batch.id] = (id_map, use_structured)
+        self.request_count += len(requests)
+        logger.info(f"Submitted Anthropic batch {batch.id} with {len(requests)} requests")
+        return batch.id
+
+    def wait_for_batch(self, batch_id: str, poll_interval: float = 30,
+                       max_poll_interval: float = 600) -> Dict[str, str]:
+        """
+        Poll a Message Batches job with exponential backoff and collect its responses
+
+        Args:
+            batch_id: ID returned by submit_batch
+            poll_interval: Initial seconds between status checks
+            max_poll_interval: Upper bound on seconds between status checks
+
+        Returns:
+            Dict mapping custom_id to response text (failed requests are omitted)
+        """
+        id_map, use_structured = self._batches.pop(batch_id)
+
+        delay = poll_interval
+        while True:
+            batch = self.client.messages.batches.retrieve(batch_id)
+            # Canceled and expired requests are reported per request in the results
+            if batch.processing_status == "ended":
+                break
+
+            counts = batch.request_counts
+            logger.info(f"Batch {batch_id}: {batch.processing_status} "
+                        f"({counts.processing} still processing), checking again in {delay:.0f}s")
+            time.sleep(delay)
+            delay = min(delay * 2, max_poll_interval)
+
+        results = {}
+        for entry in self.client.messages.batches.results(batch_id):
+            custom_id = id_map.get(entry.custom_id, entry.custom_id)
+            if entry.result.type != "succeeded":
+                logger.warning(f"Batch request {custom_id} {entry.result.type}: "
+                               f"{getattr(entry.result, 'error', '')}")
+                continue
+
+            message = entry.result.message
+            try:
+                results[custom_id] = self._extract_text(message, use_structured)
             except Exception as e:
-                error_str = str(e)
-                logger.error(f"Anthropic API error: {error_str}")
-
-                # Check for rate limit errors
-                if "rate_limit" in error_str.lower() or "429" in error_str:
-                    if attempt < max_retries - 1:
-                        # Exponential backoff: 5s, 10s, 20s
-                        delay = base_delay * (2 ** attempt)
-                        logger.warning(f"Rate limited. Retrying in {delay} seconds... (attempt {attempt + 1}/{max_retries})")
-                        time.sleep(delay)
-                        continue
-                    else:
-                        logger.error(f"Max retries ({max_retries}) reached. Still getting rate limited.")
-                        raise Exception(
-                            f"Anthropic rate limit exceeded after {max_retries} retries. "
-                            f"Try reducing request frequency or upgrading your plan."
-                        )
-
-                # Re-raise other errors
-                raise
+                logger.warning(f"Batch request {custom_id} returned no usable content: {e}")
+                continue
+
+            if self.config.cost_per_1m_input and self.config.cost_per_1m_output:
+                self.estimated_cost += self.BATCH_DISCOUNT * (
+                    message.usage.input_tokens * self.config.cost_per_1m_input / 1_000_000 +
+                    message.usage.output_tokens * self.config.cost_per_1m_output / 1_000_000
+                )
+
+        logger.info(f"Collected {len(results)} responses from batch {batch_id}")
+        return results
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Decide whether a failed request is retried
+
+        Args:
+            error: The exception raised by the request
+            attempt: 0-based attempt number
+
+        Returns:
+            Seconds to wait before retrying, or None to re-raise the error
+        """
+        error_str = str(error)
+        logger.error(f"Anthropic API error: {error_str}")
+
+        # Check for rate limit errors
+        if self._check_rate_limit_error(error):
+            if attempt < self.max_retries - 1:
+                # Wait as long as the API asks, else back off exponentially
+                # (5s, 10s, 20s); up to 10% jitter keeps concurrent workers
+                # that were limited together from retrying together
+                delay = self._retry_after(error)
+                if delay is None:
+                    delay = self.base_retry_delay * (2 ** attempt)
+                delay += random.uniform(0, delay * 0.1)
+                logger.warning(f"Rate limited. Retrying in {delay:.1f} seconds... (attempt {attempt + 1}/{self.max_retries})")
+                return delay
+            logger.error(f"Max retries ({self.max_retries}) reached. Still getting rate limited.")
+            raise Exception(
+                f"Anthropic rate limit exceeded after {self.max_retries} retries. "
+                f"Try reducing request frequency or upgrading your plan."
+            )
+
+        # Re-raise other errors
+        return None
 
     def get_info(self) -> dict:
         """Get provider information"""
@@ -3,8 +3,10 @@ Base LLM Provider Abstract Class
 Provides common interface for all LLM providers
 """
 
+import asyncio
+import importlib.util
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import time
 import logging
 import threading
@@ -26,15 +28,64 @@ class ProviderConfig:
     # Rate limiting
     requests_per_minute: Optional[int] = None
     requests_per_day: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
 
     # Cost tracking
     cost_per_1m_input: Optional[float] = None
     cost_per_1m_output: Optional[float] = None
 
+    # Connection pooling (None uses build_http_client's default)
+    max_connections: Optional[int] = None
+
+    # Rate limit retries (None uses the provider's defaults)
+    max_retries: Optional[int] = None
+    base_retry_delay: Optional[float] = None
+
+
+def build_http_client(max_connections: Optional[int] = None, asynchronous: bool = False):
+    """
+    Create a pooled HTTP client to hand to an SDK provider
+
+    Parallel workers share one provider, so a single client with keep-alive
+    connections sized for the worker pool lets concurrent requests reuse TCP
+    and TLS sessions instead of reconnecting. Every pooled connection is kept
+    alive so a burst of workers never closes sockets the next burst needs.
+    HTTP/2 is enabled when the h2 package is installed. httpx ships with the
+    OpenAI and Anthropic SDKs; returns None if it is unavailable so the SDK
+    default is used.
+
+    Args:
+        max_connections: Maximum simultaneous connections (default 64)
+        asynchronous: Build an httpx.AsyncClient for an SDK's async client
+
+    Returns:
+        httpx.Client (or httpx.AsyncClient), or None
+    """
+    try:
+        import httpx
+    except ImportError:
+        return None
+    max_connections = max_connections or 64
+    client_class = httpx.AsyncClient if asynchronous else httpx.Client
+    return client_class(
+        # Responses arrive whole, so a long generation sends nothing until it
+        # finishes; allow as long as the SDKs' own default (10 minutes)
+        timeout=httpx.Timeout(600.0, connect=10.0),
+        limits=httpx.Limits(max_connections=max_connections,
+                            max_keepalive_connections=max_connections),
+        http2=importlib.util.find_spec("h2") is not None,
+    )
+
 
 class LLMProvider(ABC):
     """Abstract base class for LLM providers"""
 
+    # Providers with an asynchronous batch endpoint override submit_batch/wait_for_batch
+    supports_batch_api = False
+
+    # Providers with a native async client override agenerate and set this
+    supports_async = False
+
     def __init__(self, config: ProviderConfig):
         self.config = config
         self.request_count = 0
@@ -43,6 +94,10 @@ class LLMProvider(ABC):
         self.estimated_cost = 0.0
         # Thread safety for rate limiting
         self.rate_limit_lock = threading.Lock()
+        # Set while a caller paces requests with its own shared token buckets
+        self.paced_externally = False
+        # Rate limit errors seen from the API (read by the adaptive dispatcher)
+        self.rate_limit_hits = 0
 
     @abstractmethod
     def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
@@ -58,22 +113,144 @@ class LLMProvider(ABC):
         """
         pass
 
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        """
+        Generate documentation without blocking the event loop
+
+        The default runs generate in a worker thread. Providers with an async
+        SDK client override this so requests in flight need no thread.
+
+        Args:
+            prompt: The user prompt
+            system_prompt: Optional system prompt for context
+
+        Returns:
+            Generated text response
+        """
+        return await asyncio.to_thread(self.generate, prompt, system_prompt)
+
+    async def aclose(self):
+        """
+        Close the async client agenerate created, if any
+
+        Called by the dispatcher on its event loop once all requests finish,
+        since the client's connections cannot be reused by another loop.
+        """
+        client = getattr(self, 'async_client', None)
+        if client is None:
+            return
+        self.async_client = None
+        self._async_loop = None
+        await client.close()
+
+    def submit_batch(self, requests: List[Tuple[str, str, Optional[str]]]) -> str:
+        """
+        Submit many prompts as one asynchronous batch job
+
+        Args:
+            requests: List of (custom_id, prompt, system_prompt) tuples
+
+        Returns:
+            Provider batch ID
+        """
+        raise NotImplementedError(f"{self.config.name} does not support a batch API")
+
+    def wait_for_batch(self, batch_id: str) -> Dict[str, str]:
+        """
+        Wait for a batch job to finish and collect its responses
+
+        Args:
+            batch_id: ID returned by submit_batch
+
+        Returns:
+            Dict mapping custom_id to response text (failed requests are omitted)
+        """
+        raise NotImplementedError(f"{self.config.name} does not support a batch API")
+
     def _enforce_rate_limit(self):
-        """Enforce rate limits if configured (thread-safe)"""
+        """Enforce rate limits if configured (thread-safe)
+
+        The interval wait holds the lock, so it serializes concurrent workers.
+        When paced_externally is set the caller's shared buckets already enforce
+        the per-minute limit, and only the daily limit is checked here.
+        """
         with self.rate_limit_lock:
-            if self.config.requests_per_minute:
+            if self.config.requests_per_minute and not self.paced_externally:
                 elapsed = time.time() - self.last_request_time
                 if elapsed < 60 / self.config.requests_per_minute:
                     sleep_time = (60 / self.config.requests_per_minute) - elapsed
                     logger.debug(f"Rate limiting: sleeping for {sleep_time:.2f}s")
                     time.sleep(sleep_time)
 
-            if self.config.requests_per_day and self.daily_request_count >= self.config.requests_per_day:
-                raise Exception(f"Daily request limit ({self.config.requests_per_day}) reached")
+            self._count_request()
+
+    def _count_request(self):
+        """Check the daily limit and count a request (caller holds rate_limit_lock)
+
+        Async callers are paced by the generator's shared token buckets, so
+        they count requests here without the blocking per-request interval.
+        """
+        if self.config.requests_per_day and self.daily_request_count >= self.config.requests_per_day:
+            raise Exception(f"Daily request limit ({self.config.requests_per_day}) reached")
+
+        self.last_request_time = time.time()
+        self.request_count += 1
+        self.daily_request_count += 1
+
+    def _check_rate_limit_error(self, error: Exception) -> bool:
+        """Count error if it is an API rate limit (HTTP 429) and say whether it was
 
-            self.last_request_time = time.time()
-            self.request_count += 1
-            self.daily_request_count += 1
+        SDK status errors (OpenAI, Anthropic) carry the HTTP status code; other
+        errors fall back to matching the message.
+        """
+        status_code = getattr(error, 'status_code', None)
+        if status_code is not None:
+            is_rate_limit = status_code == 429
+        else:
+            error_str = str(error).lower()
+            is_rate_limit = ("429" in error_str or "rate_limit" in error_str
+                             or "resource exhausted" in error_str)
+        if is_rate_limit:
+            self.rate_limit_hits += 1
+        return is_rate_limit
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        """
+        Seconds the API asked the client to wait, from an SDK status error's headers
+
+        Args:
+            error: Exception raised by the request
+
+        Returns:
+            Delay from retry-after-ms or retry-after (in seconds), or None if
+            the error has no such header
+        """
+        headers = getattr(getattr(error, 'response', None), 'headers', None)
+        if not headers:
+            return None
+        for name, scale in (('retry-after-ms', 0.001), ('retry-after', 1.0)):
+            value = headers.get(name)
+            if value is None:
+                continue
+            try:
+                return max(0.0, float(value) * scale)
+            except ValueError:
+                # An HTTP date rather than seconds; fall back to the backoff
+                continue
+        return None
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Count the tokens text will use, for sizing batches and rate limit budgets
+
+        Args:
+            text: Prompt or source text
+
+        Returns:
+            Token count (an estimate unless the provider has an exact tokenizer)
+        """
+        return self._estimate_tokens(text)
 
     def _estimate_tokens(self, text: str) -> int:
         """Rough estimation of token count"""
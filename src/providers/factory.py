@@ -42,8 +42,13 @@ def _build_provider_config(provider_name: str) -> ProviderConfig:
             temperature=cfg.temperature,
             requests_per_minute=cfg.requests_per_minute,
             requests_per_day=cfg.requests_per_day,
+            tokens_per_minute=cfg.tokens_per_minute,
             cost_per_1m_input=cfg.cost_per_1m_input,
             cost_per_1m_output=cfg.cost_per_1m_output,
+            # Room for every worker plus its retry without waiting on the pool
+            max_connections=max(1, cfg.parallel_workers) * 2,
+            max_retries=cfg.max_retries,
+            base_retry_delay=cfg.base_retry_delay,
         )
     except (KeyError, AttributeError) as e:
         logger.debug(f"Could not load config for {provider_name}: {e}")
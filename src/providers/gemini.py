@@ -157,8 +157,8 @@ class GeminiProvider(LLMProvider):
             full_prompt = prompt
 
         # Retry logic with exponential backoff for 429 errors
-        max_retries = 5
-        base_delay = 30  # Start with 30 seconds (more conservative)
+        max_retries = self.config.max_retries or 5
+        base_delay = self.config.base_retry_delay or 30  # Start with 30 seconds (more conservative)
 
         for attempt in range(max_retries):
             try:
@@ -209,7 +209,7 @@ class GeminiProvider(LLMProvider):
                 logger.error(f"Gemini API error: {error_str}")
 
                 # Check for rate limit errors (429)
-                if "429" in error_str or "resource exhausted" in error_str.lower():
+                if self._check_rate_limit_error(e):
                     if attempt < max_retries - 1:
                         # Exponential backoff: 30s, 60s, 120s, 240s, 480s
                         delay = base_delay * (2 ** attempt)
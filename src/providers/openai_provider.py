@@ -4,9 +4,13 @@ Backup option when Gemini quality isn't sufficient
 """
 
 import os
+import json
+import asyncio
+import time
 import logging
-from typing import Optional
-from .base import LLMProvider, ProviderConfig
+import functools
+from typing import Dict, List, Optional, Tuple
+from .base import LLMProvider, ProviderConfig, build_http_client
 
 # Import config for structured output settings
 try:
@@ -17,8 +21,28 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Optional exact token counting
+try:
+    import tiktoken
+    HAS_TIKTOKEN = True
+except ImportError:
+    HAS_TIKTOKEN = False
+
 # Lazy import to avoid dependency issues when not using OpenAI
 OpenAI = None
+AsyncOpenAI = None
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    """Get the tiktoken encoding for a model (loaded once per model), or None."""
+    if not HAS_TIKTOKEN:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Unknown model name - use the encoding of current GPT-4o models
+        return tiktoken.get_encoding("o200k_base")
 
 
 def _get_structured_output_enabled() -> bool:
@@ -67,6 +91,12 @@ def _get_json_schema() -> dict:
 class OpenAIProvider(LLMProvider):
     """OpenAI provider for cases where higher quality is needed"""
 
+    supports_batch_api = True
+    supports_async = True
+
+    # Batch API requests are billed at half the synchronous price
+    BATCH_DISCOUNT = 0.5
+
     def __init__(self, config: Optional[ProviderConfig] = None):
         # Default configuration for GPT-4o-mini (cheapest good model)
         if config is None:
@@ -86,10 +116,10 @@ class OpenAIProvider(LLMProvider):
         super().__init__(config)
 
         # Lazy import OpenAI
-        global OpenAI
+        global OpenAI, AsyncOpenAI
         if OpenAI is None:
             try:
-                from openai import OpenAI
+                from openai import OpenAI, AsyncOpenAI
             except ImportError:
                 raise ImportError(
                     "openai package not installed. "
@@ -104,7 +134,17 @@ class OpenAIProvider(LLMProvider):
                 "OpenAI is a backup option - only configure if Gemini quality is insufficient."
             )
 
-        self.client = OpenAI(api_key=api_key)
+        # One pooled connection set shared by all worker threads
+        http_client = build_http_client(config.max_connections)
+        if http_client is not None:
+            self.client = OpenAI(api_key=api_key, http_client=http_client)
+        else:
+            self.client = OpenAI(api_key=api_key)
+
+        # Async client for the event-loop dispatcher (created on first use per loop)
+        self._api_key = api_key
+        self.async_client = None
+        self._async_loop = None
 
     def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
         """
@@ -127,50 +167,19 @@ class OpenAIProvider(LLMProvider):
         self._enforce_rate_limit()
 
         try:
-            # Build messages
-            messages = []
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            messages.append({"role": "user", "content": prompt})
-
-            # Check if structured output is enabled
-            use_structured = _get_structured_output_enabled()
-
-            if use_structured:
+            request = self._build_request(prompt, system_prompt)
+            if 'response_format' in request:
                 logger.info(f"Sending request to OpenAI ({self.config.model}) with structured output")
-                schema = _get_json_schema()
-
-                # Make API call with JSON schema response format
-                response = self.client.chat.completions.create(
-                    model=self.config.model,
-                    messages=messages,
-                    max_tokens=self.config.max_tokens,
-                    temperature=self.config.temperature,
-                    response_format={
-                        "type": "json_schema",
-                        "json_schema": {
-                            "name": "yard_comments",
-                            "strict": True,
-                            "schema": schema,
-                        }
-                    }
-                )
             else:
                 logger.info(f"Sending request to OpenAI ({self.config.model})")
 
-                # Make API call without structured output
-                response = self.client.chat.completions.create(
-                    model=self.config.model,
-                    messages=messages,
-                    max_tokens=self.config.max_tokens,
-                    temperature=self.config.temperature,
-                )
+            response = self.client.chat.completions.create(**request)
 
             # Extract response
             result_text = response.choices[0].message.content
 
             # Track costs
-            self._track_cost(prompt + (system_prompt or ""), result_text)
+            self._track_response_cost(response, prompt + (system_prompt or ""), result_text)
 
             # Log estimated cost
             if self.estimated_cost > 0:
@@ -184,8 +193,208 @@ class OpenAIProvider(LLMProvider):
                 raise Exception(
                     "OpenAI API quota exceeded. Please check your OpenAI account balance."
                 )
+            # Billing errors share HTTP 429, so only count the rest as rate limiting
+            self._check_rate_limit_error(e)
             raise
 
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        """
+        Generate documentation with the async OpenAI client
+
+        Args:
+            prompt: The user prompt
+            system_prompt: Optional system prompt for context
+
+        Returns:
+            Generated documentation text
+        """
+        # Pacing comes from the caller's shared rate buckets; just count the request
+        with self.rate_limit_lock:
+            self._count_request()
+
+        # One client per event loop (connections can't cross loops); the
+        # dispatcher closes it with aclose when its requests are done
+        loop = asyncio.get_running_loop()
+        if self.async_client is None or self._async_loop is not loop:
+            self._async_loop = loop
+            http_client = build_http_client(self.config.max_connections, asynchronous=True)
+            if http_client is not None:
+                self.async_client = AsyncOpenAI(api_key=self._api_key, http_client=http_client)
+            else:
+                self.async_client = AsyncOpenAI(api_key=self._api_key)
+
+        try:
+            response = await self.async_client.chat.completions.create(
+                **self._build_request(prompt, system_prompt)
+            )
+            result_text = response.choices[0].message.content
+            self._track_response_cost(response, prompt + (system_prompt or ""), result_text)
+            return result_text
+
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}")
+            if "insufficient_quota" in str(e):
+                raise Exception(
+                    "OpenAI API quota exceeded. Please check your OpenAI account balance."
+                )
+            # Billing errors share HTTP 429, so only count the rest as rate limiting
+            self._check_rate_limit_error(e)
+            raise
+
+    def _track_response_cost(self, response, input_text: str, output_text: str):
+        """
+        Track a request's cost from the token usage OpenAI reports
+
+        Counting tokens locally is only needed when the response has no usage.
+
+        Args:
+            response: Chat completion response
+            input_text: Prompt text, counted if usage is missing
+            output_text: Response text, counted if usage is missing
+        """
+        usage = getattr(response, 'usage', None)
+        if usage is None or usage.prompt_tokens is None or usage.completion_tokens is None:
+            self._track_cost(input_text, output_text)
+            return
+
+        if self.config.cost_per_1m_input and self.config.cost_per_1m_output:
+            cost = (usage.prompt_tokens * self.config.cost_per_1m_input / 1_000_000 +
+                    usage.completion_tokens * self.config.cost_per_1m_output / 1_000_000)
+            self.estimated_cost += cost
+            logger.debug(f"Request cost: ${cost:.4f} (Total: ${self.estimated_cost:.4f})")
+
+    def _estimate_tokens(self, text: str) -> int:
+        """Count tokens with tiktoken when installed, else the ~4 chars/token estimate"""
+        encoding = _get_encoding(self.config.model)
+        if encoding is None:
+            return super()._estimate_tokens(text)
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def _build_request(self, prompt: str, system_prompt: Optional[str] = None) -> dict:
+        """
+        Build chat completion arguments (also used as the batch request body)
+
+        Args:
+            prompt: The user prompt
+            system_prompt: Optional system prompt for context
+
+        Returns:
+            Keyword arguments for chat.completions.create
+        """
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+
+        request = {
+            "model": self.config.model,
+            "messages": messages,
+            "max_tokens": self.config.max_tokens,
+            "temperature": self.config.temperature,
+        }
+
+        # Check if structured output is enabled
+        if _get_structured_output_enabled():
+            request["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "yard_comments",
+                    "strict": True,
+                    "schema": _get_json_schema(),
+                }
+            }
+        return request
+
+    def submit_batch(self, requests: List[Tuple[str, str, Optional[str]]]) -> str:
+        """
+        Upload prompts as a JSONL file and create an OpenAI batch job
+
+        Args:
+            requests: List of (custom_id, prompt, system_prompt) tuples
+
+        Returns:
+            OpenAI batch ID
+        """
+        lines = [
+            json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._build_request(prompt, system_prompt),
+            })
+            for custom_id, prompt, system_prompt in requests
+        ]
+        batch_input = self.client.files.create(
+            file=("batch_input.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_input.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        self.request_count += len(requests)
+        logger.info(f"Submitted OpenAI batch {batch.id} with {len(requests)} requests")
+        return batch.id
+
+    def wait_for_batch(self, batch_id: str, poll_interval: float = 30,
+                       max_poll_interval: float = 600) -> Dict[str, str]:
+        """
+        Poll an OpenAI batch job with exponential backoff and collect its responses
+
+        Args:
+            batch_id: ID returned by submit_batch
+            poll_interval: Initial seconds between status checks
+            max_poll_interval: Upper bound on seconds between status checks
+
+        Returns:
+            Dict mapping custom_id to response text (failed requests are omitted)
+        """
+        delay = poll_interval
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            # Expired batches still return whatever finished within the window
+            if batch.status in ("completed", "expired"):
+                break
+            if batch.status in ("failed", "cancelled", "cancelling"):
+                raise Exception(f"OpenAI batch {batch_id} {batch.status}")
+
+            counts = batch.request_counts
+            logger.info(f"Batch {batch_id}: {batch.status} "
+                        f"({counts.completed}/{counts.total} done), checking again in {delay:.0f}s")
+            time.sleep(delay)
+            delay = min(delay * 2, max_poll_interval)
+
+        if batch.status == "expired":
+            logger.warning(f"OpenAI batch {batch_id} expired; collecting partial results")
+
+        results = {}
+        if not batch.output_file_id:
+            return results
+
+        output = self.client.files.content(batch.output_file_id).text
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") != 200:
+                logger.warning(f"Batch request {record.get('custom_id')} failed: {record.get('error')}")
+                continue
+
+            body = response["body"]
+            results[record["custom_id"]] = body["choices"][0]["message"]["content"]
+
+            usage = body.get("usage") or {}
+            if self.config.cost_per_1m_input and self.config.cost_per_1m_output:
+                self.estimated_cost += self.BATCH_DISCOUNT * (
+                    usage.get("prompt_tokens", 0) * self.config.cost_per_1m_input / 1_000_000 +
+                    usage.get("completion_tokens", 0) * self.config.cost_per_1m_output / 1_000_000
+                )
+
+        logger.info(f"Collected {len(results)} responses from batch {batch_id}")
+        return results
+
     def estimate_job_cost(self, num_files: int, avg_lines_per_file: int = 500) -> dict:
         """
         Estimate the cost of processing files with OpenAI
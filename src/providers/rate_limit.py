@@ -0,0 +1,111 @@
+"""
+Rate Limiting
+Token buckets for pacing requests across concurrent workers
+"""
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTokenBucket:
+    """
+    Token bucket shared by coroutines on one event loop
+
+    Tokens refill continuously at ``rate_per_sec`` up to ``capacity``. Callers
+    wait in ``acquire`` until enough tokens are available, so a burst of up to
+    ``capacity`` passes immediately and sustained use is paced at the rate.
+    """
+
+    def __init__(self, rate_per_sec: float, capacity: float):
+        """
+        Initialize the bucket (starts full)
+
+        Args:
+            rate_per_sec: Tokens added per second
+            capacity: Maximum tokens held (burst size)
+        """
+        self.rate_per_sec = rate_per_sec
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        """Add the tokens accrued since the last refill"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate_per_sec)
+        self.last_refill = now
+
+    async def acquire(self, cost: float = 1):
+        """
+        Wait until cost tokens are available and take them
+
+        Costs larger than the capacity are capped at the capacity, so a single
+        oversized request waits for a full bucket rather than forever.
+
+        Args:
+            cost: Number of tokens to take
+        """
+        cost = min(cost, self.capacity)
+        # Holding the lock while sleeping keeps waiters in FIFO order
+        async with self._lock:
+            self._refill()
+            while self.tokens < cost:
+                wait = (cost - self.tokens) / self.rate_per_sec
+                logger.debug(f"Rate limiting: waiting {wait:.2f}s for {cost:.0f} tokens")
+                await asyncio.sleep(wait)
+                self._refill()
+            self.tokens -= cost
+
+
+class AdaptiveConcurrency:
+    """
+    Concurrency limit for coroutines that backs off when the provider rate limits
+
+    Additive increase, multiplicative decrease (AIMD): the limit halves when a
+    request finishes after the provider reported a new rate limit error, and
+    otherwise grows by about one slot per limit's worth of successful requests,
+    up to ``cap``.
+    """
+
+    def __init__(self, cap: int):
+        """
+        Initialize the limit (starts at the cap)
+
+        Args:
+            cap: Maximum requests in flight
+        """
+        self.cap = max(1, cap)
+        self.limit = float(self.cap)
+        self.in_flight = 0
+        self._seen_hits = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        """Wait for a free slot under the current limit and take it"""
+        async with self._condition:
+            while self.in_flight >= int(self.limit):
+                await self._condition.wait()
+            self.in_flight += 1
+
+    async def release(self, rate_limit_hits: int = 0):
+        """
+        Free a slot and adjust the limit
+
+        Args:
+            rate_limit_hits: The provider's running count of rate limit errors.
+                Any increase since the last cut halves the limit once, however
+                many requests in flight observe it.
+        """
+        async with self._condition:
+            self.in_flight -= 1
+            if rate_limit_hits > self._seen_hits:
+                self._seen_hits = rate_limit_hits
+                self.limit = max(1.0, self.limit / 2)
+                logger.warning(f"Rate limited: reducing concurrency to {int(self.limit)}")
+            elif self.limit < self.cap:
+                self.limit = min(float(self.cap), self.limit + 1 / self.limit)
+            self._condition.notify_all()
@@ -127,6 +127,41 @@ class TestSoftMatchAnchor:
         ) is False
 
 
+class TestAnchorMatcherCache:
+    """Test that anchors are parsed and compiled once."""
+
+    def test_same_anchor_reuses_matcher(self, generator_instance):
+        """Test that matching one anchor against many lines builds one matcher."""
+        from generate_docs import _compile_anchor
+
+        _compile_anchor.cache_clear()
+        lines = ["class Foo", "  def bar(x)", "  def self.bar", "end"]
+        matches = [bool(generator_instance.soft_match_anchor("def bar", line)) for line in lines]
+
+        assert matches == [False, True, True, False]
+        assert _compile_anchor.cache_info().misses == 1
+        assert _compile_anchor.cache_info().hits == 3
+
+
+class TestWholeFileSearch:
+    """Test the whole-file anchor search."""
+
+    def test_lines_containing(self, generator_instance):
+        """Test that candidate lines are every line containing the text."""
+        lines = ["def foo", "  foo_bar", "end", "foo"]
+
+        assert generator_instance._lines_containing(lines, "foo") == {0, 1, 3}
+        assert generator_instance._lines_containing(lines, "") == {0, 1, 2, 3}
+        assert generator_instance._lines_containing(lines, None) == set()
+
+    def test_far_anchor_found_nearby_first(self, generator_instance):
+        """Test that a nearby match wins over an earlier one further away."""
+        lines = ["def run"] + ["x"] * 20 + ["def run", "end"]
+
+        assert generator_instance.find_insertion_line(lines, 20, "def run", set()) == 21
+        assert generator_instance.find_insertion_line(lines, 20, "def run", {21}) == 0
+
+
 class TestFindInsertionLine:
     """Test finding the correct line to insert comments."""
 
@@ -0,0 +1,320 @@
+"""
+Tests for the HTML builder in build_html.py.
+
+Tests the YARDHTMLBuilder helpers that run without invoking YARD itself.
+"""
+
+import pytest
+
+from build_html import YARDHTMLBuilder
+
+
+@pytest.fixture
+def builder(tmp_path):
+    """Create a builder with temporary input and output directories."""
+    input_dir = tmp_path / "documented"
+    (input_dir / "common").mkdir(parents=True)
+    (input_dir / "init.rb").write_text("class Init\nend\n")
+    (input_dir / "common" / "util.rb").write_text("module Util\nend\n")
+    (input_dir / "common" / "notes.txt").write_text("not ruby")
+
+    output_dir = tmp_path / "docs"
+    output_dir.mkdir()
+
+    return YARDHTMLBuilder(input_dir=input_dir, output_dir=output_dir, title="Test Docs")
+
+
+class TestFileScanning:
+    """Test directory scanning helpers."""
+
+    def test_count_ruby_files(self, builder):
+        """Test that only .rb files are counted, recursively."""
+        assert builder.count_ruby_files() == 2
+
+    def test_verify_output_counts(self, builder):
+        """Test that verify_output buckets files by extension."""
+        (builder.output_dir / "index.html").write_text("<html><body></body></html>")
+        (builder.output_dir / "css").mkdir()
+        (builder.output_dir / "css" / "style.css").write_text("")
+        (builder.output_dir / "js").mkdir()
+        (builder.output_dir / "js" / "app.js").write_text("")
+        (builder.output_dir / "js" / "full_list.js").write_text("")
+
+        result = builder.verify_output()
+
+        assert result['valid'] is True
+        assert result['html_files'] == 1
+        assert result['css_files'] == 1
+        assert result['js_files'] == 2
+
+    def test_scan_shared_by_inject_and_verify(self, builder, monkeypatch):
+        """Test that one output walk serves injection and verification."""
+        (builder.output_dir / "index.html").write_text("<html><body></body></html>")
+        buckets = builder.scan_output()
+        monkeypatch.setattr(builder, 'scan_output', lambda: pytest.fail("output walked again"))
+
+        builder.inject_nav_helper(buckets)
+        result = builder.verify_output(buckets)
+
+        assert result['html_files'] == 1
+        # The theme CSS copied during injection is counted
+        assert result['css_files'] == len(list(builder.output_dir.rglob("*.css")))
+
+    def test_extensionless_files_not_bucketed(self, builder):
+        """Test that a file named like an extension is not taken for one."""
+        (builder.input_dir / "rb").write_text("")
+
+        assert builder.count_ruby_files() == 2
+
+    def test_verify_output_missing_index(self, builder):
+        """Test that a missing index.html fails verification."""
+        result = builder.verify_output()
+
+        assert result['valid'] is False
+        assert 'index.html' in result['error']
+
+
+class TestNavHelperInjection:
+    """Test injection of the navigation helper script."""
+
+    def test_injects_before_body_close(self, builder):
+        """Test that the script is inserted once, before </body>."""
+        page = builder.output_dir / "index.html"
+        page.write_text("<html><body><p>Hi</p></body></html>")
+
+        assert builder.inject_nav_helper() == 1
+
+        content = page.read_text()
+        assert content.count('<script type="text/javascript">') == 1
+        assert content.index('<script') < content.index('</body>')
+        assert content.endswith('</body></html>')
+
+    def test_skips_already_injected(self, builder):
+        """Test that pages already containing the helper are left alone."""
+        page = builder.output_dir / "index.html"
+        page.write_text("<html><body><div id=\"quick-nav\"></div></body></html>")
+        before = page.read_bytes()
+
+        assert builder.inject_nav_helper() == 0
+        assert page.read_bytes() == before
+
+    def test_skips_pages_without_body(self, builder):
+        """Test that fragments without </body> are not modified."""
+        page = builder.output_dir / "fragment.html"
+        page.write_text("<div>fragment</div>")
+
+        assert builder.inject_nav_helper() == 0
+        assert page.read_text() == "<div>fragment</div>"
+
+    def test_cache_skips_unchanged_pages(self, builder, monkeypatch):
+        """Test that a second run does not re-read pages recorded in the cache."""
+        page = builder.output_dir / "index.html"
+        page.write_text("<html><body></body></html>")
+        builder.inject_nav_helper()
+
+        patched = []
+        original = builder._patch_one
+        monkeypatch.setattr(builder, '_patch_one',
+                            lambda f, script: patched.append(f) or original(f, script))
+
+        assert builder.inject_nav_helper() == 0
+        assert patched == []
+
+    def test_cache_kept_out_of_output(self, builder):
+        """Test that the nav cache is not written into the published output."""
+        (builder.output_dir / "index.html").write_text("<html><body></body></html>")
+        builder.inject_nav_helper()
+
+        assert (builder.cache_dir / "nav_cache.json").exists()
+        assert sorted(p.name for p in builder.output_dir.rglob("*") if p.name.endswith(".json")) == []
+
+    def test_failed_pages_not_cached(self, builder, monkeypatch):
+        """Test that pages that could not be patched are retried next run."""
+        page = builder.output_dir / "index.html"
+        page.write_text("<html><body></body></html>")
+        monkeypatch.setattr(builder, '_patch_one', lambda f, script: None)
+
+        assert builder.inject_nav_helper() == 0
+        monkeypatch.undo()
+
+        assert builder.inject_nav_helper() == 1
+
+
+class TestYardCheck:
+    """Test the YARD installation check."""
+
+    @pytest.fixture(autouse=True)
+    def reset_cache(self, monkeypatch):
+        """Reset the cached check result around each test."""
+        monkeypatch.setattr(YARDHTMLBuilder, '_yard_checked', None)
+        monkeypatch.setattr(YARDHTMLBuilder, '_yard_path', None)
+        monkeypatch.delenv('LICH_SKIP_YARD_CHECK', raising=False)
+
+    def test_skip_env_var(self, builder, monkeypatch):
+        """Test that LICH_SKIP_YARD_CHECK bypasses the check."""
+        monkeypatch.setenv('LICH_SKIP_YARD_CHECK', '1')
+        monkeypatch.setattr('build_html.subprocess.run',
+                            lambda *a, **k: pytest.fail("subprocess should not run"))
+
+        assert builder.check_yard_installed() is True
+
+    def test_result_is_cached(self, builder, monkeypatch):
+        """Test that the check result is reused across calls."""
+        calls = []
+
+        def fake_which(name):
+            calls.append(name)
+            return None
+
+        monkeypatch.setattr('build_html.shutil.which', fake_which)
+
+        assert builder.check_yard_installed() is False
+        assert builder.check_yard_installed() is False
+        assert len(calls) == 1
+
+    def test_uses_path_lookup(self, builder, monkeypatch):
+        """Test that the resolved YARD path is used without spawning a process."""
+        monkeypatch.setattr('build_html.shutil.which', lambda name: '/opt/bin/yard')
+        monkeypatch.setattr('build_html.subprocess.run',
+                            lambda *a, **k: pytest.fail("subprocess should not run"))
+
+        assert builder.check_yard_installed() is True
+        assert builder.yard_path == '/opt/bin/yard'
+
+
+class TestBuildFingerprint:
+    """Test the input fingerprint used to skip unchanged builds."""
+
+    def test_fingerprint_stable(self, builder):
+        """Test that the fingerprint is stable when nothing changes."""
+        assert builder._fingerprint_inputs() == builder._fingerprint_inputs()
+
+    def test_fingerprint_changes_with_ruby_files(self, builder):
+        """Test that adding a Ruby file changes the fingerprint."""
+        before = builder._fingerprint_inputs()
+        (builder.input_dir / "new.rb").write_text("class New\nend\n")
+
+        assert builder._fingerprint_inputs() != before
+
+    def test_fingerprint_changes_with_title(self, builder):
+        """Test that changing the title changes the fingerprint."""
+        before = builder._fingerprint_inputs()
+        builder.title = "Other Title"
+
+        assert builder._fingerprint_inputs() != before
+
+    def test_fingerprint_survives_moving_checkout(self, tmp_path, monkeypatch):
+        """Test that the checkout's absolute location does not feed the fingerprint."""
+        def fingerprint(root):
+            monkeypatch.setattr('build_html.__file__', str(root / "build_html.py"))
+            builder = YARDHTMLBuilder(input_dir=root / "documented", output_dir=root / "docs",
+                                      readme_file=root / "docs-readme.md", guides_dir=root / "guides")
+            return builder._fingerprint_inputs()
+
+        (tmp_path / "a" / "documented").mkdir(parents=True)
+        (tmp_path / "a" / "guides").mkdir()
+        (tmp_path / "a" / "guides" / "intro.md").write_text("# Intro\n")
+        (tmp_path / "a" / "docs-readme.md").write_text("# Docs\n")
+        (tmp_path / "a" / "documented" / "init.rb").write_text("class Init\nend\n")
+        before = fingerprint(tmp_path / "a")
+        (tmp_path / "a").rename(tmp_path / "b")
+
+        assert fingerprint(tmp_path / "b") == before
+
+    def test_build_walks_input_once(self, builder, monkeypatch):
+        """Test that counting and fingerprinting share one walk of the input."""
+        import os
+        (builder.output_dir / "index.html").write_text("<html><body></body></html>")
+        builder.cache_dir.mkdir()
+        (builder.cache_dir / "yard_fingerprint").write_text(builder._fingerprint_inputs())
+        walked = []
+        real_walk = os.walk
+        monkeypatch.setattr(os, "walk", lambda top, *a, **k: walked.append(str(top)) or real_walk(top, *a, **k))
+
+        assert builder.build_html() is True
+        assert walked == [str(builder.input_dir)]
+
+    def test_build_skipped_when_unchanged(self, builder, monkeypatch):
+        """Test that YARD is not run when the saved fingerprint matches."""
+        (builder.output_dir / "index.html").write_text("<html><body></body></html>")
+        builder.cache_dir.mkdir()
+        (builder.cache_dir / "yard_fingerprint").write_text(builder._fingerprint_inputs())
+        monkeypatch.setattr('build_html.subprocess.Popen',
+                            lambda *a, **k: pytest.fail("YARD should not run"))
+
+        assert builder.build_html() is True
+
+
+class TestLogStream:
+    """Test batching of subprocess output into log records."""
+
+    def test_batches_lines(self):
+        """Test that non-empty lines are emitted in batches."""
+        import io
+        from build_html import _log_stream
+
+        records = []
+        stream = io.StringIO("one\n\n  \ntwo\nthree\n")
+        _log_stream(stream, records.append, "YARD output:", batch_size=2)
+
+        assert records == [
+            "YARD output:\n  one\n  two",
+            "YARD output (continued):\n  three",
+        ]
+
+    def test_empty_stream_logs_nothing(self):
+        """Test that blank output produces no records."""
+        import io
+        from build_html import _log_stream
+
+        records = []
+        _log_stream(io.StringIO("\n\n"), records.append, "YARD output:")
+
+        assert records == []
+
+
+class TestCleanOutput:
+    """Test removal of the existing output directory."""
+
+    def test_clean_removes_output(self, builder):
+        """Test that the output directory and its contents are removed."""
+        (builder.output_dir / "index.html").write_text("old")
+
+        cleaner = builder.clean_output()
+        assert not builder.output_dir.exists()
+
+        cleaner.join()
+        leftovers = [p for p in builder.output_dir.parent.iterdir() if p.name.startswith("docs.old-")]
+        assert leftovers == []
+
+    def test_clean_missing_output(self, builder):
+        """Test that cleaning a missing directory is a no-op."""
+        builder.output_dir.rmdir()
+
+        assert builder.clean_output() is None
+
+
+class TestPatchOne:
+    """Test patching of a single HTML page."""
+
+    def test_inserts_before_last_body(self, builder):
+        """Test that the script goes before the last </body>."""
+        page = builder.output_dir / "page.html"
+        page.write_bytes(b"<body><pre>&lt;/body&gt;</body></body>")
+
+        assert builder._patch_one(str(page), b"<script></script>") is True
+        assert page.read_bytes() == b"<body><pre>&lt;/body&gt;</body><script></script></body>"
+
+    def test_marker_after_body_skips(self, builder):
+        """Test that quick-nav anywhere in the page prevents patching."""
+        page = builder.output_dir / "page.html"
+        page.write_bytes(b"<body></body><!-- quick-nav -->")
+
+        assert builder._patch_one(str(page), b"<script></script>") is False
+        assert page.read_bytes() == b"<body></body><!-- quick-nav -->"
+
+    def test_unreadable_page_returns_none(self, builder):
+        """Test that an I/O error is distinguished from an intentional skip."""
+        missing = builder.output_dir / "missing.html"
+
+        assert builder._patch_one(str(missing), b"<script></script>") is None
@@ -211,6 +211,19 @@ end'''
 
         assert '      # Deeply nested method.' in result
 
+    def test_misplaced_anchors_use_original_line_numbers(self, generator_instance):
+        """Test that earlier insertions don't shift later anchor lookups."""
+        code = "def a\ndef c\ndef b"
+        comments = [
+            {'line_number': 2, 'anchor': 'def a', 'indent': 0, 'comment': '# Doc a'},
+            {'line_number': 3, 'anchor': 'def b', 'indent': 0, 'comment': '# Doc b'},
+            {'line_number': 2, 'anchor': 'def c', 'indent': 0, 'comment': '# Doc c'},
+        ]
+
+        result = generator_instance.insert_comments(code, comments)
+
+        assert result == "# Doc a\ndef a\n# Doc c\ndef c\n# Doc b\ndef b"
+
     def test_preserve_existing_code(self, generator_instance, sample_ruby_class):
         """Test that original code is preserved after insertion."""
         comments = [{
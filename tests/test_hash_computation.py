@@ -141,3 +141,37 @@ end'''
 
         # rubocop directives should be preserved as they affect code behavior
         assert hash1 != hash2
+
+    @pytest.mark.parametrize("code", [
+        "",
+        "class Test\nend",
+        "class Test\n  def x; end\nend\n\n",
+        "class Test\nend\n# trailing doc",
+        "# only doc\n",
+        "#!/usr/bin/env ruby\n# encoding: utf-8\n# Doc\nclass A\nend",
+        "  # @param x [Integer]\n#\tTabbed\n#   \n#\ndef f(x)\n  x # @return\nend\r\n",
+    ])
+    def test_matches_line_filter(self, generator_instance, code):
+        """Test that the whole-buffer filter hashes the same as the line filter."""
+        expected = generator_instance._hash_code_lines(code.split('\n'))
+
+        assert generator_instance.compute_code_hash(code) == expected
+
+
+class TestComputeFileHash:
+    """Test the streaming compute_file_hash method."""
+
+    @pytest.mark.parametrize("content", [
+        "",
+        "class Test\nend",
+        "class Test\nend\n",
+        "# @param x [Integer]\n# Description\ndef foo(x)\nend\n\n",
+        "# encoding: utf-8\r\nclass Test\r\nend\r\n",
+    ])
+    def test_matches_content_hash(self, generator_instance, tmp_path, content):
+        """Test that streaming a file gives the same hash as hashing its content."""
+        path = tmp_path / "test.rb"
+        path.write_bytes(content.encode('utf-8'))
+
+        expected = generator_instance.compute_code_hash(path.read_text(encoding='utf-8'))
+        assert generator_instance.compute_file_hash(path) == expected
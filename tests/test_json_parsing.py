@@ -65,6 +65,29 @@ class TestExtractCommentsJson:
 
         assert comments is None
 
+    def test_later_strategies_not_run_after_success(self, generator_instance, monkeypatch):
+        """Test that the array scans are skipped when the code block parses."""
+        import generate_docs
+
+        class FailingPattern:
+            def search(self, text):
+                pytest.fail("array scan ran")
+
+        monkeypatch.setattr(generate_docs, '_RE_JSON_ARRAY', FailingPattern())
+        monkeypatch.setattr(generate_docs, '_RE_JSON_ARRAY_NG', FailingPattern())
+        response = 'Here you go:\n```json\n[{"line_number": 1, "anchor": "class A", "indent": 0, "comment": "# A"}]\n```'
+
+        comments = generator_instance.extract_comments_json(response)
+
+        assert len(comments) == 1
+
+    def test_prose_lines_stripped(self, generator_instance):
+        """Test that prose around a bare JSON array is ignored."""
+        response = "Here are the comments:\n[]\nThe file needs no documentation."
+        comments = generator_instance.extract_comments_json(response)
+
+        assert comments == []
+
 
 class TestSanitizeJsonEscapes:
     """Test the sanitize_json_escapes method."""
@@ -105,6 +128,13 @@ class TestSanitizeJsonEscapes:
         parsed = json.loads(result)
         assert parsed['emoji'] == '\u2764'
 
+    def test_escaped_backslash_consumed_as_pair(self, generator_instance):
+        """Test that \\\\ is kept and the character after it is not treated as escaped."""
+        text = r'{"re": "\\d and \d"}'
+        result = generator_instance.sanitize_json_escapes(text)
+
+        assert result == r'{"re": "\\d and \\d"}'
+
     def test_invalid_unicode_fixed(self, generator_instance):
         """Test that invalid \\uXXX (incomplete) is fixed."""
         text = r'{"bad": "\u12"}'  # Invalid - only 2 hex digits
@@ -0,0 +1,1041 @@
+"""
+Tests for file processing in generate_docs.py.
+
+Tests dispatch of files to the provider, using the mock provider with
+its generate method patched to return JSON comments.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from generate_docs import Lich5DocumentationGenerator
+from providers.rate_limit import AsyncTokenBucket
+
+
+@pytest.fixture
+def generator(tmp_path):
+    """Create a generator writing into a temporary output directory."""
+    gen = Lich5DocumentationGenerator(provider_name='mock', output_dir=str(tmp_path / "out"))
+    gen.provider.generate = lambda prompt, system_prompt=None: '[]'
+    # Don't pace the patched provider at the mock's request limit
+    gen.provider.config.requests_per_minute = None
+    return gen
+
+
+@pytest.fixture
+def ruby_files(tmp_path):
+    """Create a few small Ruby source files."""
+    src = tmp_path / "lib"
+    src.mkdir()
+    files = []
+    for i in range(4):
+        path = src / f"file{i}.rb"
+        path.write_text(f"class File{i}\nend\n")
+        files.append(path)
+    return files
+
+
+class TestParallelProcessing:
+    """Test concurrent dispatch of files."""
+
+    def test_processes_all_files(self, generator, ruby_files):
+        """Test that every file is processed and written."""
+        generator.parallel_workers = 2
+
+        assert generator._process_files_parallel(ruby_files) == 4
+        for path in ruby_files:
+            assert generator.get_output_file_path(path).exists()
+            assert str(path) in generator.manifest['processed_files']
+
+    def test_concurrency_is_bounded(self, generator, ruby_files):
+        """Test that no more than parallel_workers requests run at once."""
+        generator.parallel_workers = 2
+        lock = threading.Lock()
+        active = []
+        peak = []
+
+        def slow_generate(prompt, system_prompt=None):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+            return '[]'
+
+        generator.provider.generate = slow_generate
+        generator._process_files_parallel(ruby_files)
+
+        assert max(peak) == 2
+
+    def test_failures_are_counted(self, generator, ruby_files):
+        """Test that files whose response cannot be parsed are not counted."""
+        generator.parallel_workers = 2
+        generator.provider.generate = lambda prompt, system_prompt=None: 'not json'
+
+        assert generator._process_files_parallel(ruby_files) == 0
+        assert len(generator.manifest['failed_files']) == 4
+
+    def test_single_worker_runs_inline(self, generator, ruby_files, monkeypatch):
+        """Test that one worker without batching skips the event loop."""
+        generator.parallel_workers = 1
+        generator.batch_token_budget = 0
+
+        def no_event_loop(coro):
+            coro.close()
+            raise AssertionError("event loop started")
+
+        monkeypatch.setattr("generate_docs.asyncio.run", no_event_loop)
+
+        assert generator._process_files_parallel(ruby_files) == 4
+
+
+class TestBatching:
+    """Test batching of small files into a single request."""
+
+    def test_budget_zero_disables_batching(self, generator, ruby_files):
+        """Test that each file gets its own batch when batching is off."""
+        generator.batch_token_budget = 0
+
+        assert generator.batch_small_files(ruby_files) == [[f] for f in ruby_files]
+
+    def test_small_files_grouped(self, generator, ruby_files):
+        """Test that small files are grouped within the budget."""
+        batches = generator.batch_small_files(ruby_files, max_tokens=1000)
+
+        assert batches == [ruby_files]
+
+    def test_large_files_sent_alone(self, generator, ruby_files):
+        """Test that files over half the budget are not grouped."""
+        big = ruby_files[0].parent / "big.rb"
+        big.write_text("x = 1\n" * 400)
+
+        batches = generator.batch_small_files(ruby_files + [big], max_tokens=1000)
+
+        assert len(batches) == 2
+        assert [big] in batches
+        assert ruby_files in batches
+
+    def test_read_sources_counted_by_provider(self, generator, ruby_files, monkeypatch):
+        """Test that sources already read are sized with the provider's token count."""
+        for file_path in ruby_files:
+            generator._prefilter_file(file_path)
+        monkeypatch.setattr(generator.provider, 'count_tokens', lambda text: 600)
+
+        batches = generator.batch_small_files(ruby_files, max_tokens=1000)
+
+        assert batches == [[f] for f in ruby_files]
+
+    def test_batched_prompt_numbers_lines_continuously(self, generator):
+        """Test that line numbers carry on from one file to the next."""
+        _, prompt = generator.create_batched_prompt([("a.rb", "class A\nend"), ("b.rb", "class B\nend")])
+
+        assert "=== FILE: a.rb ===" in prompt
+        assert "=== FILE: b.rb ===" in prompt
+        assert "   3: class B" in prompt
+
+    def test_batch_splits_comments_by_file(self, generator, ruby_files):
+        """Test that one response is mapped back onto each file."""
+        # Each file is three lines ("class FileN", "end", ""), so file1 starts at line 4
+        requests = []
+
+        def batched_generate(prompt, system_prompt=None):
+            requests.append(prompt)
+            return ('[{"line_number": 1, "anchor": "class File0", "indent": 0, "comment": "# Zero"},'
+                    ' {"line_number": 4, "anchor": "class File1", "indent": 0, "comment": "# One"}]')
+
+        generator.provider.generate = batched_generate
+        generator.batch_token_budget = 1000
+
+        assert generator._process_batch(ruby_files[:2], 1, 2) == (2, [])
+        assert len(requests) == 1
+        assert generator.get_output_file_path(ruby_files[0]).read_text().startswith("# Zero\nclass File0")
+        assert generator.get_output_file_path(ruby_files[1]).read_text().startswith("# One\nclass File1")
+
+    def test_skipped_file_returned_for_retry(self, generator, ruby_files):
+        """Test that a file left without comments is handed back for its own request."""
+        generator.provider.generate = lambda prompt, system_prompt=None: (
+            '[{"line_number": 1, "anchor": "class File0", "indent": 0, "comment": "# Zero"}]')
+
+        assert generator._process_batch(ruby_files[:2], 1, 2) == (1, [ruby_files[1]])
+
+    def test_retries_dispatched_concurrently(self, generator, ruby_files):
+        """Test that files a batch could not cover are retried in parallel."""
+        lock = threading.Lock()
+        active = []
+        peak = []
+
+        def generate(prompt, system_prompt=None):
+            if "=== FILE:" in prompt:
+                return 'not json'
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+            return '[]'
+
+        generator.provider.generate = generate
+        generator.batch_token_budget = 1000
+        generator.parallel_workers = 4
+
+        assert generator._process_files_parallel(ruby_files) == 4
+        assert max(peak) > 1
+
+
+class TestIncrementalSkip:
+    """Test detection of files that are already documented."""
+
+    @pytest.fixture
+    def processed(self, generator, ruby_files, tmp_path, monkeypatch):
+        """Mark the first file processed and create its committed output."""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "documented").mkdir()
+        (tmp_path / "documented" / ruby_files[0].name).write_text("# Doc\nclass File0\nend\n")
+        generator.mark_file_processed(ruby_files[0], success=True)
+        return ruby_files[0]
+
+    def test_unchanged_file_skipped(self, generator, processed):
+        """Test that an unchanged file with output is skipped."""
+        assert generator.is_file_processed(processed) is True
+
+    def test_changed_file_reprocessed(self, generator, processed):
+        """Test that editing the code triggers reprocessing."""
+        processed.write_text("class File0\n  def added\n  end\nend\n")
+
+        assert generator.is_file_processed(processed) is False
+
+    def test_prompt_version_change_reprocesses(self, generator, processed, monkeypatch):
+        """Test that bumping PROMPT_VERSION invalidates earlier entries."""
+        monkeypatch.setattr('generate_docs.PROMPT_VERSION', 2)
+
+        assert generator.is_file_processed(processed) is False
+
+    def test_entries_without_version_count_as_v1(self, generator, processed):
+        """Test that manifests written before versioning stay valid."""
+        del generator.manifest['processed_files'][str(processed)]['prompt_version']
+
+        assert generator.is_file_processed(processed) is True
+
+
+class TestManifestJournal:
+    """Test journaling of manifest updates."""
+
+    def test_mark_appends_to_journal(self, generator, ruby_files):
+        """Test that marking a file journals it without rewriting manifest.json."""
+        generator.mark_file_processed(ruby_files[0], success=True)
+        generator.mark_file_processed(ruby_files[1], success=False)
+        generator._flush_journal()
+
+        assert not generator.manifest_file.exists()
+        lines = generator.journal_file.read_text().splitlines()
+        assert len(lines) == 2
+
+    def test_journal_flushed_in_groups(self, generator, ruby_files, monkeypatch):
+        """Test that records are written once enough have accumulated."""
+        import generate_docs
+        monkeypatch.setattr(generate_docs, 'JOURNAL_FLUSH_RECORDS', 3)
+
+        for path in ruby_files[:2]:
+            generator.mark_file_processed(path, success=False)
+        assert generator.journal_file.read_text() == ''
+
+        generator.mark_file_processed(ruby_files[2], success=False)
+        assert len(generator.journal_file.read_text().splitlines()) == 3
+
+    def test_journal_replayed_on_load(self, generator, ruby_files, tmp_path):
+        """Test that a new generator picks up journaled entries."""
+        generator.mark_file_processed(ruby_files[0], success=True)
+        generator.mark_file_processed(ruby_files[1], success=False)
+        generator._flush_journal()
+        with open(generator.journal_file, 'a') as f:
+            f.write('{"path": "trunc')
+
+        reloaded = Lich5DocumentationGenerator(provider_name='mock', output_dir=str(tmp_path / "out"))
+
+        assert str(ruby_files[0]) in reloaded.manifest['processed_files']
+        assert reloaded.manifest['failed_files'] == [str(ruby_files[1])]
+
+    def test_replayed_journal_compacted(self, generator, ruby_files, tmp_path):
+        """Test that a leftover journal is folded into manifest.json on startup."""
+        generator.mark_file_processed(ruby_files[0], success=True)
+        generator._flush_journal()
+
+        reloaded = Lich5DocumentationGenerator(provider_name='mock', output_dir=str(tmp_path / "out"))
+
+        assert not reloaded.journal_file.exists()
+        with open(reloaded.manifest_file) as f:
+            assert str(ruby_files[0]) in json.load(f)['processed_files']
+
+    def test_save_compacts_journal(self, generator, ruby_files):
+        """Test that saving writes manifest.json and removes the journal."""
+        generator.mark_file_processed(ruby_files[0], success=True)
+        generator.save_manifest()
+
+        assert not generator.journal_file.exists()
+        assert generator.load_manifest()['processed_files'].keys() == {str(ruby_files[0])}
+
+    def test_interrupted_run_flushes_journal(self, generator, ruby_files, tmp_path):
+        """Test that buffered records reach disk when processing is interrupted."""
+        generator.parallel_workers = 1
+        generator.batch_token_budget = 0
+        responses = iter(['[]'])
+
+        def generate(prompt, system_prompt=None):
+            try:
+                return next(responses)
+            except StopIteration:
+                raise KeyboardInterrupt
+
+        generator.provider.generate = generate
+
+        with pytest.raises(KeyboardInterrupt):
+            generator.process_directory(tmp_path / "lib")
+
+        assert len(generator.journal_file.read_text().splitlines()) == 1
+
+
+class TestSourceHashReuse:
+    """Test that sources read by process_file are not re-read when marked."""
+
+    def test_mark_uses_hash_from_process_file(self, generator, ruby_files, monkeypatch):
+        """Test that marking after process_file does not open the source again."""
+        path = ruby_files[0]
+        expected = generator.compute_code_hash(path.read_text())
+        generator.process_file(path)
+
+        def fail_open(*args, **kwargs):
+            raise AssertionError("source re-read")
+
+        monkeypatch.setattr('builtins.open', fail_open)
+        monkeypatch.setattr(generator, '_append_journal', lambda record: None)
+        generator.mark_file_processed(path, success=True)
+
+        assert generator.manifest['processed_files'][str(path)]['content_hash'] == expected
+
+
+class TestResponseCache:
+    """Test the persistent LLM response cache."""
+
+    def test_identical_prompt_uses_cache(self, generator, ruby_files, tmp_path):
+        """Test that a second generator reuses the stored response."""
+        generator.process_file(ruby_files[0])
+
+        again = Lich5DocumentationGenerator(provider_name='mock', output_dir=str(tmp_path / "out"))
+        again.provider.generate = lambda prompt, system_prompt=None: pytest.fail("provider called")
+
+        assert again.process_file(ruby_files[0]) is not None
+        assert again.get_provider_stats()['cache_hits'] == 1
+
+    def test_unparseable_response_not_cached(self, generator, ruby_files):
+        """Test that a response that failed to parse is requested again."""
+        calls = []
+
+        def bad_generate(prompt, system_prompt=None):
+            calls.append(prompt)
+            return 'not json'
+
+        generator.provider.generate = bad_generate
+        generator.process_file(ruby_files[0])
+        generator.process_file(ruby_files[0])
+
+        assert len(calls) == 2
+
+    def test_use_cache_false_bypasses_cache(self, generator, ruby_files):
+        """Test that a forced regeneration calls the provider."""
+        calls = []
+        generator.provider.generate = lambda prompt, system_prompt=None: calls.append(1) or '[]'
+
+        generator.process_file(ruby_files[0])
+        generator.process_file(ruby_files[0], use_cache=False)
+
+        assert len(calls) == 2
+
+    def test_cache_disabled(self, generator, ruby_files):
+        """Test that no cache file is created when caching is off."""
+        generator.response_cache = False
+        generator.process_file(ruby_files[0])
+
+        assert not generator.cache_file.exists()
+
+
+class TestDuplicateFiles:
+    """Test documenting byte-identical files once."""
+
+    def test_duplicates_share_one_request(self, generator, ruby_files, tmp_path, monkeypatch):
+        """Test that identical files cost one request and all get the output."""
+        monkeypatch.chdir(tmp_path / "out")
+        copy = tmp_path / "lib" / "vendor" / "file0.rb"
+        copy.parent.mkdir()
+        copy.write_bytes(ruby_files[0].read_bytes())
+        prompts = []
+        generator.provider.generate = lambda prompt, system_prompt=None: prompts.append(prompt) or '[]'
+
+        stats = generator.process_directory(tmp_path / "lib")
+
+        assert stats['processed'] == len(ruby_files) + 1
+        assert len(prompts) == len(ruby_files)
+        assert (generator.get_output_file_path(copy).read_text()
+                == generator.get_output_file_path(ruby_files[0]).read_text())
+        assert str(copy) in generator.manifest['processed_files']
+
+    def test_grouping_reuses_prefilter_read(self, generator, ruby_files, tmp_path, monkeypatch):
+        """Test that grouping and prompting use the content the pre-filter read."""
+        copy = tmp_path / "lib" / "copy.rb"
+        copy.write_text("# @note Vendored copy\nclass File0\nend\n")
+        files = ruby_files + [copy]
+        assert not any(generator._prefilter_file(f) for f in files)
+
+        def fail_open(*args, **kwargs):
+            raise AssertionError("source re-read")
+
+        monkeypatch.setattr('builtins.open', fail_open)
+        unique, duplicates = generator._group_duplicate_files(files)
+
+        assert unique == ruby_files
+        assert duplicates[ruby_files[0]][0] == [copy]
+        # Only sources that will be prompted keep their content
+        assert set(generator._source_contents) == {str(f) for f in ruby_files}
+        assert generator._read_source(ruby_files[0]) == "class File0\nend\n"
+
+    def test_new_files_read_once(self, generator, ruby_files, tmp_path, monkeypatch):
+        """Test that a first run opens each new source exactly once."""
+        monkeypatch.chdir(tmp_path / "out")
+        copy = tmp_path / "lib" / "vendor" / "file0.rb"
+        copy.parent.mkdir()
+        copy.write_bytes(ruby_files[0].read_bytes())
+        opened = []
+        real_open = open
+
+        def counting_open(file, *args, **kwargs):
+            if str(file).endswith('.rb') and str(tmp_path / "lib") in str(file):
+                opened.append(str(file))
+            return real_open(file, *args, **kwargs)
+
+        monkeypatch.setattr('builtins.open', counting_open)
+        stats = generator.process_directory(tmp_path / "lib")
+
+        assert stats['processed'] == len(ruby_files) + 1
+        assert sorted(opened) == sorted(str(f) for f in ruby_files + [copy])
+
+    def test_comment_only_difference_documented_separately(self, generator, ruby_files, tmp_path, monkeypatch):
+        """Test that a copy whose kept comments differ gets its own request."""
+        monkeypatch.chdir(tmp_path / "out")
+        copy = tmp_path / "lib" / "vendor" / "file0.rb"
+        copy.parent.mkdir()
+        copy.write_text(ruby_files[0].read_text() + "# Trailing note\n")
+        prompts = []
+        generator.provider.generate = lambda prompt, system_prompt=None: prompts.append(prompt) or '[]'
+
+        stats = generator.process_directory(tmp_path / "lib")
+
+        assert stats['processed'] == len(ruby_files) + 1
+        assert len(prompts) == len(ruby_files) + 1
+        assert "# Trailing note" in generator.get_output_file_path(copy).read_text()
+
+    def test_duplicate_of_failed_file_fails(self, generator, ruby_files, tmp_path):
+        """Test that duplicates are not marked processed when their original failed."""
+        copy = tmp_path / "lib" / "copy.rb"
+        copy.write_bytes(ruby_files[0].read_bytes())
+        for file_path in (ruby_files[0], copy):
+            generator._prefilter_file(file_path)
+        files, duplicates = generator._group_duplicate_files([ruby_files[0], copy])
+
+        assert files == [ruby_files[0]]
+        assert generator._save_duplicate_outputs(duplicates) == 0
+        assert str(copy) in generator.manifest['failed_files']
+
+
+class TestSourceDiscovery:
+    """Test walking the source tree for Ruby files."""
+
+    def test_matches_rglob(self, tmp_path):
+        """Test that the scandir walk finds the same files as rglob."""
+        root = tmp_path / "lib"
+        (root / "a" / "b").mkdir(parents=True)
+        (root / "top.rb").write_text("")
+        (root / "a" / "mid.rb").write_text("")
+        (root / "a" / "b" / "deep.rb").write_text("")
+        (root / "a" / "notes.txt").write_text("")
+
+        found = set(Lich5DocumentationGenerator._iter_source_files(root))
+
+        assert found == set(root.rglob("*.rb"))
+        assert len(found) == 3
+
+    def test_prunes_excluded_directories(self, tmp_path, monkeypatch):
+        """Test that excluded directories are not entered at all."""
+        root = tmp_path / "lib"
+        (root / "critranks" / "sub").mkdir(parents=True)
+        (root / "critranks_notes").mkdir()
+        (root / "keep.rb").write_text("")
+        (root / "critranks" / "sub" / "table.rb").write_text("")
+        (root / "critranks_notes" / "ok.rb").write_text("")
+        scanned = []
+        real_scandir = os.scandir
+        monkeypatch.setattr(os, "scandir", lambda path: scanned.append(path) or real_scandir(path))
+
+        found = {entry.name for entry in
+                 Lich5DocumentationGenerator._iter_source_entries(root, "*.rb", ["/critranks/"])}
+
+        assert found == {"keep.rb", "ok.rb"}
+        assert not any("critranks" + os.sep in path or path.endswith("critranks") for path in scanned)
+
+    def test_symlinked_directories_not_followed(self, tmp_path):
+        """Test that a symlink cycle does not make the walk recurse forever."""
+        root = tmp_path / "lib"
+        (root / "sub").mkdir(parents=True)
+        (root / "sub" / "a.rb").write_text("")
+        try:
+            (root / "sub" / "loop").symlink_to(root, target_is_directory=True)
+        except OSError:
+            pytest.skip("symlinks not supported")
+
+        found = list(Lich5DocumentationGenerator._iter_source_files(root))
+
+        assert found == [root / "sub" / "a.rb"]
+
+    def test_preserves_relative_paths(self, tmp_path, monkeypatch):
+        """Test that yielded paths keep the form used for manifest keys."""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "src" / "lib").mkdir(parents=True)
+        (tmp_path / "src" / "lib" / "init.rb").write_text("")
+
+        found = list(Lich5DocumentationGenerator._iter_source_files(Path("src/lib")))
+
+        assert [str(p) for p in found] == [str(Path("src/lib/init.rb"))]
+
+
+class TestRateBuckets:
+    """Test construction of the rate limiting buckets."""
+
+    def test_no_limits_no_buckets(self, generator):
+        """Test that providers without limits are not paced."""
+        generator.provider.config.tokens_per_minute = None
+
+        assert generator._create_rate_buckets() == (None, None)
+
+    def test_buckets_from_provider_limits(self, generator):
+        """Test that RPM and TPM limits become bucket rates."""
+        generator.provider.config.requests_per_minute = 120
+        generator.provider.config.tokens_per_minute = 6000
+        generator.parallel_workers = 4
+
+        requests, tokens = generator._create_rate_buckets()
+
+        assert requests.rate_per_sec == 2
+        assert requests.capacity == 4
+        assert tokens.rate_per_sec == 100
+        assert tokens.capacity == 6000
+
+    def test_provider_interval_wait_skipped_while_paced(self, generator, ruby_files):
+        """Test that the provider's own throttle is bypassed under the shared buckets."""
+        generator.parallel_workers = 2
+        generator.provider.config.requests_per_minute = 2
+        provider = generator.provider
+        paced = []
+
+        def generate(prompt, system_prompt=None):
+            paced.append(provider.paced_externally)
+            provider._enforce_rate_limit()
+            return '[]'
+
+        provider.generate = generate
+        provider.last_request_time = time.time()
+        start = time.monotonic()
+
+        assert generator._process_files_parallel(ruby_files[:2]) == 2
+        # Two requests fit the burst; a per-request interval would have waited 30s
+        assert time.monotonic() - start < 5
+        assert paced == [True, True]
+        assert provider.paced_externally is False
+
+    def test_validation_retry_takes_bucket_tokens(self, generator, ruby_files, monkeypatch):
+        """Test that the regenerate request after failed validation is paced too."""
+        generator.parallel_workers = 2
+        generator.provider.config.requests_per_minute = 600
+        generator._check_validation = lambda file_path, result: (('failed', None), True)
+        generator._recheck_validation = lambda file_path, result: ('skipped', None)
+        acquired = []
+        real_acquire = AsyncTokenBucket.acquire
+
+        async def acquire(bucket, cost=1):
+            if bucket.rate_per_sec == 10:
+                acquired.append(cost)
+            await real_acquire(bucket, cost)
+
+        monkeypatch.setattr(AsyncTokenBucket, 'acquire', acquire)
+
+        assert generator._process_files_parallel(ruby_files[:2]) == 2
+        assert len(acquired) == 4
+        assert generator._rate_limits is None
+
+    def test_token_bucket_cost_counted_by_provider(self, generator, ruby_files, monkeypatch):
+        """Test that the TPM bucket takes the provider's token count for each prompt."""
+        generator.parallel_workers = 2
+        generator.provider.config.tokens_per_minute = 60_000
+        monkeypatch.setattr(generator.provider, 'count_tokens', lambda text: 7)
+        costs = []
+        real_acquire = AsyncTokenBucket.acquire
+
+        async def acquire(bucket, cost=1):
+            if bucket.capacity == 60_000:
+                costs.append(cost)
+            await real_acquire(bucket, cost)
+
+        monkeypatch.setattr(AsyncTokenBucket, 'acquire', acquire)
+
+        assert generator._process_files_parallel(ruby_files[:2]) == 2
+        assert costs == [7, 7]
+
+
+class TestBatchAPI:
+    """Test documenting files through a provider batch API."""
+
+    def test_unsupported_provider_disables_batch_api(self, tmp_path):
+        """Test that batch mode falls back when the provider has no batch API."""
+        gen = Lich5DocumentationGenerator(provider_name='mock', output_dir=str(tmp_path / "out"),
+                                          batch_api=True)
+
+        assert gen.batch_api is False
+
+    def test_results_applied_and_missing_retried(self, generator, ruby_files):
+        """Test that batch results are saved and missing ones use regular requests."""
+        submitted = []
+
+        def submit_batch(requests):
+            submitted.extend(requests)
+            return "batch_1"
+
+        def wait_for_batch(batch_id):
+            first = str(ruby_files[0])
+            return {first: '[{"line_number": 1, "anchor": "class File0", "indent": 0, "comment": "# Zero"}]'}
+
+        generator.provider.submit_batch = submit_batch
+        generator.provider.wait_for_batch = wait_for_batch
+        generator.parallel_workers = 2
+        regular = []
+        generator.provider.generate = lambda prompt, system_prompt=None: regular.append(prompt) or '[]'
+
+        assert generator._process_files_batch_api(ruby_files[:2]) == 2
+        assert [custom_id for custom_id, _, _ in submitted] == [str(f) for f in ruby_files[:2]]
+        assert generator.get_output_file_path(ruby_files[0]).read_text().startswith("# Zero\n")
+        assert len(regular) == 1
+        assert generator.failed_files == []
+
+    def test_failed_batch_falls_back(self, generator, ruby_files):
+        """Test that a failed batch job sends every file through regular requests."""
+        def wait_for_batch(batch_id):
+            raise Exception("OpenAI batch batch_1 failed")
+
+        generator.provider.submit_batch = lambda requests: "batch_1"
+        generator.provider.wait_for_batch = wait_for_batch
+        regular = []
+        generator.provider.generate = lambda prompt, system_prompt=None: regular.append(prompt) or '[]'
+
+        assert generator._process_files_batch_api(ruby_files[:2]) == 2
+        assert len(regular) == 2
+
+    def test_cached_prompts_not_batched(self, generator, ruby_files):
+        """Test that responses already in the cache are used instead of batched."""
+        generator.process_file(ruby_files[0])
+        generator.manifest['processed_files'].clear()
+        submitted = []
+
+        def submit_batch(requests):
+            submitted.extend(requests)
+            return "batch_1"
+
+        generator.provider.submit_batch = submit_batch
+        generator.provider.wait_for_batch = lambda batch_id: {str(ruby_files[1]): '[]'}
+
+        assert generator._process_files_batch_api(ruby_files[:2]) == 2
+        assert [custom_id for custom_id, _, _ in submitted] == [str(ruby_files[1])]
+
+
+class TestStatFastPath:
+    """Test skipping unchanged files by mtime and size."""
+
+    @pytest.fixture
+    def processed(self, generator, ruby_files, tmp_path, monkeypatch):
+        """Mark the first file processed and create its committed output."""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "documented").mkdir()
+        (tmp_path / "documented" / ruby_files[0].name).write_text("# Doc\nclass File0\nend\n")
+        generator.mark_file_processed(ruby_files[0], success=True)
+        return ruby_files[0]
+
+    def test_unchanged_stat_skips_read(self, generator, processed, monkeypatch):
+        """Test that a matching mtime/size skips reading the source."""
+        monkeypatch.setattr(generator, 'compute_code_hash',
+                            lambda content: pytest.fail("source was hashed"))
+
+        assert generator.is_file_processed(processed) is True
+
+    def test_edit_during_processing_not_skipped(self, generator, processed):
+        """Test that a source edited after it was read is rehashed next time."""
+        generator._read_source(processed)
+        processed.write_text("class File0\n  def changed; end\nend\n")
+        generator.mark_file_processed(processed, success=True)
+
+        assert generator.is_file_processed(processed) is False
+
+    def test_mirror_check_resolves_source_root_once(self, generator, processed, tmp_path, monkeypatch):
+        """Test that the source root is resolved once, not per checked file."""
+        generator.output_structure = 'mirror'
+        generator.source_root = tmp_path / "lib"
+        resolved = []
+        real_resolve = Path.resolve
+        monkeypatch.setattr(Path, 'resolve', lambda self: resolved.append(self) or real_resolve(self))
+
+        assert generator.is_file_processed(processed) is True
+        assert generator.is_file_processed(processed) is True
+        assert resolved.count(tmp_path / "lib") == 1
+
+    def test_touched_file_rehashed_and_recorded(self, generator, processed):
+        """Test that a new mtime falls back to the hash and refreshes the cache."""
+        import os
+        st = processed.stat()
+        os.utime(processed, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000_000))
+
+        assert generator.is_file_processed(processed) is True
+        assert generator.stat_cache[str(processed)][0] == processed.stat().st_mtime_ns
+
+    def test_stat_cache_saved_with_manifest(self, generator, processed, tmp_path):
+        """Test that the stat cache persists across generators."""
+        generator.save_manifest()
+
+        reloaded = Lich5DocumentationGenerator(provider_name='mock', output_dir=str(tmp_path / "out"))
+        assert str(processed) in reloaded.stat_cache
+
+    def test_changed_hash_in_manifest_not_trusted(self, generator, processed):
+        """Test that the cache only applies to the hash it was recorded against."""
+        generator.manifest['processed_files'][str(processed)]['content_hash'] = 'different'
+
+        assert generator.is_file_processed(processed) is False
+
+    def test_dir_entry_stat_used(self, generator, processed, monkeypatch):
+        """Test that a DirEntry's cached stat is used instead of a fresh stat call."""
+        import os
+        st = processed.stat()
+        entry = next(e for e in os.scandir(processed.parent) if e.name == processed.name)
+        entry.stat()  # cache it before the file is touched
+        os.utime(processed, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000_000))
+        monkeypatch.setattr(generator, 'compute_code_hash',
+                            lambda content: pytest.fail("source was hashed"))
+
+        assert generator.is_file_processed(processed, entry) is True
+
+    def test_unchanged_tree_not_read(self, generator, ruby_files, tmp_path, monkeypatch):
+        """Test that a second directory run stats sources without reading or hashing them."""
+        monkeypatch.chdir(tmp_path / "out")
+        generator.process_directory(tmp_path / "lib")
+
+        again = Lich5DocumentationGenerator(provider_name='mock', output_dir=str(tmp_path / "out"))
+        again.provider.generate = lambda prompt, system_prompt=None: pytest.fail("provider called")
+        monkeypatch.setattr(again, 'compute_code_hash', lambda *a: pytest.fail("source hashed"))
+
+        stats = again.process_directory(tmp_path / "lib")
+        assert stats['processed'] == len(ruby_files)
+
+    def test_only_changed_files_reprocessed(self, generator, ruby_files, tmp_path, monkeypatch):
+        """Test that the concurrent pre-filter sends only changed files to the provider."""
+        monkeypatch.chdir(tmp_path / "out")
+        generator.process_directory(tmp_path / "lib")
+        ruby_files[2].write_text("class File2\n  def added; end\nend\n")
+
+        again = Lich5DocumentationGenerator(provider_name='mock', output_dir=str(tmp_path / "out"))
+        prompts = []
+        again.provider.generate = lambda prompt, system_prompt=None: prompts.append(prompt) or '[]'
+        again.parallel_workers = 1
+
+        assert again.process_directory(tmp_path / "lib")['processed'] == len(ruby_files)
+        assert len(prompts) == 1
+        assert "def added" in prompts[0]
+
+    def test_sha256_entry_migrated(self, generator, processed):
+        """Test that an unchanged file with a SHA-256 entry is upgraded, not reprocessed."""
+        key = str(processed)
+        entry = generator.manifest['processed_files'][key]
+        entry['content_hash'] = generator.compute_code_hash(processed.read_text(), 'sha256')
+        del entry['hash_algo']
+        generator.stat_cache.clear()
+
+        assert generator.is_file_processed(processed) is True
+
+        migrated = generator.manifest['processed_files'][key]
+        assert migrated['hash_algo'] == 'blake2b'
+        assert migrated['content_hash'] == generator.compute_code_hash(processed.read_text())
+        assert generator.is_file_processed(processed) is True
+
+    def test_changed_file_read_once(self, generator, processed, monkeypatch):
+        """Test that processing reuses the content read by the change check."""
+        processed.write_text("class File0\n  def changed; end\nend\n")
+        assert generator.is_file_processed(processed) is False
+
+        def fail_open(*args, **kwargs):
+            raise AssertionError("source re-read")
+
+        monkeypatch.setattr('builtins.open', fail_open)
+
+        assert "def changed" in generator._read_source(processed)
+        assert generator._source_hashes[str(processed)] == generator.compute_code_hash(
+            "class File0\n  def changed; end\nend\n")
+
+
+class TestYardDocs:
+    """Test extraction of YARD comment files."""
+
+    def test_writes_comment_lines_only(self, generator):
+        """Test that only comment lines are written, one file per documented file."""
+        sources = {
+            'a.rb': "# Alpha\nclass A\n  # @return [Integer]\n  def x; end\nend\n",
+            'b.rb': "class B\nend\n",
+        }
+        generator.documentation = {}
+        for name, content in sources.items():
+            output_path = generator.output_dir / name
+            output_path.write_text(content, encoding='utf-8')
+            generator.documentation[name] = {'output_path': str(output_path)}
+
+        generator.generate_yard_docs()
+
+        yard_dir = generator.output_dir / 'yard'
+        assert (yard_dir / 'a.rb.yard').read_text(encoding='utf-8') == "# Alpha\n  # @return [Integer]"
+        assert not (yard_dir / 'b.rb.yard').exists()
+
+    def test_emitted_while_saving(self, generator, ruby_files, monkeypatch):
+        """Test that emit_yard writes the .yard file from memory and the final pass skips it."""
+        generator.emit_yard = True
+        generator._save_documented_file(ruby_files[0], "# Doc\nclass A\nend\n")
+
+        monkeypatch.setattr('builtins.open', lambda *a, **k: pytest.fail("output re-read"))
+        generator.generate_yard_docs()
+
+        yard_file = generator.output_dir / 'yard' / f"{ruby_files[0].name}.yard"
+        assert yard_file.read_text(encoding='utf-8') == "# Doc"
+
+    def test_documentation_keeps_paths_not_content(self, generator, ruby_files):
+        """Test that saved files are tracked by path rather than held in memory."""
+        generator._save_documented_file(ruby_files[0], "# Doc\nclass A\nend\n")
+
+        entry = generator.documentation[ruby_files[0].name]
+        assert set(entry) == {'path', 'output_path', 'timestamp'}
+        assert Path(entry['output_path']).read_text(encoding='utf-8') == "# Doc\nclass A\nend\n"
+
+
+class TestAtomicWrite:
+    """Test atomic replacement of output files."""
+
+    def test_replaces_content_without_leftovers(self, tmp_path):
+        """Test that the target gets the new content and no temp file remains."""
+        from generate_docs import _atomic_write
+
+        target = tmp_path / "out.rb"
+        target.write_text("old")
+        _atomic_write(target, "new")
+
+        assert target.read_text(encoding='utf-8') == "new"
+        assert [p.name for p in tmp_path.iterdir()] == ["out.rb"]
+
+    def test_writes_bytes_unchanged(self, tmp_path):
+        """Test that bytes are written as-is (used for serialized JSON)."""
+        from generate_docs import _atomic_write
+
+        target = tmp_path / "metadata.json"
+        _atomic_write(target, b'{\n  "a": "\xc3\xa9"\n}')
+
+        assert target.read_bytes() == b'{\n  "a": "\xc3\xa9"\n}'
+
+    def test_failed_write_keeps_old_file(self, tmp_path, monkeypatch):
+        """Test that an interrupted write leaves the previous file intact."""
+        import generate_docs
+
+        target = tmp_path / "out.rb"
+        target.write_text("old")
+
+        def fail_replace(src, dst):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(generate_docs.os, 'replace', fail_replace)
+
+        with pytest.raises(OSError):
+            generate_docs._atomic_write(target, "new")
+        assert target.read_text() == "old"
+        assert [p.name for p in tmp_path.iterdir()] == ["out.rb"]
+
+    def test_concurrent_writes_same_target(self, tmp_path):
+        """Test that threads writing the same file each leave a complete version."""
+        from generate_docs import _atomic_write
+
+        target = tmp_path / "out.rb"
+        contents = [str(i) * 10000 for i in range(8)]
+        threads = [threading.Thread(target=_atomic_write, args=(target, c)) for c in contents]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert target.read_text(encoding='utf-8') in contents
+        assert [p.name for p in tmp_path.iterdir()] == ["out.rb"]
+
+
+class TestHandleOne:
+    """Test the single-file entry point shared with directory mode."""
+
+    def test_documents_then_skips(self, generator, ruby_files):
+        """Test that a file is documented once and skipped when unchanged."""
+        calls = []
+        generator.provider.generate = lambda prompt, system_prompt=None: calls.append(1) or '[]'
+
+        assert generator._handle_one(ruby_files[0]) is True
+        assert generator.get_output_file_path(ruby_files[0]).exists()
+        assert generator._handle_one(ruby_files[0]) is True
+        assert len(calls) == 1
+
+    def test_failure_marks_file_failed(self, generator, ruby_files):
+        """Test that an unparseable response is recorded as a failure."""
+        generator.provider.generate = lambda prompt, system_prompt=None: 'not json'
+
+        assert generator._handle_one(ruby_files[0]) is False
+        assert ruby_files[0].name in generator.failed_files
+
+
+class TestConfirm:
+    """Test confirmation prompts."""
+
+    def test_assume_yes_skips_prompt(self, generator, monkeypatch):
+        """Test that assume_yes answers without reading stdin."""
+        generator.assume_yes = True
+        monkeypatch.setattr('builtins.input', lambda q: pytest.fail("should not prompt"))
+
+        assert generator._confirm("Continue? ") is True
+
+    def test_non_tty_declines(self, generator, monkeypatch):
+        """Test that an unattended run declines instead of hanging."""
+        monkeypatch.setattr('sys.stdin.isatty', lambda: False)
+        monkeypatch.setattr('builtins.input', lambda q: pytest.fail("should not prompt"))
+
+        assert generator._confirm("Continue? ") is False
+
+    def test_tty_prompts(self, generator, monkeypatch):
+        """Test that an interactive run asks the question."""
+        monkeypatch.setattr('sys.stdin.isatty', lambda: True)
+        monkeypatch.setattr('builtins.input', lambda q: 'Y')
+
+        assert generator._confirm("Continue? ") is True
+
+
+class TestAsyncProvider:
+    """Test dispatch to providers with a native async agenerate."""
+
+    def test_uses_agenerate(self, generator, ruby_files):
+        """Test that single-file requests await agenerate instead of calling generate."""
+        calls = []
+
+        async def agenerate(prompt, system_prompt=None):
+            calls.append(prompt)
+            await asyncio.sleep(0)
+            return '[]'
+
+        generator.provider.supports_async = True
+        generator.provider.agenerate = agenerate
+        generator.provider.generate = lambda prompt, system_prompt=None: pytest.fail("sync generate used")
+        generator.parallel_workers = 4
+
+        assert generator._process_files_parallel(ruby_files) == 4
+        assert len(calls) == 4
+        assert all(generator.get_output_file_path(f).exists() for f in ruby_files)
+
+    def test_async_client_closed_after_dispatch(self, generator, ruby_files):
+        """Test that the provider's async client is closed once the run finishes."""
+        closed = []
+
+        async def agenerate(prompt, system_prompt=None):
+            return '[]'
+
+        async def aclose():
+            closed.append(asyncio.get_running_loop())
+
+        generator.provider.supports_async = True
+        generator.provider.agenerate = agenerate
+        generator.provider.aclose = aclose
+        generator.parallel_workers = 2
+
+        assert generator._process_files_parallel(ruby_files) == 4
+        assert len(closed) == 1
+
+    def test_failed_response_marks_file_failed(self, generator, ruby_files):
+        """Test that an unparseable async response is recorded as a failure."""
+        async def agenerate(prompt, system_prompt=None):
+            return 'not json'
+
+        generator.provider.supports_async = True
+        generator.provider.agenerate = agenerate
+
+        assert asyncio.run(generator._aprocess_single_file(ruby_files[0], 1, 1)) is False
+        assert ruby_files[0].name in generator.failed_files
+
+    def test_validation_runs_off_event_loop(self, generator, ruby_files, monkeypatch):
+        """Test that validation (which starts YARD) doesn't block other requests."""
+        async def agenerate(prompt, system_prompt=None):
+            return '[]'
+
+        loop_threads = []
+
+        def check_validation(file_path, result):
+            loop_threads.append(threading.current_thread() is threading.main_thread())
+            return ('passed', None), False
+
+        generator.provider.supports_async = True
+        generator.provider.agenerate = agenerate
+        monkeypatch.setattr(generator, '_check_validation', check_validation)
+
+        assert asyncio.run(generator._aprocess_single_file(ruby_files[0], 1, 1)) is True
+        assert loop_threads == [False]
+
+
+class TestJsonHelpers:
+    """Test the JSON serialization helpers."""
+
+    MANIFEST = {
+        'processed_files': {'lib/a.rb': {'content_hash': 'ab12', 'prompt_version': 1, 'note': None}},
+        'failed_files': [],
+    }
+
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_matches_stdlib_indent(self, use_orjson, monkeypatch):
+        """Test that both backends match json.dumps(indent=2) byte for byte."""
+        import generate_docs
+        if use_orjson and not generate_docs.HAS_ORJSON:
+            pytest.skip("orjson not installed")
+        monkeypatch.setattr(generate_docs, 'HAS_ORJSON', use_orjson)
+
+        data = generate_docs._dumps_json(self.MANIFEST)
+
+        assert data == json.dumps(self.MANIFEST, indent=2).encode('utf-8')
+        assert generate_docs._loads_json(data) == self.MANIFEST
+
+    def test_manifest_round_trip(self, generator, ruby_files):
+        """Test that a saved manifest loads back unchanged."""
+        generator.mark_file_processed(ruby_files[0], success=True)
+        generator.save_manifest()
+
+        assert generator.load_manifest() == generator.manifest
+
+    def test_parse_text_falls_back_to_stdlib(self):
+        """Test that text orjson rejects still parses, and invalid JSON raises as before."""
+        from generate_docs import _parse_json_text
+
+        assert _parse_json_text('[{"line_number": 1}]') == [{"line_number": 1}]
+        assert _parse_json_text('{"x": NaN}')['x'] != _parse_json_text('{"x": NaN}')['x']
+        with pytest.raises(json.JSONDecodeError) as excinfo:
+            _parse_json_text('[{"a": 1,}]')
+        assert excinfo.value.pos == 9
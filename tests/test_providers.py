@@ -0,0 +1,351 @@
+"""
+Tests for provider helpers in src/providers.
+
+Tests provider logic that runs without network access, using stand-in
+API clients where a provider needs one.
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from providers.base import LLMProvider, ProviderConfig
+from providers.openai_provider import OpenAIProvider
+
+
+class FakeOpenAIClient:
+    """Minimal stand-in for the OpenAI client's files and batches APIs."""
+
+    def __init__(self, output_lines, statuses=("in_progress", "completed")):
+        self.uploaded = None
+        self.statuses = list(statuses)
+        self.output = "\n".join(json.dumps(line) for line in output_lines)
+        self.files = SimpleNamespace(create=self._create_file, content=self._content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve)
+
+    def _create_file(self, file, purpose):
+        self.uploaded = file[1].decode("utf-8")
+        return SimpleNamespace(id="file_in")
+
+    def _create_batch(self, input_file_id, endpoint, completion_window):
+        return SimpleNamespace(id="batch_1")
+
+    def _retrieve(self, batch_id):
+        status = self.statuses.pop(0)
+        return SimpleNamespace(status=status, output_file_id="file_out",
+                               request_counts=SimpleNamespace(completed=0, total=2))
+
+    def _content(self, file_id):
+        return SimpleNamespace(text=self.output)
+
+
+@pytest.fixture
+def openai_provider():
+    """Create an OpenAI provider without importing the openai package."""
+    provider = OpenAIProvider.__new__(OpenAIProvider)
+    LLMProvider.__init__(provider, ProviderConfig(
+        name="openai", model="gpt-4o-mini", cost_per_1m_input=1.0, cost_per_1m_output=1.0
+    ))
+    return provider
+
+
+class TestOpenAIBatchAPI:
+    """Test OpenAI batch submission and result collection."""
+
+    def test_submit_uploads_one_line_per_request(self, openai_provider):
+        """Test that each prompt becomes a chat completion request line."""
+        openai_provider.client = FakeOpenAIClient([])
+
+        batch_id = openai_provider.submit_batch([("a.rb", "doc a", "sys"), ("b.rb", "doc b", None)])
+
+        lines = [json.loads(line) for line in openai_provider.client.uploaded.splitlines()]
+        assert batch_id == "batch_1"
+        assert [line["custom_id"] for line in lines] == ["a.rb", "b.rb"]
+        assert lines[0]["url"] == "/v1/chat/completions"
+        assert lines[0]["body"]["messages"][0] == {"role": "system", "content": "sys"}
+
+    def test_wait_collects_successful_responses(self, openai_provider, monkeypatch):
+        """Test that successful results are returned and failed ones skipped."""
+        monkeypatch.setattr("providers.openai_provider.time.sleep", lambda seconds: None)
+        openai_provider.client = FakeOpenAIClient([
+            {"custom_id": "a.rb", "response": {"status_code": 200, "body": {
+                "choices": [{"message": {"content": "[]"}}],
+                "usage": {"prompt_tokens": 1_000_000, "completion_tokens": 0}}}},
+            {"custom_id": "b.rb", "response": {"status_code": 500, "body": {}}, "error": "boom"},
+        ])
+
+        results = openai_provider.wait_for_batch("batch_1")
+
+        assert results == {"a.rb": "[]"}
+        assert openai_provider.estimated_cost == pytest.approx(0.5)
+
+    def test_failed_batch_raises(self, openai_provider):
+        """Test that a failed batch job raises."""
+        openai_provider.client = FakeOpenAIClient([], statuses=("failed",))
+
+        with pytest.raises(Exception, match="failed"):
+            openai_provider.wait_for_batch("batch_1")
+
+
+class TestOpenAITokenEstimate:
+    """Test OpenAI token counting."""
+
+    def test_falls_back_without_tiktoken(self, openai_provider, monkeypatch):
+        """Test that the character estimate is used when tiktoken is missing."""
+        from providers import openai_provider as module
+
+        monkeypatch.setattr(module, "_get_encoding", lambda model: None)
+
+        assert openai_provider._estimate_tokens("x" * 40) == 10
+
+    def test_uses_model_encoding(self, openai_provider, monkeypatch):
+        """Test that the model's encoding is used when available."""
+        from providers import openai_provider as module
+
+        encoding = SimpleNamespace(encode=lambda text, disallowed_special=(): text.split())
+        monkeypatch.setattr(module, "_get_encoding", lambda model: encoding)
+
+        assert openai_provider.count_tokens("class Foo end") == 3
+
+
+class TestHttpClient:
+    """Test the shared HTTP client helper."""
+
+    def test_returns_none_without_httpx(self, monkeypatch):
+        """Test that providers fall back to the SDK default client."""
+        import sys
+        from providers.base import build_http_client
+
+        monkeypatch.setitem(sys.modules, "httpx", None)
+
+        assert build_http_client() is None
+
+    def test_pool_limits(self):
+        """Test that the client is configured with the requested pool size."""
+        httpx = pytest.importorskip("httpx")
+        from providers.base import build_http_client
+
+        client = build_http_client(max_connections=8)
+        try:
+            assert isinstance(client, httpx.Client)
+            assert client.timeout.connect == 10.0
+            assert client.timeout.read == 600.0
+        finally:
+            client.close()
+
+    def test_pool_sized_from_parallel_workers(self, monkeypatch):
+        """Test that the factory sizes the connection pool for the worker count."""
+        from providers import factory
+
+        if not factory.HAS_CONFIG:
+            pytest.skip("config module not available")
+        cfg = SimpleNamespace(model="m", max_tokens=1, temperature=0.0, requests_per_minute=None,
+                              requests_per_day=None, tokens_per_minute=None,
+                              cost_per_1m_input=None, cost_per_1m_output=None, parallel_workers=6,
+                              max_retries=3, base_retry_delay=5)
+        monkeypatch.setattr(factory, "get_provider_config", lambda name: cfg)
+
+        assert factory._build_provider_config("openai").max_connections == 12
+
+
+class TestOpenAIAsync:
+    """Test the async OpenAI request path."""
+
+    def test_agenerate_uses_async_client(self, openai_provider, monkeypatch):
+        """Test that agenerate awaits the async client and counts the request."""
+        import asyncio
+        from providers import openai_provider as module
+
+        requests = []
+
+        async def create(**kwargs):
+            requests.append(kwargs)
+            message = SimpleNamespace(content='[]')
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+        fake_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        monkeypatch.setattr(module, "AsyncOpenAI", lambda **kwargs: fake_client)
+        monkeypatch.setattr(module, "build_http_client", lambda *args, **kwargs: None)
+        monkeypatch.setattr(module, "_get_structured_output_enabled", lambda: False)
+        openai_provider._api_key = "test"
+        openai_provider.async_client = None
+        openai_provider._async_loop = None
+
+        assert asyncio.run(openai_provider.agenerate("doc this", "sys")) == '[]'
+        assert openai_provider.request_count == 1
+        assert requests[0]["messages"][0] == {"role": "system", "content": "sys"}
+
+    def test_cost_from_reported_usage(self, openai_provider, monkeypatch):
+        """Test that reported usage is billed without counting tokens locally."""
+        monkeypatch.setattr(openai_provider, "_estimate_tokens",
+                            lambda text: pytest.fail("tokens counted locally"))
+        usage = SimpleNamespace(prompt_tokens=1_000_000, completion_tokens=500_000)
+
+        openai_provider._track_response_cost(SimpleNamespace(usage=usage), "prompt", "result")
+
+        assert openai_provider.estimated_cost == pytest.approx(1.5)
+
+    def test_cost_counted_without_usage(self, openai_provider, monkeypatch):
+        """Test that responses without usage fall back to counting tokens."""
+        monkeypatch.setattr(openai_provider, "_estimate_tokens", lambda text: 1_000_000)
+
+        openai_provider._track_response_cost(SimpleNamespace(usage=None), "prompt", "result")
+
+        assert openai_provider.estimated_cost == pytest.approx(2.0)
+
+
+class TestAnthropicAsync:
+    """Test the async Anthropic request path."""
+
+    @pytest.fixture
+    def anthropic_provider(self, monkeypatch):
+        """Create an Anthropic provider with a stand-in async client."""
+        from providers import anthropic_provider as module
+        from providers.anthropic_provider import AnthropicProvider
+
+        provider = AnthropicProvider.__new__(AnthropicProvider)
+        LLMProvider.__init__(provider, ProviderConfig(name="anthropic", model="claude-test"))
+        provider._api_key = "test"
+        provider.async_client = None
+        provider._async_loop = None
+        provider.calls = []
+
+        async def create(**kwargs):
+            provider.calls.append(kwargs)
+            if len(provider.calls) == 1 and provider.fail_first:
+                raise Exception("Error code: 429 - rate_limit_error")
+            block = SimpleNamespace(type="text", text='[]')
+            return SimpleNamespace(content=[block], usage=SimpleNamespace(input_tokens=1, output_tokens=1))
+
+        fake_client = SimpleNamespace(messages=SimpleNamespace(create=create))
+        monkeypatch.setattr(module, "anthropic_client", SimpleNamespace(AsyncAnthropic=lambda **kwargs: fake_client))
+        monkeypatch.setattr(module, "build_http_client", lambda *args, **kwargs: None)
+        monkeypatch.setattr(module, "_get_structured_output_enabled", lambda: False)
+        provider.fail_first = False
+        return provider
+
+    def test_agenerate_uses_async_client(self, anthropic_provider):
+        """Test that agenerate awaits the async client and counts the request."""
+        import asyncio
+
+        assert asyncio.run(anthropic_provider.agenerate("doc this", "sys")) == '[]'
+        assert anthropic_provider.request_count == 1
+        assert anthropic_provider.calls[0]["system"] == "sys"
+
+    def test_aclose_closes_client(self, anthropic_provider):
+        """Test that aclose closes the client agenerate created and drops it."""
+        import asyncio
+
+        closed = []
+
+        async def run():
+            await anthropic_provider.agenerate("doc this")
+            client = anthropic_provider.async_client
+
+            async def close():
+                closed.append(client)
+
+            client.close = close
+            await anthropic_provider.aclose()
+
+        asyncio.run(run())
+        assert len(closed) == 1
+        assert anthropic_provider.async_client is None
+
+    def test_status_code_decides_rate_limit(self, anthropic_provider):
+        """Test that SDK errors are classified by status code, not message text."""
+        class StatusError(Exception):
+            def __init__(self, message, status_code):
+                super().__init__(message)
+                self.status_code = status_code
+
+        assert anthropic_provider._check_rate_limit_error(StatusError("Too many requests", 429))
+        assert not anthropic_provider._check_rate_limit_error(StatusError("request 4291 invalid", 400))
+        assert anthropic_provider.rate_limit_hits == 1
+
+    def test_retry_after_header_used(self, anthropic_provider):
+        """Test that the API's Retry-After replaces the exponential backoff."""
+        error = Exception("Error code: 429")
+        error.response = SimpleNamespace(headers={"retry-after": "2"})
+
+        assert 2 <= anthropic_provider._retry_delay(error, attempt=1) <= 2.2
+
+    def test_configured_retries(self, anthropic_provider):
+        """Test that config.yaml's retry settings override the class defaults."""
+        anthropic_provider.config.max_retries = 1
+
+        with pytest.raises(Exception, match="after 1 retries"):
+            anthropic_provider._retry_delay(Exception("Error code: 429"), attempt=0)
+
+    def test_agenerate_retries_rate_limit(self, anthropic_provider, monkeypatch):
+        """Test that a 429 is retried after an awaited backoff."""
+        import asyncio
+        delays = []
+
+        async def fake_sleep(delay):
+            delays.append(delay)
+
+        monkeypatch.setattr("providers.anthropic_provider.asyncio.sleep", fake_sleep)
+        anthropic_provider.fail_first = True
+
+        assert asyncio.run(anthropic_provider.agenerate("doc this")) == '[]'
+        assert len(delays) == 1 and 5 <= delays[0] <= 5.5
+        assert len(anthropic_provider.calls) == 2
+
+
+class FakeAnthropicBatches:
+    """Minimal stand-in for the Anthropic client's messages.batches API."""
+
+    def __init__(self, results, statuses=("in_progress", "ended")):
+        self.created = None
+        self.statuses = list(statuses)
+        self.results_list = results
+
+    def create(self, requests):
+        self.created = requests
+        return SimpleNamespace(id="msgbatch_1")
+
+    def retrieve(self, batch_id):
+        return SimpleNamespace(processing_status=self.statuses.pop(0),
+                               request_counts=SimpleNamespace(processing=1))
+
+    def results(self, batch_id):
+        return iter(self.results_list)
+
+
+class TestAnthropicBatchAPI:
+    """Test Anthropic Message Batches submission and result collection."""
+
+    @pytest.fixture
+    def anthropic_provider(self, monkeypatch):
+        """Create an Anthropic provider without importing the anthropic package."""
+        from providers import anthropic_provider as module
+        from providers.anthropic_provider import AnthropicProvider
+
+        monkeypatch.setattr(module, "_get_structured_output_enabled", lambda: False)
+        monkeypatch.setattr("providers.anthropic_provider.time.sleep", lambda seconds: None)
+        provider = AnthropicProvider.__new__(AnthropicProvider)
+        LLMProvider.__init__(provider, ProviderConfig(
+            name="anthropic", model="claude-test", cost_per_1m_input=1.0, cost_per_1m_output=1.0
+        ))
+        provider._batches = {}
+        return provider
+
+    def test_round_trip_maps_custom_ids(self, anthropic_provider):
+        """Test that file paths survive the batch custom_id format and failures are skipped."""
+        message = SimpleNamespace(content=[SimpleNamespace(type="text", text="[]")],
+                                  usage=SimpleNamespace(input_tokens=1_000_000, output_tokens=0))
+        batches = FakeAnthropicBatches([
+            SimpleNamespace(custom_id="req-0", result=SimpleNamespace(type="succeeded", message=message)),
+            SimpleNamespace(custom_id="req-1", result=SimpleNamespace(type="errored", error="boom")),
+        ])
+        anthropic_provider.client = SimpleNamespace(messages=SimpleNamespace(batches=batches))
+
+        batch_id = anthropic_provider.submit_batch([("lib/a.rb", "doc a", "sys"), ("lib/b.rb", "doc b", None)])
+        results = anthropic_provider.wait_for_batch(batch_id)
+
+        assert [r["custom_id"] for r in batches.created] == ["req-0", "req-1"]
+        assert batches.created[0]["params"]["system"] == "sys"
+        assert results == {"lib/a.rb": "[]"}
+        assert anthropic_provider.estimated_cost == pytest.approx(0.5)
@@ -0,0 +1,114 @@
+"""
+Tests for rate limiting in src/providers/rate_limit.py.
+
+Tests the AsyncTokenBucket used to pace concurrent provider requests and
+the AdaptiveConcurrency limit that backs off on rate limit errors.
+"""
+
+import asyncio
+import time
+
+from providers.rate_limit import AsyncTokenBucket, AdaptiveConcurrency
+
+
+class TestAsyncTokenBucket:
+    """Test the asyncio token bucket."""
+
+    def test_burst_up_to_capacity(self):
+        """Test that a full bucket allows capacity acquisitions without waiting."""
+        async def run():
+            bucket = AsyncTokenBucket(rate_per_sec=1, capacity=3)
+            start = time.monotonic()
+            for _ in range(3):
+                await bucket.acquire()
+            return time.monotonic() - start
+
+        assert asyncio.run(run()) < 0.1
+
+    def test_waits_for_refill(self):
+        """Test that acquiring past capacity waits for tokens to refill."""
+        async def run():
+            bucket = AsyncTokenBucket(rate_per_sec=20, capacity=1)
+            start = time.monotonic()
+            await bucket.acquire()
+            await bucket.acquire()
+            return time.monotonic() - start
+
+        assert asyncio.run(run()) >= 0.04
+
+    def test_cost_capped_at_capacity(self):
+        """Test that an oversized request does not wait forever."""
+        async def run():
+            bucket = AsyncTokenBucket(rate_per_sec=100, capacity=5)
+            await asyncio.wait_for(bucket.acquire(50), timeout=1)
+            return bucket.tokens
+
+        assert asyncio.run(run()) < 1
+
+    def test_shared_across_tasks(self):
+        """Test that concurrent tasks share one budget."""
+        async def run():
+            bucket = AsyncTokenBucket(rate_per_sec=50, capacity=2)
+            start = time.monotonic()
+            await asyncio.gather(*(bucket.acquire() for _ in range(4)))
+            return time.monotonic() - start
+
+        # Two immediately, two more at 50/s
+        assert asyncio.run(run()) >= 0.03
+
+
+class TestAdaptiveConcurrency:
+    """Test the AIMD concurrency limit."""
+
+    def test_bounds_in_flight(self):
+        """Test that no more than the limit run at once."""
+        async def run():
+            limiter = AdaptiveConcurrency(cap=2)
+            peak = []
+
+            async def task():
+                await limiter.acquire()
+                peak.append(limiter.in_flight)
+                await asyncio.sleep(0.01)
+                await limiter.release()
+
+            await asyncio.gather(*(task() for _ in range(6)))
+            return max(peak)
+
+        assert asyncio.run(run()) == 2
+
+    def test_halves_once_per_rate_limit(self):
+        """Test that one new rate limit error halves the limit once."""
+        async def run():
+            limiter = AdaptiveConcurrency(cap=8)
+            for _ in range(3):
+                await limiter.acquire()
+            # Every request in flight sees the same error count
+            await limiter.release(rate_limit_hits=1)
+            halved = limiter.limit
+            for _ in range(2):
+                await limiter.release(rate_limit_hits=1)
+            return halved, limiter.limit
+
+        halved, after = asyncio.run(run())
+        assert halved == 4
+        # The others count as successes rather than cutting again
+        assert 4 < after < 5
+
+    def test_recovers_additively(self):
+        """Test that successes grow the limit back toward the cap."""
+        async def run():
+            limiter = AdaptiveConcurrency(cap=4)
+            await limiter.acquire()
+            await limiter.release(rate_limit_hits=1)
+            await limiter.acquire()
+            await limiter.release(rate_limit_hits=2)
+            low = limiter.limit
+            for _ in range(20):
+                await limiter.acquire()
+                await limiter.release(rate_limit_hits=2)
+            return low, limiter.limit
+
+        low, recovered = asyncio.run(run())
+        assert low == 1
+        assert recovered == 4
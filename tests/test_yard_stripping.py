@@ -129,6 +129,12 @@ end'''
 class TestStripYardCommentsEdgeCases:
     """Test edge cases in YARD comment stripping."""
 
+    def test_no_comments_returned_as_is(self, generator_instance):
+        """Test that content without any comment comes back unchanged."""
+        code = "class Test\n  def run\n  end\nend\n"
+
+        assert generator_instance.strip_yard_comments(code) is code
+
     def test_strips_multiline_description(self, generator_instance):
         """Test stripping multiline YARD descriptions."""
         code = '''# This is a long description